@@ -0,0 +1,68 @@
+"""
+Measure StationIndex lookups over synthetic stations.
+
+    python -m benchmarks.autocomplete --stations 50000 --queries 5000
+
+The index is built from unsaved Station instances, so no database
+is needed.
+"""
+import argparse
+import os
+import random
+import string
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "train_service.settings")
+django.setup()
+
+from train_routes.autocomplete import StationIndex  # noqa: E402
+from train_routes.models import Station  # noqa: E402
+
+
+def random_word(rng: random.Random) -> str:
+    return "".join(
+        rng.choices(string.ascii_lowercase, k=rng.randint(4, 10))
+    ).capitalize()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--stations", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=5_000)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    stations = [
+        Station(
+            id=station_id,
+            name=" ".join(
+                random_word(rng) for _ in range(rng.randint(1, 3))
+            ),
+            popularity=rng.randint(0, 1000),
+        )
+        for station_id in range(1, args.stations + 1)
+    ]
+
+    started = time.perf_counter()
+    index = StationIndex(stations)
+    print(f"build {time.perf_counter() - started:.3f}s")
+
+    timings = []
+    for _ in range(args.queries):
+        name = rng.choice(stations).name
+        query = name[:rng.randint(1, min(len(name), 4))]
+        started = time.perf_counter()
+        index.search(query, args.limit)
+        timings.append(time.perf_counter() - started)
+
+    timings.sort()
+    for percentile in (50, 90, 99):
+        position = min(len(timings) - 1, len(timings) * percentile // 100)
+        print(f"p{percentile} {timings[position] * 1000:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
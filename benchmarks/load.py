@@ -0,0 +1,338 @@
+"""
+Replay a weighted mix of API traffic and report throughput, latency
+percentiles, error and conflict rates.
+
+    python -m benchmarks.load --requests 2000 --concurrency 20
+    python -m benchmarks.load --save-baseline load-baseline.json
+    python -m benchmarks.load --baseline load-baseline.json
+
+Requests are sent by ``--concurrency`` asyncio tasks straight to
+train_service.asgi, with no server or HTTP client in between, so it
+behaves like one ASGI worker: each request runs on its own thread with
+its own database connection. The mix is read from
+benchmarks/traffic.jsonl, see ``fill`` for its placeholders. A test
+database is created on the configured database (a temporary file on
+SQLite), seeded with the test factories and destroyed afterwards.
+Throttling is off, otherwise only the rate limits would be measured.
+
+With ``--baseline`` the exit status is 1 when throughput, p90 latency
+or the error rate are worse than the stored run by more than
+``--tolerance``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import timedelta
+from urllib.parse import urlencode
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "train_service.settings")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    override_settings,
+    setup_test_environment,
+)
+from rest_framework_simplejwt.tokens import AccessToken  # noqa: E402
+
+from train_routes.tests import factories  # noqa: E402
+
+
+TRAFFIC = os.path.join(os.path.dirname(__file__), "traffic.jsonl")
+
+
+def load_traffic(path: str) -> list[dict]:
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def fill(value, values: dict):
+    """
+    Substitute placeholders: a string that is only "{name}" becomes the
+    value itself, other strings are formatted. Available names are
+    journey (id), train and other_train (numbers in "Train <n>"),
+    station (number in "Station <n>"), day (a departure date) and seat.
+    """
+    if isinstance(value, dict):
+        return {key: fill(item, values) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill(item, values) for item in value]
+    if isinstance(value, str):
+        if value.startswith("{") and value.endswith("}"):
+            name = value[1:-1]
+            if name in values:
+                return values[name]
+        return value.format(**values)
+    return value
+
+
+def seed(journeys: int, users: int) -> dict:
+    created = factories.create_journeys(journeys)
+    users = get_user_model().objects.bulk_create(
+        get_user_model()(email=f"load{number}@test.com", password="!")
+        for number in range(users)
+    )
+    return {
+        "journeys": [journey.id for journey in created],
+        "tokens": [str(AccessToken.for_user(user)) for user in users],
+    }
+
+
+def plan(traffic, world, requests: int, seats: int, rng) -> list[tuple]:
+    """Requests to send as (name, method, path, query, body, token)"""
+    journeys = world["journeys"]
+    days = sorted(
+        {
+            (factories.FIRST_DEPARTURE + timedelta(hours=number)).date()
+            for number in range(len(journeys))
+        }
+    )
+    planned = []
+    for entry in rng.choices(
+        traffic, [entry["weight"] for entry in traffic], k=requests
+    ):
+        values = {
+            "journey": rng.choice(journeys),
+            "train": rng.randrange(len(journeys)),
+            "other_train": rng.randrange(len(journeys)),
+            "station": rng.randrange(len(journeys) + 1),
+            "day": rng.choice(days).isoformat(),
+            "seat": rng.randint(1, seats),
+        }
+        body = entry.get("body")
+        planned.append(
+            (
+                entry["name"],
+                entry.get("method", "GET"),
+                fill(entry["path"], values),
+                fill(entry.get("query", {}), values),
+                json.dumps(fill(body, values)).encode() if body else b"",
+                rng.choice(world["tokens"]),
+            )
+        )
+    return planned
+
+
+async def send_request(application, method, path, query, body, token):
+    """Call the ASGI application once and return the response status"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": urlencode(query).encode(),
+        "root_path": "",
+        "headers": [
+            (b"host", b"testserver"),
+            (b"authorization", f"Bearer {token}".encode()),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("testserver", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    disconnected = asyncio.Event()
+    response = {}
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+
+    try:
+        await application(scope, receive, send)
+    finally:
+        disconnected.set()
+    return response.get("status")
+
+
+async def replay(planned, concurrency: int) -> tuple[list[tuple], float]:
+    """(name, seconds, status) of every request and the wall time"""
+    from train_service.asgi import application
+
+    queue = iter(planned)
+    results = []
+
+    async def worker():
+        for name, method, path, query, body, token in queue:
+            started = time.perf_counter()
+            try:
+                status = await send_request(
+                    application, method, path, query, body, token
+                )
+            except Exception:
+                status = None
+            results.append((name, time.perf_counter() - started, status))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results, time.perf_counter() - started
+
+
+def percentile(timings, p: int) -> float:
+    last = len(timings) - 1
+    return timings[min(last, len(timings) * p // 100)]
+
+
+def summarize(results, elapsed: float) -> dict[str, dict]:
+    groups = defaultdict(list)
+    for name, seconds, status in results:
+        groups[name].append((seconds, status))
+        groups["all"].append((seconds, status))
+
+    summary = {}
+    for name, group in groups.items():
+        timings = sorted(seconds for seconds, _ in group)
+        statuses = [status for _, status in group]
+        summary[name] = {
+            "requests": len(group),
+            "throughput": len(group) / elapsed,
+            "p50": percentile(timings, 50) * 1000,
+            "p90": percentile(timings, 90) * 1000,
+            "p99": percentile(timings, 99) * 1000,
+            "error_rate": sum(
+                status is None or status >= 400 and status != 409
+                for status in statuses
+            ) / len(group),
+            "conflict_rate": statuses.count(409) / len(group),
+        }
+    return summary
+
+
+def regressions(summary, baseline, tolerance: float) -> list[str]:
+    found = []
+    for name, current in summary.items():
+        stored = baseline.get(name)
+        if stored is None:
+            continue
+        # Throughput of one kind of request only follows its weight
+        if (
+            name == "all"
+            and current["throughput"] < stored["throughput"] * (1 - tolerance)
+        ):
+            found.append(
+                f"{name}: {current['throughput']:.0f} req/s, "
+                f"baseline {stored['throughput']:.0f}"
+            )
+        if current["p90"] > stored["p90"] * (1 + tolerance):
+            found.append(
+                f"{name}: p90 {current['p90']:.1f} ms, "
+                f"baseline {stored['p90']:.1f}"
+            )
+        if current["error_rate"] > stored["error_rate"] + tolerance / 10:
+            found.append(
+                f"{name}: {current['error_rate']:.1%} errors, "
+                f"baseline {stored['error_rate']:.1%}"
+            )
+    return found
+
+
+def report(summary, baseline) -> None:
+    print(
+        f"{'requests':<22}{'count':>7}{'req/s':>9}{'p50 ms':>9}"
+        f"{'p90 ms':>9}{'p99 ms':>9}{'errors':>8}{'409':>8}"
+        + (f"{'p90 vs base':>13}" if baseline else "")
+    )
+    for name in sorted(summary, key=lambda name: (name == "all", name)):
+        row = summary[name]
+        line = (
+            f"{name:<22}{row['requests']:>7}{row['throughput']:>9.1f}"
+            f"{row['p50']:>9.1f}{row['p90']:>9.1f}{row['p99']:>9.1f}"
+            f"{row['error_rate']:>8.1%}{row['conflict_rate']:>8.1%}"
+        )
+        if name in baseline:
+            change = row["p90"] / baseline[name]["p90"] - 1
+            line += f"{change:>+13.0%}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--traffic", default=TRAFFIC)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--journeys", type=int, default=50)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument(
+        "--seats",
+        type=int,
+        default=50,
+        help="seats booked per journey, fewer seats more conflicts",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline")
+    parser.add_argument("--save-baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    setup_test_environment(debug=False)
+    rest_framework = {
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_THROTTLE_CLASSES": [],
+    }
+    old_name = connection.settings_dict["NAME"]
+    with override_settings(
+        REST_FRAMEWORK=rest_framework
+    ), tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == "sqlite":
+            # Threads of a shared in-memory database lock whole tables
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(
+                directory, "load.sqlite3"
+            )
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            world = seed(args.journeys, args.users)
+            planned = plan(
+                load_traffic(args.traffic),
+                world,
+                args.requests,
+                args.seats,
+                random.Random(args.seed),
+            )
+            results, elapsed = asyncio.run(
+                replay(planned, args.concurrency)
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    summary = summarize(results, elapsed)
+    report(summary, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump(summary, file, indent=2)
+
+    found = regressions(summary, baseline, args.tolerance)
+    if found:
+        print("\nWorse than the baseline:\n" + "\n".join(found))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
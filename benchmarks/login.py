@@ -0,0 +1,168 @@
+"""
+Measure login throughput and how responsive other requests stay while
+passwords are hashed, inline and in hashing pools of several sizes.
+
+    python -m benchmarks.login --logins 200 --concurrency 20 --workers 0,2,4
+
+``--concurrency`` asyncio tasks post to /api/user/token/ through
+train_service.asgi, as in benchmarks.load, while one more task keeps
+requesting a small page of stations and records its latency. Each
+``--workers`` value is one run with PASSWORD_HASHING_WORKERS set to it,
+0 hashing in the request thread. The login concurrency limit is off
+unless ``--limit`` is given, then the 429 responses are counted.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "train_service.settings")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.contrib.auth.hashers import make_password  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    override_settings,
+    setup_test_environment,
+)
+from rest_framework_simplejwt.tokens import AccessToken  # noqa: E402
+
+from benchmarks.load import percentile, send_request  # noqa: E402
+from train_routes.tests import factories  # noqa: E402
+from user import hashers  # noqa: E402
+
+PASSWORD = "benchmark-password"
+LOGIN_PATH = "/api/user/token/"
+PROBE_PATH = "/api/train-routes/stations/"
+
+
+def seed(users: int) -> tuple[list[str], str]:
+    """Login emails and an access token for the probe requests"""
+    factories.create_stations(10)
+    # One PBKDF2 hash for everybody, creating users is not measured
+    encoded = make_password(PASSWORD)
+    created = get_user_model().objects.bulk_create(
+        get_user_model()(email=f"login{number}@test.com", password=encoded)
+        for number in range(users)
+    )
+    return [user.email for user in created], str(
+        AccessToken.for_user(created[0])
+    )
+
+
+async def storm(emails, token, logins: int, concurrency: int) -> dict:
+    from train_service.asgi import application
+
+    queue = iter(range(logins))
+    statuses = []
+    probes = []
+    done = asyncio.Event()
+
+    async def login():
+        for number in queue:
+            body = json.dumps(
+                {"email": emails[number % len(emails)], "password": PASSWORD}
+            ).encode()
+            statuses.append(
+                await send_request(
+                    application, "POST", LOGIN_PATH, {}, body, token
+                )
+            )
+
+    async def probe():
+        while not done.is_set():
+            started = time.perf_counter()
+            await send_request(
+                application, "GET", PROBE_PATH, {"limit": 5}, b"", token
+            )
+            probes.append(time.perf_counter() - started)
+
+    probing = asyncio.create_task(probe())
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await probing
+
+    probes.sort()
+    return {
+        "logins_per_second": round(logins / elapsed, 1),
+        "ok": statuses.count(200),
+        "throttled": statuses.count(429),
+        "probe_p50_ms": round(percentile(probes, 50) * 1000, 1),
+        "probe_p99_ms": round(percentile(probes, 99) * 1000, 1),
+    }
+
+
+def run(workers: int, emails, token, args) -> dict:
+    with override_settings(
+        PASSWORD_HASHING_WORKERS=workers,
+        LOGIN_CONCURRENCY_LIMIT=args.limit,
+    ):
+        # Start the pool before measuring
+        make_password(PASSWORD)
+        try:
+            return asyncio.run(
+                storm(emails, token, args.logins, args.concurrency)
+            )
+        finally:
+            if hashers._executor is not None:
+                hashers._executor.shutdown()
+                hashers._executor = None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument(
+        "--workers",
+        default=f"0,{os.cpu_count()}",
+        help="comma separated PASSWORD_HASHING_WORKERS values to compare",
+    )
+    parser.add_argument("--limit", type=int, default=0)
+    args = parser.parse_args()
+
+    setup_test_environment(debug=False)
+    rest_framework = {
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_THROTTLE_CLASSES": [],
+    }
+    old_name = connection.settings_dict["NAME"]
+    results = {}
+    with override_settings(
+        REST_FRAMEWORK=rest_framework
+    ), tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == "sqlite":
+            # Threads of a shared in-memory database lock whole tables
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(
+                directory, "login.sqlite3"
+            )
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            emails, token = seed(args.users)
+            for workers in map(int, args.workers.split(",")):
+                results[workers] = run(workers, emails, token, args)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    columns = list(next(iter(results.values())))
+    print(f"{'workers':>8} " + " ".join(f"{name:>18}" for name in columns))
+    for workers, result in results.items():
+        print(
+            f"{workers:>8} "
+            + " ".join(f"{result[name]:>18}" for name in columns)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Compare the media serving paths.
+
+    python -m benchmarks.media --requests 2000 --size 262144
+
+``static`` is django.views.static.serve that ``static()`` mounts for the
+other media under DEBUG, the other rows are train_routes.media.serve_media
+serving a hashed image variant.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "train_service.settings")
+django.setup()
+
+from django.test import RequestFactory, override_settings  # noqa: E402
+from django.views.static import serve  # noqa: E402
+
+from train_routes.media import serve_media  # noqa: E402
+
+
+PATH = "uploads/images/variants/benchmark-large-0123456789abcdef.jpg"
+
+
+def run(view, requests: int, **headers) -> tuple[float, int]:
+    factory = RequestFactory()
+    sent = 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        response = view(factory.get(f"/media/{PATH}", **headers), PATH)
+        if response.streaming:
+            sent += sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            sent += len(response.content)
+        response.close()
+    return time.perf_counter() - started, sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=256 * 2**10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as media_root:
+        os.makedirs(os.path.join(media_root, os.path.dirname(PATH)))
+        with open(os.path.join(media_root, PATH), "wb") as file:
+            file.write(os.urandom(args.size))
+
+        def static(request, path):
+            return serve(request, path, document_root=media_root)
+
+        with override_settings(MEDIA_ROOT=media_root):
+            etag = serve_media(RequestFactory().get("/"), PATH)["ETag"]
+            cases = [
+                ("static", static, {}, None),
+                ("serve_media", serve_media, {}, None),
+                ("serve_media range", serve_media,
+                 {"HTTP_RANGE": "bytes=0-65535"}, None),
+                ("serve_media 304", serve_media,
+                 {"HTTP_IF_NONE_MATCH": etag}, None),
+                ("serve_media offload", serve_media, {}, "X-Accel-Redirect"),
+            ]
+            print(f"{'path':<22}{'req/s':>10}{'MB/s':>10}")
+            for name, view, headers, offload in cases:
+                with override_settings(MEDIA_OFFLOAD_HEADER=offload):
+                    elapsed, sent = run(view, args.requests, **headers)
+                print(
+                    f"{name:<22}{args.requests / elapsed:>10.0f}"
+                    f"{sent / elapsed / 2**20:>10.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Measure StationTree k-nearest and radius lookups over synthetic stations.
+
+    python -m benchmarks.nearby --stations 100000 --queries 2000
+
+Stations are scattered over Europe, the tree is built from unsaved
+Station instances, so no database is needed. ``scan`` is a haversine
+over every station for comparison.
+"""
+import argparse
+import os
+import random
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "train_service.settings")
+django.setup()
+
+from train_routes.geo import StationTree, haversine_km  # noqa: E402
+from train_routes.models import Station  # noqa: E402
+
+
+def percentiles(timings) -> str:
+    timings = sorted(timings)
+    last = len(timings) - 1
+    return "".join(
+        f"{timings[min(last, len(timings) * p // 100)] * 1000:>10.3f}"
+        for p in (50, 90, 99)
+    )
+
+
+def measure(lookup, points) -> list[float]:
+    timings = []
+    for lat, lon in points:
+        started = time.perf_counter()
+        lookup(lat, lon)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--stations", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--radius", type=float, default=25)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    stations = [
+        Station(
+            id=station_id,
+            name=f"Station {station_id}",
+            latitude=rng.uniform(36, 70),
+            longtitude=rng.uniform(-10, 40),
+        )
+        for station_id in range(1, args.stations + 1)
+    ]
+    points = [
+        (rng.uniform(36, 70), rng.uniform(-10, 40))
+        for _ in range(args.queries)
+    ]
+
+    started = time.perf_counter()
+    tree = StationTree(stations)
+    print(f"build {time.perf_counter() - started:.3f}s")
+
+    def scan(lat, lon):
+        return sorted(
+            stations,
+            key=lambda s: haversine_km(lat, lon, s.latitude, s.longtitude),
+        )[:args.limit]
+
+    cases = [
+        ("k-nearest", lambda lat, lon: tree.nearest(lat, lon, args.limit)),
+        (
+            "radius",
+            lambda lat, lon: tree.nearest(lat, lon, args.limit, args.radius),
+        ),
+        ("scan", scan),
+    ]
+    print(f"{'lookup':<12}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}")
+    for name, lookup in cases:
+        sample = points if name != "scan" else points[:20]
+        print(f"{name:<12}{percentiles(measure(lookup, sample))}")
+
+
+if __name__ == "__main__":
+    main()
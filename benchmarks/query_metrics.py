@@ -0,0 +1,68 @@
+"""
+Measure what QueryMetricsMiddleware adds to a request.
+
+    python -m benchmarks.query_metrics --requests 20000 --queries 10
+
+Each simulated request runs ``--queries`` no-op statements through the
+QueryRecorder wrapper and records itself, no database is needed.
+"""
+import argparse
+import os
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "train_service.settings")
+django.setup()
+
+from train_routes.metrics import (  # noqa: E402
+    QueryMetrics,
+    QueryRecorder,
+)
+
+
+STATEMENTS = [
+    'SELECT "train_routes_journey"."id" FROM "train_routes_journey" '
+    f'WHERE "train_routes_journey"."route_id" = %s LIMIT {number}'
+    for number in range(50)
+]
+
+
+def execute(sql, params, many, context):
+    return None
+
+
+def run(requests, queries, endpoints, recorded) -> float:
+    metrics = QueryMetrics()
+    started = time.perf_counter()
+    for request in range(requests):
+        recorder = QueryRecorder()
+        for query in range(queries):
+            sql = STATEMENTS[(request + query) % len(STATEMENTS)]
+            if recorded:
+                recorder(execute, sql, (), False, {})
+            else:
+                execute(sql, (), False, {})
+        if recorded:
+            metrics.record(
+                f"ViewSet.action{request % endpoints}", recorder, 0.01, 0.001
+            )
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=10)
+    parser.add_argument("--endpoints", type=int, default=40)
+    args = parser.parse_args()
+
+    bare = run(args.requests, args.queries, args.endpoints, False)
+    recorded = run(args.requests, args.queries, args.endpoints, True)
+    overhead = (recorded - bare) / args.requests * 1_000_000
+    print(f"{'requests':>10}{'queries':>10}{'us/request':>12}")
+    print(f"{args.requests:>10}{args.queries:>10}{overhead:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Count,
+    F,
+    FloatField,
+    Func,
+    Max,
+    Q,
+    RowRange,
+    Sum,
+    Window,
+)
+from django.db.models.functions import Cast, NullIf, Rank, TruncDate
+from django.utils import timezone
+
+from train_routes.models import (
+    DailyLoad,
+    DailySales,
+    Journey,
+    Order,
+    RollupWatermark,
+    Ticket,
+)
+
+
+LOAD_GROUPS = {
+    "day": ("day",),
+    "train": ("train", "train__name"),
+    "route": ("route", "route__source__name", "route__destination__name"),
+}
+
+SALES_GROUPS = {
+    "day": ("day",),
+    "route": ("route", "route__source__name", "route__destination__name"),
+    "train_type": ("train_type", "train_type__name"),
+}
+
+SALES_ROLLUP = "daily_sales"
+
+
+class WindowSum(Func):
+    """SUM over a window of values already aggregated by the query"""
+
+    function = "SUM"
+    window_compatible = True
+
+
+class GroupedWindow(Window):
+    """
+    Window over the rows of a grouped query. Its partition and order
+    columns are grouped already, the window itself must not be.
+    """
+
+    def get_group_by_cols(self):
+        return []
+
+
+def journey_keys(journeys) -> set[tuple]:
+    """(day, train_id, route_id) rollup keys of the given journeys"""
+    return set(
+        journeys.annotate(day=TruncDate("departure_time")).values_list(
+            "day", "train_id", "route_id"
+        )
+    )
+
+
+def refresh_daily_loads(keys=None) -> int:
+    """
+    Recompute rollup rows from journeys and tickets, every row when
+    ``keys`` is None. Keys left without journeys are removed.
+    """
+    journeys = Journey.objects.annotate(day=TruncDate("departure_time"))
+    if keys is not None:
+        keys = set(keys)
+        if not keys:
+            return 0
+        scope = Q()
+        for day, train_id, route_id in keys:
+            scope |= Q(day=day, train_id=train_id, route_id=route_id)
+        journeys = journeys.filter(scope)
+
+    loads = journeys.values("day", "train_id", "route_id").annotate(
+        journey_count=Count("id", distinct=True),
+        tickets_sold=Count("tickets"),
+        seats=Max(F("train__cargo_num") * F("train__places_in_cargo")),
+    ).order_by()
+    rows = [
+        DailyLoad(
+            day=load["day"],
+            train_id=load["train_id"],
+            route_id=load["route_id"],
+            journeys=load["journey_count"],
+            tickets_sold=load["tickets_sold"],
+            capacity=load["journey_count"] * load["seats"],
+        )
+        for load in loads
+    ]
+    with transaction.atomic():
+        if keys is None:
+            DailyLoad.objects.all().delete()
+        DailyLoad.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["day", "train", "route"],
+            update_fields=["journeys", "tickets_sold", "capacity"],
+        )
+        refreshed = {(row.day, row.train_id, row.route_id) for row in rows}
+        for day, train_id, route_id in (keys or set()) - refreshed:
+            DailyLoad.objects.filter(
+                day=day, train_id=train_id, route_id=route_id
+            ).delete()
+    return len(rows)
+
+
+def adjust_tickets_sold(tickets_by_journey: Counter) -> None:
+    """Add sold tickets to the rollup rows of their journeys"""
+    journeys = Journey.objects.filter(id__in=tickets_by_journey)
+    for journey in journeys.only("departure_time", "train", "route"):
+        DailyLoad.objects.filter(
+            day=journey.departure_time.date(),
+            train_id=journey.train_id,
+            route_id=journey.route_id,
+        ).update(
+            tickets_sold=F("tickets_sold") + tickets_by_journey[journey.id]
+        )
+
+
+def load_factors(loads, group_by):
+    """
+    Load factor of every group of ``loads``, ranked from the fullest.
+
+    With ``day`` among several groups the rank restarts every day.
+    Grouping by ``day`` also sums ``moving_tickets`` and ``moving_seats``
+    over the last seven days of each group found in the rollup.
+    """
+    fields = [field for name in group_by for field in LOAD_GROUPS[name]]
+    load_factor = Cast(Sum("tickets_sold"), FloatField()) / NullIf(
+        Sum("capacity"), 0
+    )
+    partition = [F("day")] if "day" in group_by and len(group_by) > 1 else None
+    annotations = {
+        "journeys_count": Sum("journeys"),
+        "tickets": Sum("tickets_sold"),
+        "seats": Sum("capacity"),
+        "load_factor": load_factor,
+        "rank": GroupedWindow(
+            Rank(),
+            partition_by=partition,
+            order_by=F("load_factor").desc(nulls_last=True),
+        ),
+    }
+    if "day" in group_by:
+        others = [F(name) for name in group_by if name != "day"]
+        window = {
+            "partition_by": others or None,
+            "order_by": F("day").asc(),
+            "frame": RowRange(start=-6, end=0),
+        }
+        annotations["moving_tickets"] = GroupedWindow(
+            WindowSum(F("tickets")), **window
+        )
+        annotations["moving_seats"] = GroupedWindow(
+            WindowSum(F("seats")), **window
+        )
+
+    ordering = ["day"] if "day" in group_by else []
+    return (
+        loads.values(*fields)
+        .annotate(**annotations)
+        .order_by(*ordering, "rank", *fields)
+    )
+
+
+def _add_sales(tickets, count_orders=True) -> None:
+    """Fold the given tickets into their DailySales rows"""
+    sales = (
+        tickets.values(
+            day=TruncDate("order__created_at"),
+            route_id=F("journey__route_id"),
+            train_type_id=F("journey__train__train_type_id"),
+        )
+        .annotate(
+            order_count=Count("order", distinct=True),
+            ticket_count=Count("id"),
+            distance=Sum("journey__route__distance"),
+        )
+        .order_by()
+    )
+    sales = {
+        (sale["day"], sale["route_id"], sale["train_type_id"]): sale
+        for sale in sales
+    }
+    if not sales:
+        return
+    days, routes, train_types = (set(values) for values in zip(*sales))
+    rows = {
+        (row.day, row.route_id, row.train_type_id): row
+        for row in DailySales.objects.select_for_update().filter(
+            day__in=days, route_id__in=routes, train_type_id__in=train_types
+        )
+    }
+
+    created = []
+    for key, sale in sales.items():
+        row = rows.get(key)
+        if row is None:
+            day, route_id, train_type_id = key
+            row = DailySales(
+                day=day, route_id=route_id, train_type_id=train_type_id
+            )
+            created.append(row)
+        if count_orders:
+            row.orders += sale["order_count"]
+        row.tickets += sale["ticket_count"]
+        row.passenger_km += sale["distance"]
+    DailySales.objects.bulk_update(
+        [row for key, row in rows.items() if key in sales],
+        ["orders", "tickets", "passenger_km"],
+    )
+    DailySales.objects.bulk_create(created)
+
+
+def sales_watermark() -> int:
+    return (
+        RollupWatermark.objects.filter(name=SALES_ROLLUP)
+        .values_list("last_id", flat=True)
+        .first()
+        or 0
+    )
+
+
+def roll_up_sales(batch_size=1000, max_batches=None) -> int:
+    """
+    Fold orders past the high-water mark into DailySales, committing the
+    rollup and the new mark together batch by batch, so an interrupted
+    run resumes where it stopped. Orders younger than SALES_ROLLUP_LAG
+    wait for the next run: an id handed out earlier may commit later.
+    """
+    cutoff = timezone.now() - settings.SALES_ROLLUP_LAG
+    processed = batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            watermark, _ = (
+                RollupWatermark.objects.select_for_update().get_or_create(
+                    name=SALES_ROLLUP
+                )
+            )
+            order_ids = list(
+                Order.objects.filter(
+                    id__gt=watermark.last_id, created_at__lte=cutoff
+                )
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not order_ids:
+                return processed
+            _add_sales(
+                Ticket.objects.filter(
+                    order_id__gt=watermark.last_id,
+                    order_id__lte=order_ids[-1],
+                )
+            )
+            watermark.last_id = order_ids[-1]
+            watermark.save()
+        processed += len(order_ids)
+        batches += 1
+    return processed
+
+
+def reset_sales_rollup() -> None:
+    """Forget every rolled up order, the next roll_up_sales starts over"""
+    with transaction.atomic():
+        DailySales.objects.all().delete()
+        RollupWatermark.objects.filter(name=SALES_ROLLUP).delete()
+
+
+def add_late_ticket(ticket) -> None:
+    """
+    Count a ticket added to an order that is already rolled up, the
+    order only when it has no other ticket counted in the same row
+    """
+    if ticket.order_id > sales_watermark():
+        return
+    journey = Journey.objects.get(id=ticket.journey_id)
+    counted = (
+        Ticket.objects.filter(
+            order_id=ticket.order_id,
+            journey__route_id=journey.route_id,
+            journey__train__train_type_id=journey.train.train_type_id,
+        )
+        .exclude(id=ticket.id)
+        .exists()
+    )
+    with transaction.atomic():
+        _add_sales(
+            Ticket.objects.filter(id=ticket.id), count_orders=not counted
+        )
+
+
+def sales_retractions(tickets) -> dict[tuple, Counter]:
+    """
+    What taking ``tickets`` of rolled up orders out of DailySales
+    subtracts from each row, to be computed before they are deleted. An
+    order is subtracted from a row when none of its tickets counted in
+    the row is left.
+    """
+    key = {
+        "day": TruncDate("order__created_at"),
+        "route_id": F("journey__route_id"),
+        "train_type_id": F("journey__train__train_type_id"),
+    }
+    deleted = list(
+        tickets.filter(order_id__lte=sales_watermark())
+        .values("order_id", **key)
+        .annotate(
+            ticket_count=Count("id"),
+            distance=Sum("journey__route__distance"),
+        )
+        .order_by()
+    )
+    if not deleted:
+        return {}
+    totals = {
+        (row["order_id"], row["route_id"], row["train_type_id"]): row["count"]
+        for row in Ticket.objects.filter(
+            order_id__in={row["order_id"] for row in deleted}
+        )
+        .values(
+            "order_id",
+            route_id=F("journey__route_id"),
+            train_type_id=F("journey__train__train_type_id"),
+        )
+        .annotate(count=Count("id"))
+        .order_by()
+    }
+
+    retractions = defaultdict(Counter)
+    for row in deleted:
+        retraction = retractions[
+            row["day"], row["route_id"], row["train_type_id"]
+        ]
+        retraction["tickets"] += row["ticket_count"]
+        retraction["passenger_km"] += row["distance"]
+        if (
+            totals[row["order_id"], row["route_id"], row["train_type_id"]]
+            == row["ticket_count"]
+        ):
+            retraction["orders"] += 1
+    return retractions
+
+
+def retract_sales(retractions: dict[tuple, Counter]) -> None:
+    """Subtract sales_retractions from their DailySales rows"""
+    for (day, route_id, train_type_id), retraction in retractions.items():
+        DailySales.objects.filter(
+            day=day, route_id=route_id, train_type_id=train_type_id
+        ).update(
+            **{
+                field: F(field) - value
+                for field, value in retraction.items()
+            }
+        )
+
+
+def sales_report(sales, group_by):
+    """Orders, tickets and passenger-km of every group of ``sales``"""
+    fields = [field for name in group_by for field in SALES_GROUPS[name]]
+    return (
+        sales.values(*fields)
+        .annotate(
+            order_count=Sum("orders"),
+            ticket_count=Sum("tickets"),
+            distance=Sum("passenger_km"),
+        )
+        .order_by(*fields)
+    )
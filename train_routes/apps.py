@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TrainRoutesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "train_routes"
+
+    def ready(self):
+        import train_routes.signals  # noqa: F401
@@ -0,0 +1,142 @@
+import time
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+
+from train_routes.models import (
+    ArchivedJourney,
+    ArchivedOrder,
+    ArchivedTicket,
+    Crew,
+    Journey,
+    JourneySearchRow,
+    Order,
+    Ticket,
+)
+
+
+def _delete_silently(queryset) -> None:
+    """
+    Delete without collecting or signals: archived rows leave seat maps,
+    rollups and station popularity as they were.
+    """
+    queryset._raw_delete(queryset.db)
+
+
+def archive_orders(cutoff, batch_size: int) -> int:
+    """
+    Move up to ``batch_size`` orders created before ``cutoff`` whose
+    journeys all arrived before it, with their tickets. Rows locked by
+    someone else are left for a later batch.
+    """
+    with transaction.atomic():
+        order_ids = list(
+            Order.objects.filter(created_at__lt=cutoff)
+            .exclude(tickets__journey__arrival_time__gte=cutoff)
+            .select_for_update(skip_locked=True)
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not order_ids:
+            return 0
+        ArchivedOrder.objects.bulk_create(
+            ArchivedOrder(**order)
+            for order in Order.objects.filter(id__in=order_ids).values(
+                "id", "created_at", "user_id"
+            )
+        )
+        tickets = Ticket.objects.filter(order_id__in=order_ids)
+        ArchivedTicket.objects.bulk_create(
+            ArchivedTicket(
+                id=ticket["id"],
+                order_id=ticket["order_id"],
+                journey_id=ticket["journey_id"],
+                cargo=ticket["cargo"],
+                seat=ticket["seat"],
+                source_name=ticket["journey__route__source__name"],
+                destination_name=ticket["journey__route__destination__name"],
+                train_name=ticket["journey__train__name"],
+                departure_time=ticket["journey__departure_time"],
+                arrival_time=ticket["journey__arrival_time"],
+            )
+            for ticket in tickets.values(
+                "id",
+                "order_id",
+                "journey_id",
+                "cargo",
+                "seat",
+                "journey__route__source__name",
+                "journey__route__destination__name",
+                "journey__train__name",
+                "journey__departure_time",
+                "journey__arrival_time",
+            )
+        )
+        _delete_silently(tickets)
+        _delete_silently(Order.objects.filter(id__in=order_ids))
+    return len(order_ids)
+
+
+def archive_journeys(cutoff, batch_size: int) -> int:
+    """
+    Move up to ``batch_size`` journeys that arrived before ``cutoff``
+    and have no live tickets left, with their crew assignments.
+    """
+    crew_journeys = Crew.journeys.through
+    archived_crew = ArchivedJourney.crew.through
+    with transaction.atomic():
+        journey_ids = list(
+            Journey.objects.filter(arrival_time__lt=cutoff)
+            .filter(~Exists(Ticket.objects.filter(journey=OuterRef("pk"))))
+            .select_for_update(skip_locked=True)
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not journey_ids:
+            return 0
+        ArchivedJourney.objects.bulk_create(
+            ArchivedJourney(**journey)
+            for journey in Journey.objects.filter(id__in=journey_ids).values(
+                "id",
+                "route_id",
+                "train_id",
+                "departure_time",
+                "arrival_time",
+                source_name=F("route__source__name"),
+                destination_name=F("route__destination__name"),
+                train_name=F("train__name"),
+            )
+        )
+        crew = crew_journeys.objects.filter(journey_id__in=journey_ids)
+        archived_crew.objects.bulk_create(
+            archived_crew(archivedjourney_id=journey_id, crew_id=crew_id)
+            for journey_id, crew_id in crew.values_list(
+                "journey_id", "crew_id"
+            )
+        )
+        _delete_silently(crew)
+        _delete_silently(
+            JourneySearchRow.objects.filter(journey_id__in=journey_ids)
+        )
+        _delete_silently(Journey.objects.filter(id__in=journey_ids))
+    return len(journey_ids)
+
+
+def archive_past(cutoff, batch_size=500, max_batches=None, pause=0):
+    """
+    Archive orders and then the journeys they no longer hold, one short
+    transaction per batch with ``pause`` seconds in between.
+    Returns the number of orders and journeys moved.
+    """
+    moved = {archive_orders: 0, archive_journeys: 0}
+    batches = 0
+    for archive in moved:
+        while max_batches is None or batches < max_batches:
+            count = archive(cutoff, batch_size)
+            if not count:
+                break
+            moved[archive] += count
+            batches += 1
+            if pause:
+                time.sleep(pause)
+    return moved[archive_orders], moved[archive_journeys]
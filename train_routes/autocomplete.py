@@ -0,0 +1,137 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from train_routes.models import Station
+
+
+PREFIX_MATCH = 2
+
+WORD_PREFIX_MATCH = 1
+
+# Prefixes this short match a large part of the index,
+# their rankings are kept once computed
+SHORT_PREFIX_LENGTH = 2
+
+
+class StationIndex:
+    """
+    Sorted array of lower-cased station names and name words,
+    prefixes are looked up with bisect.
+    """
+
+    def __init__(self, stations):
+        self.stations = {}
+        keys = []
+        for station in stations:
+            station_id, name = station.id, station.name
+            self.stations[station_id] = station
+            lowered = name.lower()
+            keys.append((lowered, PREFIX_MATCH, station_id))
+            for word in lowered.split()[1:]:
+                keys.append((word, WORD_PREFIX_MATCH, station_id))
+        keys.sort()
+        self.keys = keys
+        self.short_prefixes = {}
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def from_database(cls) -> "StationIndex":
+        return cls(Station.objects.all())
+
+    def is_stale(self) -> bool:
+        return time.monotonic() - self.built_at > settings.STATION_INDEX_TTL
+
+    def search(self, query: str, limit: int) -> list[Station]:
+        """Stations ranked by match kind, popularity and name"""
+        query = query.lower()
+        if len(query) > SHORT_PREFIX_LENGTH:
+            return self._rank(query, limit)
+        ranked = self.short_prefixes.get(query)
+        if ranked is None:
+            ranked = self._rank(
+                query, settings.STATION_AUTOCOMPLETE_MAX_LIMIT
+            )
+            self.short_prefixes[query] = ranked
+        return ranked[:limit]
+
+    def _rank(self, query: str, limit: int) -> list[Station]:
+        matches = {}
+        position = bisect_left(self.keys, (query,))
+        while position < len(self.keys):
+            key, match, station_id = self.keys[position]
+            if not key.startswith(query):
+                break
+            matches[station_id] = max(match, matches.get(station_id, 0))
+            position += 1
+
+        best = heapq.nsmallest(
+            limit,
+            matches.items(),
+            key=lambda item: (
+                -item[1],
+                -self.stations[item[0]].popularity,
+                self.stations[item[0]].name,
+            ),
+        )
+        return [self.stations[station_id] for station_id, _ in best]
+
+
+_index = None
+
+_index_lock = threading.Lock()
+
+
+def get_station_index() -> StationIndex:
+    global _index
+    index = _index
+    if index is None or index.is_stale():
+        with _index_lock:
+            if _index is None or _index.is_stale():
+                _index = StationIndex.from_database()
+            index = _index
+    return index
+
+
+def invalidate_station_index() -> None:
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def _search_database(query: str, limit: int):
+    """Prefix and trigram search backed by the pg_trgm and prefix indexes"""
+    return (
+        Station.objects.filter(
+            Q(name__istartswith=query) | Q(name__trigram_similar=query)
+        )
+        .annotate(
+            match=Case(
+                When(name__istartswith=query, then=Value(PREFIX_MATCH)),
+                default=Value(0),
+                output_field=IntegerField(),
+            ),
+            similarity=TrigramSimilarity("name", query),
+        )
+        .order_by("-match", "-popularity", "-similarity", "name")[:limit]
+    )
+
+
+def autocomplete_stations(query: str, limit: int) -> list[Station]:
+    """
+    Stations whose name or one of its words starts with ``query``,
+    Postgres also matches similar names through pg_trgm.
+    Other databases and STATION_AUTOCOMPLETE_IN_MEMORY use StationIndex.
+    """
+    if (
+        connection.vendor == "postgresql"
+        and not settings.STATION_AUTOCOMPLETE_IN_MEMORY
+    ):
+        return list(_search_database(query, limit))
+    return get_station_index().search(query, limit)
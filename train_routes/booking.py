@@ -0,0 +1,128 @@
+import hashlib
+import random
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import Q
+from django.dispatch import Signal
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from train_routes.models import Order, Ticket
+
+
+# Sent inside the booking transaction, bulk_create skips post_save
+tickets_booked = Signal()
+
+
+class SeatUnavailable(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Some of the requested seats are already taken."
+    default_code = "seat_unavailable"
+
+    def __init__(self, detail=None, code=None, seats=()):
+        super().__init__(detail, code)
+        self.seats = set(seats)
+        if seats:
+            self.detail = {
+                "detail": self.detail,
+                "seats": [
+                    {"journey": journey, "cargo": cargo, "seat": seat}
+                    for journey, cargo, seat in sorted(seats)
+                ],
+            }
+
+
+class SeatsLocked(Exception):
+    """Another booking holds a lock on one of the requested seats"""
+
+
+def seat_lock_key(journey_id: int, cargo: int, seat: int) -> int:
+    """Map a seat to a signed 64-bit Postgres advisory lock key"""
+    digest = hashlib.blake2b(
+        f"{journey_id}:{cargo}:{seat}".encode(), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def _lock_seats(seats) -> None:
+    """
+    Take transaction level advisory locks on every requested seat.
+    Other backends rely on the (journey, cargo, seat) unique constraint.
+    """
+    if connection.vendor != "postgresql":
+        return
+    keys = sorted(seat_lock_key(*seat) for seat in seats)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT bool_and(pg_try_advisory_xact_lock(key)) "
+            "FROM unnest(%s::bigint[]) AS key",
+            [keys],
+        )
+        if not cursor.fetchone()[0]:
+            raise SeatsLocked()
+
+
+def _taken_seats(seats) -> set[tuple[int, int, int]]:
+    cargos = defaultdict(list)
+    for journey_id, cargo, seat in seats:
+        cargos[journey_id, cargo].append(seat)
+    query = Q()
+    for (journey_id, cargo), cargo_seats in cargos.items():
+        query |= Q(journey_id=journey_id, cargo=cargo, seat__in=cargo_seats)
+    return set(
+        Ticket.objects.filter(query).values_list("journey_id", "cargo", "seat")
+    )
+
+
+def _create_order(user, tickets_data, seats) -> Order:
+    with transaction.atomic():
+        _lock_seats(seats)
+        taken = _taken_seats(seats)
+        if taken:
+            raise SeatUnavailable(seats=taken)
+        order = Order.objects.create(user=user)
+        tickets = Ticket.objects.bulk_create(
+            Ticket(
+                order=order,
+                departure_time=ticket_data["journey"].departure_time,
+                **ticket_data,
+            )
+            for ticket_data in tickets_data
+        )
+        tickets_booked.send(sender=Order, order=order, tickets=tickets)
+    return order
+
+
+def book_tickets(user, tickets_data: list[dict]) -> Order:
+    """
+    Create an order with its tickets or raise SeatUnavailable (409).
+
+    Seats held by a concurrent booking, lost unique constraint races and
+    lock timeouts are retried BOOKING_MAX_RETRIES times with jittered
+    exponential backoff, seats that turn out to be sold are not retried.
+    """
+    seats = [
+        (ticket["journey"].id, ticket["cargo"], ticket["seat"])
+        for ticket in tickets_data
+    ]
+    if len(set(seats)) != len(seats):
+        raise ValidationError({"tickets": ["Each seat can be booked once."]})
+
+    for attempt in range(settings.BOOKING_MAX_RETRIES + 1):
+        try:
+            return _create_order(user, tickets_data, seats)
+        except (SeatsLocked, IntegrityError, OperationalError):
+            if attempt == settings.BOOKING_MAX_RETRIES:
+                break
+            time.sleep(
+                settings.BOOKING_RETRY_BACKOFF
+                * 2**attempt
+                * random.uniform(0.5, 1.5)
+            )
+
+    raise SeatUnavailable(
+        "The requested seats are being booked by someone else, try again."
+    )
@@ -0,0 +1,79 @@
+"""
+Ticket counts kept outside the ticket table: journey search rows, daily
+loads, sales rollups and cached seat maps.
+
+Changes are applied once the booking or delete commits, each row in its
+own short statement, so concurrent bookings of one journey do not queue
+on its counter rows while holding their seat locks. A failed update is
+logged without failing the committed request, it and a crash between
+the commit and the update leave a counter off until
+refresh_journey_search and refresh_daily_loads recount it.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+from train_routes.analytics import (
+    add_late_ticket,
+    adjust_tickets_sold,
+    retract_sales,
+    sales_retractions,
+)
+from train_routes.search import adjust_tickets_taken
+from train_routes.seats import release_seats, take_seats
+
+
+def _adjust(tickets_by_journey: Counter) -> None:
+    for journey_id, count in tickets_by_journey.items():
+        adjust_tickets_taken(journey_id, count)
+    adjust_tickets_sold(tickets_by_journey)
+
+
+def _count(tickets_by_journey, seats) -> None:
+    _adjust(tickets_by_journey)
+    for journey_id, journey_seats in seats.items():
+        take_seats(journey_id, journey_seats)
+
+
+def count_booked(tickets) -> None:
+    """Count new tickets after the transaction creating them commits"""
+    seats = defaultdict(list)
+    for ticket in tickets:
+        seats[ticket.journey_id].append((ticket.cargo, ticket.seat))
+    booked = Counter(
+        {journey_id: len(taken) for journey_id, taken in seats.items()}
+    )
+    transaction.on_commit(lambda: _count(booked, seats), robust=True)
+
+
+def _uncount(tickets_by_journey, seats, retractions) -> None:
+    _adjust(tickets_by_journey)
+    for journey_id, journey_seats in seats.items():
+        release_seats(journey_id, journey_seats)
+    retract_sales(retractions)
+
+
+def count_deleted(tickets) -> None:
+    """
+    Take a queryset of tickets out of the counts once the transaction
+    deleting them commits, with one delta per journey and rollup row.
+    """
+    seats = defaultdict(list)
+    for journey_id, cargo, seat in tickets.values_list(
+        "journey_id", "cargo", "seat"
+    ):
+        seats[journey_id].append((cargo, seat))
+    if not seats:
+        return
+    tickets_by_journey = Counter(
+        {journey_id: -len(taken) for journey_id, taken in seats.items()}
+    )
+    retractions = sales_retractions(tickets)
+    transaction.on_commit(
+        lambda: _uncount(tickets_by_journey, seats, retractions),
+        robust=True,
+    )
+
+
+def count_late_ticket(ticket) -> None:
+    transaction.on_commit(lambda: add_late_ticket(ticket), robust=True)
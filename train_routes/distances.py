@@ -0,0 +1,535 @@
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from train_routes.models import Route, Station
+
+
+MAGIC = b"RDLANDMK"
+
+HEADER = struct.Struct("<8sQQQ")
+
+UNREACHABLE = 2**31 - 1
+
+# Advisory lock serializing index writers across processes on Postgres
+INDEX_LOCK_KEY = 0x5244_4D41_5452_4958
+
+
+class DistancesNotBuilt(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = (
+        "Route distances are not built yet, run build_route_distances."
+    )
+    default_code = "route_distances_not_built"
+
+
+class Graph:
+    """
+    Directed route graph over station indexes in CSR form: the edges of
+    station ``v`` are ``targets`` and ``lengths`` from ``offsets[v]`` to
+    ``offsets[v + 1]``, one edge per pair with its shortest route.
+    """
+
+    def __init__(self, offsets, targets, lengths):
+        self.offsets = offsets
+        self.targets = targets
+        self.lengths = lengths
+        self.size = len(offsets) - 1
+
+    @classmethod
+    def from_edges(cls, size: int, edges: dict) -> "Graph":
+        offsets = array("q", [0]) * (size + 1)
+        for source, _ in edges:
+            offsets[source + 1] += 1
+        for station in range(size):
+            offsets[station + 1] += offsets[station]
+        targets = array("i", [0]) * len(edges)
+        lengths = array("i", [0]) * len(edges)
+        for position, ((source, destination), length) in enumerate(
+            sorted(edges.items())
+        ):
+            targets[position] = destination
+            lengths[position] = length
+        return cls(offsets, targets, lengths)
+
+    def edges(self) -> dict[tuple[int, int], int]:
+        return {
+            (source, self.targets[edge]): self.lengths[edge]
+            for source in range(self.size)
+            for edge in range(self.offsets[source], self.offsets[source + 1])
+        }
+
+    def reversed(self) -> "Graph":
+        return Graph.from_edges(
+            self.size,
+            {
+                (destination, source): length
+                for (source, destination), length in self.edges().items()
+            },
+        )
+
+    def length(self, source: int, destination: int) -> int:
+        for edge in range(self.offsets[source], self.offsets[source + 1]):
+            if self.targets[edge] == destination:
+                return self.lengths[edge]
+        return UNREACHABLE
+
+
+def _relax(graph: Graph, row, queue) -> None:
+    """Dijkstra over ``graph`` from the stations queued as (distance, v)"""
+    offsets, targets, lengths = graph.offsets, graph.targets, graph.lengths
+    heapq.heapify(queue)
+    while queue:
+        distance, station = heapq.heappop(queue)
+        if distance > row[station]:
+            continue
+        for edge in range(offsets[station], offsets[station + 1]):
+            candidate = distance + lengths[edge]
+            neighbour = targets[edge]
+            if candidate < row[neighbour]:
+                row[neighbour] = candidate
+                heapq.heappush(queue, (candidate, neighbour))
+
+
+def shortest_row(graph: Graph, source: int) -> array:
+    row = array("i", [UNREACHABLE]) * graph.size
+    row[source] = 0
+    _relax(graph, row, [(0, source)])
+    return row
+
+
+class DistanceIndex:
+    """
+    Shortest distances between stations over the directed route graph,
+    answered by A* search with landmark (ALT) lower bounds.
+
+    ``ids`` holds the sorted station ids and ``graph`` the routes between
+    their indexes. For each of the ``landmarks`` (station indexes)
+    ``from_landmarks`` holds a row of distances from it and
+    ``to_landmarks`` a row of distances to it, UNREACHABLE without a
+    path. By the triangle inequality they bound the distance left from
+    any station to the destination from below. That takes
+    O(landmarks * stations + routes) space where all pairs would take
+    stations squared. On disk everything follows a small header, loaded
+    indexes are memory-mapped so worker processes share one copy.
+    """
+
+    def __init__(
+        self, ids, graph, landmarks, from_landmarks, to_landmarks
+    ):
+        self.ids = ids
+        self.graph = graph
+        self.landmarks = landmarks
+        self.from_landmarks = from_landmarks
+        self.to_landmarks = to_landmarks
+        self.size = len(ids)
+
+    @classmethod
+    def load(cls, path) -> "DistanceIndex":
+        with open(path, "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, size, landmarks, edges = HEADER.unpack_from(mapped)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a route distance index")
+        view = memoryview(mapped)
+        position = HEADER.size
+
+        def take(code, count):
+            nonlocal position
+            end = position + array(code).itemsize * count
+            part = view[position:end].cast(code)
+            position = end
+            return part
+
+        ids = take("q", size)
+        graph = Graph(take("q", size + 1), take("i", edges), take("i", edges))
+        return cls(
+            ids,
+            graph,
+            take("i", landmarks),
+            take("i", landmarks * size),
+            take("i", landmarks * size),
+        )
+
+    def save(self, path) -> None:
+        """Write next to ``path`` and swap it in, readers never see halves"""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=directory, suffix=".tmp", delete=False
+        ) as file:
+            file.write(
+                HEADER.pack(
+                    MAGIC,
+                    self.size,
+                    len(self.landmarks),
+                    len(self.graph.targets),
+                )
+            )
+            for part in (
+                self.ids,
+                self.graph.offsets,
+                self.graph.targets,
+                self.graph.lengths,
+                self.landmarks,
+                self.from_landmarks,
+                self.to_landmarks,
+            ):
+                file.write(part.tobytes())
+        os.replace(file.name, path)
+
+    def index(self, station_id: int):
+        position = bisect_left(self.ids, station_id)
+        if position < self.size and self.ids[position] == station_id:
+            return position
+        return None
+
+    def from_row(self, landmark: int):
+        return self.from_landmarks[
+            landmark * self.size:(landmark + 1) * self.size
+        ]
+
+    def to_row(self, landmark: int):
+        return self.to_landmarks[
+            landmark * self.size:(landmark + 1) * self.size
+        ]
+
+    def _bounds(self, destination: int):
+        """(from v, to v) rows with the destination's distances per landmark"""
+        bounds = []
+        for landmark in range(len(self.landmarks)):
+            from_row, to_row = self.from_row(landmark), self.to_row(landmark)
+            bounds.append(
+                (from_row, from_row[destination], to_row, to_row[destination])
+            )
+        return bounds
+
+    def distance(self, source_id: int, destination_id: int):
+        """Shortest distance in km, None without a path"""
+        source = self.index(source_id)
+        destination = self.index(destination_id)
+        if source is None or destination is None:
+            return None
+        if source == destination:
+            return 0
+        bounds = self._bounds(destination)
+        for from_row, from_target, to_row, to_target in bounds:
+            # A landmark reaching the source but not the destination, or
+            # reached from the destination but not the source
+            if (
+                from_row[source] != UNREACHABLE
+                and from_target == UNREACHABLE
+                or to_target != UNREACHABLE
+                and to_row[source] == UNREACHABLE
+            ):
+                return None
+
+        def estimate(station):
+            best = 0
+            for from_row, from_target, to_row, to_target in bounds:
+                from_station = from_row[station]
+                if (
+                    from_target != UNREACHABLE
+                    and from_station != UNREACHABLE
+                ):
+                    best = max(best, from_target - from_station)
+                to_station = to_row[station]
+                if to_station != UNREACHABLE and to_target != UNREACHABLE:
+                    best = max(best, to_station - to_target)
+            return best
+
+        graph = self.graph
+        offsets, targets, lengths = graph.offsets, graph.targets, graph.lengths
+        found = {source: 0}
+        queue = [(estimate(source), 0, source)]
+        while queue:
+            _, distance, station = heapq.heappop(queue)
+            if station == destination:
+                return distance
+            if distance > found[station]:
+                continue
+            for edge in range(offsets[station], offsets[station + 1]):
+                neighbour = targets[edge]
+                candidate = distance + lengths[edge]
+                if candidate < found.get(neighbour, UNREACHABLE):
+                    found[neighbour] = candidate
+                    heapq.heappush(
+                        queue,
+                        (
+                            candidate + estimate(neighbour),
+                            candidate,
+                            neighbour,
+                        ),
+                    )
+        return None
+
+
+def _route_graph(ids) -> Graph:
+    """Shortest direct route between every pair of stations, by index"""
+    positions = {station_id: index for index, station_id in enumerate(ids)}
+    edges = {}
+    for source_id, destination_id, distance in Route.objects.values_list(
+        "source_id", "destination_id", "distance"
+    ):
+        source = positions.get(source_id)
+        destination = positions.get(destination_id)
+        if source is None or destination is None or source == destination:
+            continue
+        pair = (source, destination)
+        edges[pair] = min(edges.get(pair, UNREACHABLE), distance)
+    return Graph.from_edges(len(ids), edges)
+
+
+def _landmark_rows(graph, reverse, landmarks):
+    from_landmarks, to_landmarks = array("i"), array("i")
+    for landmark in landmarks:
+        from_landmarks.extend(shortest_row(graph, landmark))
+        to_landmarks.extend(shortest_row(reverse, landmark))
+    return from_landmarks, to_landmarks
+
+
+def _pick_landmarks(graph, reverse, count: int) -> array:
+    """
+    Farthest-first landmarks: each is the station with routes farthest
+    from the ones picked so far, unreachable ones first, so every part
+    of the network gets one.
+    """
+    connected = [
+        graph.offsets[v] != graph.offsets[v + 1]
+        or reverse.offsets[v] != reverse.offsets[v + 1]
+        for v in range(graph.size)
+    ]
+    nearest = [UNREACHABLE if linked else -1 for linked in connected]
+    landmarks = array("i")
+    while len(landmarks) < count:
+        candidate = max(range(graph.size), key=nearest.__getitem__, default=0)
+        if not graph.size or nearest[candidate] <= 0:
+            break
+        landmarks.append(candidate)
+        forward = shortest_row(graph, candidate)
+        backward = shortest_row(reverse, candidate)
+        for station, linked in enumerate(connected):
+            if linked:
+                nearest[station] = min(
+                    nearest[station], forward[station], backward[station]
+                )
+    return landmarks
+
+
+def build_distance_index(landmark_ids=None) -> DistanceIndex:
+    """
+    Route graph and ROUTE_DISTANCE_LANDMARKS landmarks with their rows,
+    two Dijkstra runs per landmark. ``landmark_ids`` picks them instead.
+    """
+    ids = array("q", sorted(Station.objects.values_list("id", flat=True)))
+    graph = _route_graph(ids)
+    reverse = graph.reversed()
+    if landmark_ids is None:
+        landmarks = _pick_landmarks(
+            graph, reverse, settings.ROUTE_DISTANCE_LANDMARKS
+        )
+    else:
+        positions = {station_id: index for index, station_id in enumerate(ids)}
+        landmarks = array("i", (positions[id_] for id_ in landmark_ids))
+    return DistanceIndex(
+        ids, graph, landmarks, *_landmark_rows(graph, reverse, landmarks)
+    )
+
+
+def _update_rows(rows, landmarks, graph, shorter, longer) -> array:
+    """
+    Bring the rows of ``landmarks`` to ``graph`` after the ``shorter``
+    edges got shorter and the ``longer`` ones longer or removed, both
+    given as (source, destination, old length) in the row direction.
+
+    A row is recomputed when a longer edge lay on one of its shortest
+    paths, otherwise shorter edges are relaxed into it.
+    """
+    size = graph.size
+    updated = array("i")
+    for number, landmark in enumerate(landmarks):
+        row = array("i", rows[number * size:(number + 1) * size])
+        if any(
+            row[source] != UNREACHABLE
+            and row[source] + length == row[destination]
+            for source, destination, length in longer
+        ):
+            row = shortest_row(graph, landmark)
+        else:
+            queue = []
+            for source, destination, _ in shorter:
+                length = graph.length(source, destination)
+                if (
+                    row[source] != UNREACHABLE
+                    and row[source] + length < row[destination]
+                ):
+                    row[destination] = row[source] + length
+                    queue.append((row[destination], destination))
+            _relax(graph, row, queue)
+        updated.extend(row)
+    return updated
+
+
+def _apply_changes(stored, graph, pairs) -> DistanceIndex:
+    """``stored`` brought from its route graph to ``graph``"""
+    shorter, longer = [], []
+    for source, destination in pairs:
+        old = stored.graph.length(source, destination)
+        new = graph.length(source, destination)
+        if new < old:
+            shorter.append((source, destination, old))
+        elif new > old:
+            longer.append((source, destination, old))
+
+    def reverse(edges):
+        return [
+            (destination, source, old) for source, destination, old in edges
+        ]
+
+    landmarks = array("i", stored.landmarks)
+    return DistanceIndex(
+        array("q", stored.ids),
+        graph,
+        landmarks,
+        _update_rows(stored.from_landmarks, landmarks, graph, shorter, longer),
+        _update_rows(
+            stored.to_landmarks,
+            landmarks,
+            graph.reversed(),
+            reverse(shorter),
+            reverse(longer),
+        ),
+    )
+
+
+_writer_lock = threading.Lock()
+
+
+@contextmanager
+def _index_lock():
+    """
+    One index writer at a time, across processes through a session
+    advisory lock on Postgres, within this process elsewhere.
+    """
+    with _writer_lock:
+        if connection.vendor != "postgresql":
+            yield
+            return
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", [INDEX_LOCK_KEY])
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT pg_advisory_unlock(%s)", [INDEX_LOCK_KEY]
+                )
+
+
+def rebuild_distance_index() -> DistanceIndex:
+    with _index_lock():
+        index = build_distance_index()
+        index.save(settings.ROUTE_DISTANCE_INDEX_PATH)
+    return index
+
+
+def update_distance_index(added=(), changed=()) -> None:
+    """
+    Bring the stored index up to date after routes were added between
+    the (source_id, destination_id) pairs in ``added`` and changed or
+    removed between those in ``changed``. Added or removed stations
+    rebuild it with the same landmarks where they are left, without a
+    stored index there is nothing to update until build_route_distances.
+    """
+    path = settings.ROUTE_DISTANCE_INDEX_PATH
+    with _index_lock():
+        try:
+            stored = DistanceIndex.load(path)
+        except (FileNotFoundError, ValueError):
+            return
+
+        ids = array("q", sorted(Station.objects.values_list("id", flat=True)))
+        if ids != array("q", stored.ids):
+            kept = set(ids)
+            landmark_ids = [
+                stored.ids[landmark]
+                for landmark in stored.landmarks
+                if stored.ids[landmark] in kept
+            ]
+            build_distance_index(landmark_ids or None).save(path)
+            return
+
+        pairs = {
+            (stored.index(source_id), stored.index(destination_id))
+            for source_id, destination_id in (*added, *changed)
+        }
+        _apply_changes(stored, _route_graph(ids), pairs).save(path)
+
+
+_executor = None
+
+_loaded = None
+
+_loaded_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ROUTE_DISTANCE_WORKERS,
+            thread_name_prefix="route-distances",
+        )
+    return _executor
+
+
+def get_distance_index() -> DistanceIndex:
+    """
+    Memory-mapped index of this process, remapped when another process
+    swapped in a new file. Raises DistancesNotBuilt (503) before
+    build_route_distances has run, requests never build it.
+    """
+    global _loaded
+    path = settings.ROUTE_DISTANCE_INDEX_PATH
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise DistancesNotBuilt()
+    version = (str(path), stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _loaded_lock:
+        if _loaded is None or _loaded[0] != version:
+            _loaded = (version, DistanceIndex.load(path))
+        return _loaded[1]
+
+
+def _run_in_worker(added, changed) -> None:
+    try:
+        update_distance_index(added, changed)
+    finally:
+        connection.close()
+
+
+def schedule_distance_update(added=(), changed=()) -> None:
+    """
+    Update the index for route changes once the transaction commits.
+    With ROUTE_DISTANCE_WORKERS = 0 the update runs inline.
+    """
+    added, changed = list(added), list(changed)
+    if settings.ROUTE_DISTANCE_WORKERS:
+        transaction.on_commit(
+            lambda: _get_executor().submit(_run_in_worker, added, changed)
+        )
+    else:
+        transaction.on_commit(lambda: update_distance_index(added, changed))
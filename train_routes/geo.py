@@ -0,0 +1,221 @@
+import copy
+import heapq
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import (
+    ASin,
+    Cos,
+    Least,
+    Power,
+    Radians,
+    Sin,
+    Sqrt,
+)
+
+from train_routes.models import Station
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+LEAF_SIZE = 16
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lon, radius_km) -> Q:
+    """
+    Latitude and longtitude ranges around the point, split in two
+    when the box crosses the antimeridian.
+    """
+    angle = radius_km / EARTH_RADIUS_KM
+    lat_delta = math.degrees(angle)
+    min_lat, max_lat = lat - lat_delta, lat + lat_delta
+    box = Q(latitude__range=(max(min_lat, -90), min(max_lat, 90)))
+    if min_lat <= -90 or max_lat >= 90 or angle >= math.pi / 2:
+        return box
+
+    lon_delta = math.degrees(
+        math.asin(min(1.0, math.sin(angle) / math.cos(math.radians(lat))))
+    )
+    min_lon, max_lon = lon - lon_delta, lon + lon_delta
+    if min_lon < -180:
+        return box & (
+            Q(longtitude__gte=min_lon + 360) | Q(longtitude__lte=max_lon)
+        )
+    if max_lon > 180:
+        return box & (
+            Q(longtitude__gte=min_lon) | Q(longtitude__lte=max_lon - 360)
+        )
+    return box & Q(longtitude__range=(min_lon, max_lon))
+
+
+def haversine_expression(lat, lon):
+    """Distance in km from the point to the station, computed in SQL"""
+    lat_radians, lon_radians = math.radians(lat), math.radians(lon)
+    a = Power(
+        Sin((Radians(F("latitude")) - Value(lat_radians)) / 2), 2
+    ) + Value(math.cos(lat_radians)) * Cos(Radians(F("latitude"))) * Power(
+        Sin((Radians(F("longtitude")) - Value(lon_radians)) / 2), 2
+    )
+    return Value(2 * EARTH_RADIUS_KM) * ASin(
+        Least(Value(1.0), Sqrt(a)), output_field=FloatField()
+    )
+
+
+def _unit_vector(lat, lon) -> tuple[float, float, float]:
+    lat, lon = math.radians(lat), math.radians(lon)
+    return (
+        math.cos(lat) * math.cos(lon),
+        math.cos(lat) * math.sin(lon),
+        math.sin(lat),
+    )
+
+
+def _chord(radius_km) -> float:
+    """Straight-line distance through the unit sphere for an arc length"""
+    angle = min(radius_km / EARTH_RADIUS_KM, math.pi)
+    return 2 * math.sin(angle / 2)
+
+
+class StationTree:
+    """
+    KD-tree over stations as points on the unit sphere, the straight-line
+    distance between them orders stations the same way as great-circle
+    distance and has no trouble at the poles or the antimeridian.
+
+    A node is either a leaf list of (point, station) or
+    an (axis, split, left, right) tuple.
+    """
+
+    def __init__(self, stations):
+        points = [
+            (_unit_vector(station.latitude, station.longtitude), station)
+            for station in stations
+        ]
+        self.size = len(points)
+        self.root = self._build(points, 0)
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def from_database(cls) -> "StationTree":
+        return cls(Station.objects.all())
+
+    def _build(self, points, depth):
+        if len(points) <= LEAF_SIZE:
+            return points
+        axis = depth % 3
+        points.sort(key=lambda item: item[0][axis])
+        middle = len(points) // 2
+        return (
+            axis,
+            points[middle][0][axis],
+            self._build(points[:middle], depth + 1),
+            self._build(points[middle:], depth + 1),
+        )
+
+    def is_stale(self) -> bool:
+        return time.monotonic() - self.built_at > settings.STATION_INDEX_TTL
+
+    def nearest(self, lat, lon, limit, radius_km=None) -> list[Station]:
+        """
+        Up to ``limit`` stations closest to the point, within ``radius_km``
+        if given. Every returned station is a copy carrying ``distance``.
+        """
+        target = _unit_vector(lat, lon)
+        bound = _chord(radius_km) ** 2 if radius_km is not None else 4.0
+        # Max-heap of (-squared chord, station id, station)
+        best = []
+
+        def visit(node):
+            nonlocal bound
+            if isinstance(node, list):
+                for point, station in node:
+                    distance = (
+                        (point[0] - target[0]) ** 2
+                        + (point[1] - target[1]) ** 2
+                        + (point[2] - target[2]) ** 2
+                    )
+                    if distance > bound:
+                        continue
+                    item = (-distance, -station.id, station)
+                    if len(best) < limit:
+                        heapq.heappush(best, item)
+                    else:
+                        heapq.heappushpop(best, item)
+                    if len(best) == limit:
+                        bound = -best[0][0]
+                return
+            axis, split, left, right = node
+            offset = target[axis] - split
+            near, far = (left, right) if offset < 0 else (right, left)
+            visit(near)
+            if offset * offset <= bound:
+                visit(far)
+
+        if limit > 0 and self.size:
+            visit(self.root)
+
+        stations = []
+        for _, _, station in sorted(best, reverse=True):
+            station = copy.copy(station)
+            station.distance = haversine_km(
+                lat, lon, station.latitude, station.longtitude
+            )
+            stations.append(station)
+        return stations
+
+
+_tree = None
+
+_tree_lock = threading.Lock()
+
+
+def get_station_tree() -> StationTree:
+    global _tree
+    tree = _tree
+    if tree is None or tree.is_stale():
+        with _tree_lock:
+            if _tree is None or _tree.is_stale():
+                _tree = StationTree.from_database()
+            tree = _tree
+    return tree
+
+
+def invalidate_station_tree() -> None:
+    global _tree
+    with _tree_lock:
+        _tree = None
+
+
+def _search_database(lat, lon, radius_km, limit):
+    """Bounding box on the indexed columns, haversine on what is left"""
+    return (
+        Station.objects.filter(bounding_box(lat, lon, radius_km))
+        .annotate(distance=haversine_expression(lat, lon))
+        .filter(distance__lte=radius_km)
+        .order_by("distance", "id")[:limit]
+    )
+
+
+def nearby_stations(lat, lon, limit, radius_km=None) -> list[Station]:
+    """
+    Stations closest to the point with their ``distance`` in km.
+
+    Radius queries go to the database unless STATION_NEARBY_IN_MEMORY
+    is set, plain k-nearest queries have no box to prefilter with and
+    always use StationTree.
+    """
+    if radius_km is not None and not settings.STATION_NEARBY_IN_MEMORY:
+        return list(_search_database(lat, lon, radius_km, limit))
+    return get_station_tree().nearest(lat, lon, limit, radius_km)
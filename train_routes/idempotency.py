@@ -0,0 +1,120 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from train_routes.models import IdempotencyKey
+
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+# Seconds between checks of a claim held by a request still in progress
+REPLAY_POLL_INTERVAL = 0.1
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "Idempotency-Key was already used for another request."
+    default_code = "idempotency_key_reused"
+
+
+class IdempotentRequestInProgress(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = (
+        "A request with this Idempotency-Key is still in progress."
+    )
+    default_code = "idempotent_request_in_progress"
+
+
+def request_fingerprint(request) -> str:
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    payload = f"{request.method}:{request.path}:{body}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _replay(record) -> Response:
+    response = Response(record.response, status=record.status_code)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(request, handler) -> Response:
+    """
+    Run ``handler`` once per user and Idempotency-Key header.
+
+    The key is claimed by committing a pending row before the handler
+    runs, outside any transaction of the handler, and the response is
+    stored once it succeeds. A duplicate arriving meanwhile waits up to
+    IDEMPOTENCY_REPLAY_WAIT for that response and gets 409 if it is
+    still pending, later ones replay the stored response. Failed
+    requests delete the claim so they can be retried with the key,
+    claims left pending for IDEMPOTENCY_PENDING_TIMEOUT by a crashed
+    worker are taken over.
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key:
+        return handler()
+    if len(key) > 255:
+        raise ValidationError(
+            {IDEMPOTENCY_HEADER: "must be at most 255 characters"}
+        )
+
+    user = request.user
+    fingerprint = request_fingerprint(request)
+    now = timezone.now()
+    IdempotencyKey.objects.filter(
+        Q(expires_at__lte=now)
+        | Q(
+            status_code__isnull=True,
+            created_at__lte=now - settings.IDEMPOTENCY_PENDING_TIMEOUT,
+        ),
+        user=user,
+        key=key,
+    ).delete()
+
+    deadline = (
+        time.monotonic() + settings.IDEMPOTENCY_REPLAY_WAIT.total_seconds()
+    )
+    while True:
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=user,
+                    key=key,
+                    fingerprint=fingerprint,
+                    expires_at=now + settings.IDEMPOTENCY_KEY_TTL,
+                )
+            break
+        except IntegrityError:
+            pass
+        claim = IdempotencyKey.objects.filter(user=user, key=key).first()
+        if claim is None:
+            # The request holding the key failed, claim it again
+            continue
+        if claim.fingerprint != fingerprint:
+            raise IdempotencyKeyReused()
+        if claim.status_code is not None:
+            return _replay(claim)
+        if time.monotonic() >= deadline:
+            raise IdempotentRequestInProgress()
+        time.sleep(REPLAY_POLL_INTERVAL)
+
+    try:
+        response = handler()
+    except BaseException:
+        record.delete()
+        raise
+    if status.is_success(response.status_code):
+        record.status_code = response.status_code
+        record.response = response.data
+        record.save(update_fields=["status_code", "response"])
+    else:
+        record.delete()
+    return response
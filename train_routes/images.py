@@ -0,0 +1,108 @@
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils.text import slugify
+from PIL import Image, ImageOps
+
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = os.path.join("uploads", "images", "variants")
+
+VARIANT_FORMATS = (
+    ("webp", "WEBP"),
+    ("jpg", "JPEG"),
+)
+
+_executor = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PIPELINE_WORKERS,
+            thread_name_prefix="train-images",
+        )
+    return _executor
+
+
+def variant_file_path(name: str, variant: str, content: bytes, extension):
+    """Build a content-hashed path so variants can be cached forever"""
+    digest = hashlib.sha256(content).hexdigest()[:16]
+    filename = f"{slugify(name)}-{variant}-{digest}.{extension}"
+
+    return os.path.join(VARIANTS_DIR, filename)
+
+
+def render_variants(name: str, image_file) -> dict[str, dict[str, str]]:
+    """Resize an image into every configured variant and format"""
+    with Image.open(image_file) as image:
+        image = ImageOps.exif_transpose(image).convert("RGB")
+
+    variants = {}
+    for variant, size in settings.IMAGE_VARIANT_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.Resampling.LANCZOS)
+        variants[variant] = {}
+        for extension, image_format in VARIANT_FORMATS:
+            buffer = BytesIO()
+            resized.save(
+                buffer,
+                image_format,
+                quality=settings.IMAGE_VARIANT_QUALITY,
+                optimize=True,
+            )
+            content = buffer.getvalue()
+            path = variant_file_path(name, variant, content, extension)
+            if not default_storage.exists(path):
+                path = default_storage.save(path, ContentFile(content))
+            variants[variant][extension] = path
+
+    return variants
+
+
+def build_train_variants(train_id: int) -> None:
+    """Render variants of the current train image and store their paths"""
+    from train_routes.models import Train
+
+    train = Train.objects.only("id", "name", "image").get(pk=train_id)
+    if not train.image:
+        return
+
+    with train.image.open("rb") as image_file:
+        variants = render_variants(train.name, image_file)
+
+    # A newer upload may have replaced the image while this one rendered
+    Train.objects.filter(pk=train_id, image=train.image.name).update(
+        image_variants=variants
+    )
+
+
+def _run_in_worker(train_id: int) -> None:
+    try:
+        build_train_variants(train_id)
+    except Exception:
+        logger.exception("Image variants failed for train %s", train_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_train_variants(train_id: int) -> None:
+    """
+    Queue variant rendering once the current transaction commits.
+    With IMAGE_PIPELINE_WORKERS = 0 variants are rendered inline.
+    """
+    if settings.IMAGE_PIPELINE_WORKERS:
+        transaction.on_commit(
+            lambda: _get_executor().submit(_run_in_worker, train_id)
+        )
+    else:
+        transaction.on_commit(lambda: build_train_variants(train_id))
@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from train_routes.archive import archive_past
+
+
+class Command(BaseCommand):
+    """
+    Django command to move past journeys, their orders, tickets and
+    crew assignments to the archive tables in short batches
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.ARCHIVE_AFTER.days,
+            help="Archive journeys that arrived this many days ago",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--max-batches",
+            type=int,
+            help="Stop after this many batches, the next run continues",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to sleep between batches",
+        )
+
+    def handle(self, *args, **options) -> None:
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        orders, journeys = archive_past(
+            cutoff,
+            batch_size=options["batch_size"],
+            max_batches=options["max_batches"],
+            pause=options["pause"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {orders} orders and {journeys} journeys "
+                f"that arrived before {cutoff:%Y-%m-%d}"
+            )
+        )
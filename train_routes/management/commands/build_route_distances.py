@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from train_routes.distances import rebuild_distance_index
+
+
+class Command(BaseCommand):
+    """Django command to rebuild the route distance index from scratch"""
+
+    def handle(self, *args, **options) -> None:
+        index = rebuild_distance_index()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Built distances between {index.size} stations "
+                f"with {len(index.landmarks)} landmarks"
+            )
+        )
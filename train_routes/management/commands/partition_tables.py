@@ -0,0 +1,73 @@
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from train_routes.partitioning import (
+    PARTITIONED_MODELS,
+    convert_table,
+    default_first_month,
+    detach_partitions,
+    ensure_partitions,
+)
+
+
+def _month(value: str):
+    return datetime.strptime(value, "%Y-%m").date()
+
+
+class Command(BaseCommand):
+    """
+    Django command to keep the journey and ticket tables partitioned by
+    departure month: creates upcoming partitions and detaches old ones
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--convert",
+            action="store_true",
+            help="Partition tables that are not yet, existing rows become "
+            "their legacy partition",
+        )
+        parser.add_argument(
+            "--first-month",
+            type=_month,
+            help="YYYY-MM of the first monthly partition when converting, "
+            "the month after the last departure by default",
+        )
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=settings.PARTITION_MONTHS_AHEAD,
+        )
+        parser.add_argument(
+            "--detach-older-than",
+            type=int,
+            default=settings.PARTITION_RETENTION_MONTHS,
+            help="Detach partitions that ended this many months ago",
+        )
+
+    def handle(self, *args, **options) -> None:
+        if connection.vendor != "postgresql":
+            raise CommandError("Table partitioning needs PostgreSQL")
+
+        if options["convert"]:
+            first_month = options["first_month"] or default_first_month()
+            for model in PARTITIONED_MODELS:
+                if convert_table(model, first_month):
+                    self.stdout.write(
+                        f"Partitioned {model._meta.db_table} "
+                        f"from {first_month:%Y-%m}"
+                    )
+
+        created = ensure_partitions(options["months_ahead"])
+        detached = []
+        if options["detach_older_than"] is not None:
+            detached = detach_partitions(options["detach_older_than"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {len(created)} partitions, "
+                f"detached {len(detached)}"
+            )
+        )
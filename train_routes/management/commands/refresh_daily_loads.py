@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from train_routes.analytics import refresh_daily_loads
+
+
+class Command(BaseCommand):
+    """Django command to rebuild the daily load rollup from journeys"""
+
+    def handle(self, *args, **options) -> None:
+        refreshed = refresh_daily_loads()
+        self.stdout.write(
+            self.style.SUCCESS(f"Refreshed {refreshed} daily load rows")
+        )
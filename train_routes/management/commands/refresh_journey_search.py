@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from train_routes.search import refresh_journey_search
+
+
+class Command(BaseCommand):
+    """Django command to rebuild the denormalized journey search table"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options) -> None:
+        refreshed = refresh_journey_search(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Refreshed {refreshed} journey search rows")
+        )
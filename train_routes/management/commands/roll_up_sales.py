@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from train_routes.analytics import (
+    reset_sales_rollup,
+    roll_up_sales,
+    sales_watermark,
+)
+
+
+class Command(BaseCommand):
+    """
+    Django command to fold new orders into the daily sales rollup,
+    an interrupted run resumes from the last committed batch
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--max-batches",
+            type=int,
+            help="Stop after this many batches, the next run resumes",
+        )
+        parser.add_argument(
+            "--backfill",
+            action="store_true",
+            help="Drop the rollup and rebuild it from the first order",
+        )
+
+    def handle(self, *args, **options) -> None:
+        if options["backfill"]:
+            reset_sales_rollup()
+        processed = roll_up_sales(
+            batch_size=options["batch_size"],
+            max_batches=options["max_batches"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rolled up {processed} orders, "
+                f"high-water mark at order {sales_watermark()}"
+            )
+        )
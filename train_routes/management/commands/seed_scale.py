@@ -0,0 +1,105 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from train_routes.analytics import refresh_daily_loads, roll_up_sales
+from train_routes.partitioning import ensure_partitions
+from train_routes.search import refresh_journey_search
+from train_routes.seeding import ScaleSeeder
+
+
+class Command(BaseCommand):
+    """
+    Django command to generate stations, a connected route graph,
+    trains, a timetable, crew and sold tickets at production scale
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stations", type=int, default=1000)
+        parser.add_argument(
+            "--neighbours",
+            type=int,
+            default=3,
+            help="Tracks from each station to its nearest stations",
+        )
+        parser.add_argument(
+            "--trains-per-type",
+            type=int,
+            default=25,
+            help="Trains of every train type, the types are created "
+            "when there are none",
+        )
+        parser.add_argument(
+            "--start",
+            type=date.fromisoformat,
+            default=date.today(),
+            help="First day of the timetable, YYYY-MM-DD",
+        )
+        parser.add_argument("--days", type=int, default=30)
+        parser.add_argument("--journeys-per-day", type=int, default=200)
+        parser.add_argument("--crew", type=int, default=500)
+        parser.add_argument("--crew-per-journey", type=int, default=2)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument(
+            "--load-factor",
+            type=float,
+            default=0.6,
+            help="Average share of the seats of a journey that is sold",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument(
+            "--skip-derived",
+            action="store_true",
+            help="Leave journey search rows and rollups for later",
+        )
+
+    def handle(self, *args, **options) -> None:
+        if not 0 <= options["load_factor"] <= 1:
+            raise CommandError("--load-factor must be between 0 and 1")
+        if options["stations"] < 2 or options["users"] < 1:
+            raise CommandError("Seeding needs 2 stations and 1 user")
+        started = time.perf_counter()
+
+        start = options["start"]
+        if connection.vendor == "postgresql":
+            # Monthly partitions of the timetable, if the tables have them
+            last_day = start + timedelta(days=options["days"])
+            ensure_partitions(
+                (last_day.year - start.year) * 12
+                + last_day.month
+                - start.month,
+                today=start,
+            )
+
+        seeder = ScaleSeeder(
+            seed=options["seed"], batch_size=options["batch_size"]
+        )
+        written = seeder.run(
+            stations=options["stations"],
+            neighbours=options["neighbours"],
+            trains_per_type=options["trains_per_type"],
+            start=start,
+            days=options["days"],
+            journeys_per_day=options["journeys_per_day"],
+            crew=options["crew"],
+            crew_per_journey=options["crew_per_journey"],
+            users=options["users"],
+            load_factor=options["load_factor"],
+        )
+        for name, count in written.items():
+            self.stdout.write(f"{count:>12} {name}")
+
+        if not options["skip_derived"]:
+            refresh_journey_search(batch_size=options["batch_size"])
+            refresh_daily_loads()
+            roll_up_sales(batch_size=options["batch_size"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded in {time.perf_counter() - started:.1f}s, "
+                "run build_route_distances for the distance index"
+            )
+        )
@@ -0,0 +1,159 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags
+from django.views.decorators.http import require_safe
+
+from train_routes.images import VARIANTS_DIR
+from train_routes.uploads import IMAGES_DIR
+
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+CHUNK_SIZE = 64 * 2**10
+
+# Image variants named by variant_file_path with a content digest
+VARIANT_PATH = rf"{re.escape(VARIANTS_DIR)}/[-\w]+-[0-9a-f]{{16}}\.\w+"
+
+# Uploaded originals named by their sha256, uploads in progress excluded
+ORIGINAL_PATH = rf"{re.escape(IMAGES_DIR)}/[0-9a-f]{{64}}\.\w+"
+
+HASHED_PATH = rf"(?:{VARIANT_PATH}|{ORIGINAL_PATH})"
+
+HASHED_PATH_RE = re.compile(HASHED_PATH)
+
+
+def _file_etag(stat) -> str:
+    """Build the validator from mtime and size instead of the content"""
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Weak comparison of If-None-Match, lists and * included"""
+    etags = parse_etags(header)
+    return "*" in etags or any(
+        candidate.removeprefix("W/") == etag for candidate in etags
+    )
+
+
+def _parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Return the inclusive byte range of a single-range header"""
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    start, end = match.groups()
+    if start == "":
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    if start > end or start >= size:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+
+def _read_range(file, start: int, length: int):
+    with file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _offload_response(path, full_path, content_type) -> HttpResponse:
+    """Let the proxy in front of Django send the file"""
+    header = settings.MEDIA_OFFLOAD_HEADER
+    response = HttpResponse(content_type=content_type)
+    if header == "X-Accel-Redirect":
+        response[header] = settings.MEDIA_OFFLOAD_PREFIX + path
+    else:
+        response[header] = full_path
+    return response
+
+
+def _file_response(request, full_path, stat, content_type):
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if range_header and if_range not in (None, _file_etag(stat)):
+        range_header = None
+
+    try:
+        byte_range = range_header and _parse_range(range_header, stat.st_size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{stat.st_size}"
+        return response
+
+    if not byte_range:
+        response = FileResponse(
+            open(full_path, "rb"), content_type=content_type
+        )
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            _read_range(open(full_path, "rb"), start, length),
+            status=206,
+            content_type=content_type,
+        )
+        response["Content-Length"] = str(length)
+        response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve content-hashed images, originals and variants, from MEDIA_ROOT.
+
+    Behind a proxy configured with MEDIA_OFFLOAD_HEADER the file transfer
+    is handed off with X-Accel-Redirect or X-Sendfile, otherwise the file
+    is streamed with ETag, conditional and range request support.
+    Their names change with their content, so they are cached as
+    immutable. Other media, uploads in progress included, is not served.
+    """
+    if not HASHED_PATH_RE.fullmatch(path):
+        raise Http404("File does not exist")
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404("File does not exist")
+    if not os.path.isfile(full_path):
+        raise Http404("File does not exist")
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or "application/octet-stream"
+    etag = _file_etag(stat)
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        response = HttpResponseNotModified()
+    elif settings.MEDIA_OFFLOAD_HEADER:
+        response = _offload_response(path, full_path, content_type)
+    else:
+        response = _file_response(request, full_path, stat, content_type)
+        if encoding:
+            response["Content-Encoding"] = encoding
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    response["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    return response
@@ -0,0 +1,306 @@
+import hashlib
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from drf_spectacular.utils import extend_schema
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+
+SECONDS_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql: str) -> str:
+    """Statement with placeholders, literals and IN lists collapsed"""
+    sql = LITERAL.sub("?", sql.replace("%s", "?"))
+    return WHITESPACE.sub(" ", IN_LIST.sub("(...)", sql)).strip()
+
+
+@lru_cache(maxsize=2048)
+def statement_digest(statement: str) -> str:
+    """Short label for a fingerprint, its text is served separately"""
+    return hashlib.sha1(statement.encode()).hexdigest()[:12]
+
+
+class Histogram:
+    """Prometheus histogram, ``counts[i]`` holds values up to buckets[i]"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        """(le, cumulative count) pairs ending with +Inf"""
+        total = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            total += count
+            yield bound, total
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.duration = Histogram(SECONDS_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_time = Histogram(SECONDS_BUCKETS)
+        self.render_time = Histogram(SECONDS_BUCKETS)
+        # fingerprint -> [times slowest, max seconds]
+        self.statements = {}
+
+
+HISTOGRAMS = (
+    ("duration", "request_duration_seconds", "Time spent in the request"),
+    ("queries", "request_db_queries", "Database queries per request"),
+    ("db_time", "request_db_seconds", "Database time per request"),
+    (
+        "render_time",
+        "response_render_seconds",
+        "Time spent serializing the response body",
+    ),
+)
+
+
+def _label(value) -> str:
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+class QueryMetrics:
+    """
+    Per-endpoint request metrics of this process. Every worker process
+    keeps its own, scrape them per process.
+    """
+
+    def __init__(self):
+        self.endpoints = {}
+        self.lock = threading.Lock()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.endpoints = {}
+
+    def record(self, endpoint, recorder, duration, render_time) -> None:
+        slowest = None
+        if recorder.slowest_sql is not None:
+            slowest = fingerprint(recorder.slowest_sql)
+        with self.lock:
+            metrics = self.endpoints.get(endpoint)
+            if metrics is None:
+                metrics = self.endpoints[endpoint] = EndpointMetrics()
+            metrics.duration.observe(duration)
+            metrics.queries.observe(recorder.queries)
+            metrics.db_time.observe(recorder.db_time)
+            metrics.render_time.observe(render_time)
+            if slowest is not None:
+                self._add_statement(
+                    metrics.statements, slowest, recorder.slowest_time
+                )
+
+    @staticmethod
+    def _add_statement(statements, statement, seconds) -> None:
+        entry = statements.get(statement)
+        if entry is not None:
+            entry[0] += 1
+            entry[1] = max(entry[1], seconds)
+            return
+        limit = settings.QUERY_METRICS_SLOW_STATEMENTS
+        if len(statements) >= limit:
+            fastest = min(statements, key=lambda key: statements[key][1])
+            if statements[fastest][1] >= seconds:
+                return
+            del statements[fastest]
+        statements[statement] = [1, seconds]
+
+    def render(self) -> str:
+        prefix = settings.QUERY_METRICS_PREFIX
+        with self.lock:
+            endpoints = sorted(self.endpoints.items())
+            lines = []
+            for attribute, name, description in HISTOGRAMS:
+                name = f"{prefix}_{name}"
+                lines += [
+                    f"# HELP {name} {description}",
+                    f"# TYPE {name} histogram",
+                ]
+                for endpoint, metrics in endpoints:
+                    histogram = getattr(metrics, attribute)
+                    label = f'endpoint="{_label(endpoint)}"'
+                    for bound, count in histogram.samples():
+                        lines.append(
+                            f'{name}_bucket{{{label},le="{bound}"}} {count}'
+                        )
+                    lines += [
+                        f"{name}_sum{{{label}}} {histogram.sum}",
+                        f"{name}_count{{{label}}} {histogram.count}",
+                    ]
+
+            seconds_name = f"{prefix}_slowest_statement_seconds"
+            total_name = f"{prefix}_slowest_statement_total"
+            seconds_lines = [
+                f"# HELP {seconds_name} Longest run of statements slowest "
+                "in their request, by fingerprint digest",
+                f"# TYPE {seconds_name} gauge",
+            ]
+            total_lines = [
+                f"# HELP {total_name} Requests whose slowest statement had "
+                "the fingerprint",
+                f"# TYPE {total_name} counter",
+            ]
+            for endpoint, metrics in endpoints:
+                for statement, (times, seconds) in sorted(
+                    metrics.statements.items(), key=lambda item: -item[1][1]
+                ):
+                    labels = (
+                        f'endpoint="{_label(endpoint)}",'
+                        f'fingerprint="{statement_digest(statement)}"'
+                    )
+                    seconds_lines.append(
+                        f"{seconds_name}{{{labels}}} {seconds}"
+                    )
+                    total_lines.append(f"{total_name}{{{labels}}} {times}")
+            lines += seconds_lines + total_lines
+        return "\n".join(lines) + "\n"
+
+    def statements(self) -> dict[str, str]:
+        """Fingerprints of the slowest statements by digest"""
+        with self.lock:
+            return {
+                statement_digest(statement): statement
+                for metrics in self.endpoints.values()
+                for statement in metrics.statements
+            }
+
+
+query_metrics = QueryMetrics()
+
+
+class QueryRecorder:
+    """execute_wrapper counting and timing the queries of one request"""
+
+    __slots__ = ("queries", "db_time", "slowest_sql", "slowest_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest_sql = None
+        self.slowest_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db_time += elapsed
+            if elapsed >= self.slowest_time:
+                self.slowest_sql, self.slowest_time = sql, elapsed
+
+
+def endpoint_name(request) -> str:
+    """ViewSet.action of DRF views, the URL name of others"""
+    match = request.resolver_match
+    if match is None:
+        return "unmatched"
+    view = match.func
+    view_class = getattr(view, "cls", None)
+    method = request.method.lower()
+    if view_class is None:
+        return match.view_name or view.__name__
+    actions = getattr(view, "actions", None) or {}
+    return f"{view_class.__name__}.{actions.get(method, method)}"
+
+
+class QueryMetricsMiddleware:
+    """
+    Records query count, database time, the slowest statement and the
+    render time of every request into ``query_metrics``. Only two clock
+    reads are added per query, statements are fingerprinted once per
+    request and the lock is taken once per request.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        query_metrics.record(
+            endpoint_name(request),
+            recorder,
+            time.perf_counter() - started,
+            getattr(request, "render_time", 0.0),
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        started = time.perf_counter()
+
+        def rendered(response):
+            request.render_time = time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class MetricsView(APIView):
+    """Request metrics of this process in the Prometheus text format"""
+
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(exclude=True)
+    def get(self, request):
+        return HttpResponse(
+            query_metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE
+        )
+
+
+class StatementsView(APIView):
+    """
+    Statement fingerprints behind the fingerprint labels of the slowest
+    statement metrics, kept out of the labels to bound their size.
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(exclude=True)
+    def get(self, request):
+        return Response(query_metrics.statements())
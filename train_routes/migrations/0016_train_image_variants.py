@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('train_routes', '0015_alter_ticket_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='train',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:54
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('train_routes', '0016_train_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='ticket',
+            unique_together={('journey', 'cargo', 'seat')},
+        ),
+    ]
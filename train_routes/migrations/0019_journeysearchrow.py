@@ -0,0 +1,66 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_journey_search(apps, schema_editor):
+    Journey = apps.get_model("train_routes", "Journey")
+    JourneySearchRow = apps.get_model("train_routes", "JourneySearchRow")
+    journeys = Journey.objects.select_related(
+        "route__source", "route__destination", "train"
+    ).annotate(tickets_taken=models.Count("tickets"))
+    JourneySearchRow.objects.bulk_create(
+        (
+            JourneySearchRow(
+                journey_id=journey.id,
+                source_name=journey.route.source.name,
+                destination_name=journey.route.destination.name,
+                distance=journey.route.distance,
+                train_name=journey.train.name,
+                departure_time=journey.departure_time,
+                arrival_time=journey.arrival_time,
+                tickets_taken=journey.tickets_taken,
+                tickets_available=(
+                    journey.train.places_in_cargo - journey.tickets_taken
+                ),
+                cargo_num_available=(
+                    journey.train.cargo_num - journey.tickets_taken
+                ),
+            )
+            for journey in journeys.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('train_routes', '0018_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JourneySearchRow',
+            fields=[
+                ('journey', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_row', serialize=False, to='train_routes.journey')),
+                ('source_name', models.CharField(max_length=100)),
+                ('destination_name', models.CharField(max_length=100)),
+                ('distance', models.IntegerField()),
+                ('train_name', models.CharField(max_length=100)),
+                ('departure_time', models.DateTimeField()),
+                ('arrival_time', models.DateTimeField()),
+                ('tickets_taken', models.IntegerField(default=0)),
+                ('tickets_available', models.IntegerField()),
+                ('cargo_num_available', models.IntegerField()),
+            ],
+            options={
+                'ordering': ['journey_id'],
+                'indexes': [models.Index(fields=['departure_time'], include=('destination_name', 'distance', 'train_name', 'arrival_time', 'tickets_available', 'cargo_num_available'), name='journey_search_departure_idx'), models.Index(fields=['train_name', 'departure_time'], include=('destination_name', 'distance', 'arrival_time', 'tickets_available', 'cargo_num_available'), name='journey_search_train_idx')],
+            },
+        ),
+        migrations.RunPython(
+            fill_journey_search, migrations.RunPython.noop, elidable=True
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:03
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def fill_popularity(apps, schema_editor):
+    Station = apps.get_model("train_routes", "Station")
+    Journey = apps.get_model("train_routes", "Journey")
+    journeys = (
+        Journey.objects.filter(
+            models.Q(route__source=models.OuterRef("pk"))
+            | models.Q(route__destination=models.OuterRef("pk"))
+        )
+        .order_by()
+        .annotate(count=models.Func("id", function="COUNT"))
+        .values("count")
+    )
+    Station.objects.update(popularity=models.Subquery(journeys))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('train_routes', '0019_journeysearchrow'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='station',
+            name='popularity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(
+            fill_popularity, migrations.RunPython.noop, elidable=True
+        ),
+        migrations.AddIndex(
+            model_name='station',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='station_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='station',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='text_pattern_ops'), name='station_name_prefix_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('train_routes', '0020_station_popularity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='station',
+            index=models.Index(fields=['latitude', 'longtitude'], name='train_route_latitud_2d696b_idx'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def fill_daily_loads(apps, schema_editor):
+    Journey = apps.get_model("train_routes", "Journey")
+    DailyLoad = apps.get_model("train_routes", "DailyLoad")
+    loads = (
+        Journey.objects.annotate(day=TruncDate("departure_time"))
+        .values("day", "train_id", "route_id")
+        .annotate(
+            journey_count=models.Count("id", distinct=True),
+            tickets_sold=models.Count("tickets"),
+            seats=models.Max(
+                models.F("train__cargo_num")
+                * models.F("train__places_in_cargo")
+            ),
+        )
+        .order_by()
+    )
+    DailyLoad.objects.bulk_create(
+        (
+            DailyLoad(
+                day=load["day"],
+                train_id=load["train_id"],
+                route_id=load["route_id"],
+                journeys=load["journey_count"],
+                tickets_sold=load["tickets_sold"],
+                capacity=load["journey_count"] * load["seats"],
+            )
+            for load in loads.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('train_routes', '0021_station_coordinates_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyLoad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('journeys', models.PositiveIntegerField(default=0)),
+                ('tickets_sold', models.PositiveIntegerField(default=0)),
+                ('capacity', models.PositiveIntegerField(default=0)),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_loads', to='train_routes.route')),
+                ('train', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_loads', to='train_routes.train')),
+            ],
+            options={
+                'ordering': ['day', 'train', 'route'],
+                'unique_together': {('day', 'train', 'route')},
+            },
+        ),
+        migrations.RunPython(
+            fill_daily_loads, migrations.RunPython.noop, elidable=True
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('train_routes', '0022_dailyload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('tickets', models.PositiveIntegerField(default=0)),
+                ('passenger_km', models.PositiveBigIntegerField(default=0)),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='train_routes.route')),
+                ('train_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='train_routes.traintype')),
+            ],
+            options={
+                'verbose_name_plural': 'daily sales',
+                'ordering': ['day', 'route', 'train_type'],
+                'unique_together': {('day', 'route', 'train_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:29
+
+from django.db import migrations, models
+
+
+BATCH_SIZE = 10000
+
+
+def fill_departure_times(apps, schema_editor):
+    Journey = apps.get_model("train_routes", "Journey")
+    Ticket = apps.get_model("train_routes", "Ticket")
+    last_id = Ticket.objects.aggregate(last_id=models.Max("id"))["last_id"]
+    departure = Journey.objects.filter(
+        id=models.OuterRef("journey_id")
+    ).values("departure_time")[:1]
+    # Non-atomic migration, every batch commits on its own
+    for start in range(0, (last_id or 0) + 1, BATCH_SIZE):
+        Ticket.objects.filter(
+            id__gte=start,
+            id__lt=start + BATCH_SIZE,
+            departure_time__isnull=True,
+        ).update(departure_time=models.Subquery(departure))
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('train_routes', '0023_dailysales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='departure_time',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            fill_departure_times, migrations.RunPython.noop, elidable=True
+        ),
+    ]
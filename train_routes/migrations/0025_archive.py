@@ -0,0 +1,64 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('train_routes', '0024_ticket_departure_time'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedJourney',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('source_name', models.CharField(max_length=100)),
+                ('destination_name', models.CharField(max_length=100)),
+                ('train_name', models.CharField(max_length=100)),
+                ('departure_time', models.DateTimeField()),
+                ('arrival_time', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('crew', models.ManyToManyField(related_name='archived_journeys', to='train_routes.crew')),
+                ('route', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='train_routes.route')),
+                ('train', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='train_routes.train')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedTicket',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('journey_id', models.BigIntegerField()),
+                ('cargo', models.IntegerField()),
+                ('seat', models.IntegerField()),
+                ('source_name', models.CharField(max_length=100)),
+                ('destination_name', models.CharField(max_length=100)),
+                ('train_name', models.CharField(max_length=100)),
+                ('departure_time', models.DateTimeField()),
+                ('arrival_time', models.DateTimeField()),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tickets', to='train_routes.archivedorder')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
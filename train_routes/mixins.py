@@ -0,0 +1,101 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _params_to_set(value: str | None) -> set[str] | None:
+    """Convert a comma separated string to a set of names"""
+    if not value:
+        return None
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+class DynamicFieldsSerializerMixin:
+    """
+    Trim serializer output to the fields listed in the ``fields`` context
+    and replace relations listed in the ``expand`` context with the nested
+    serializers declared in ``Meta.expandable_fields``.
+
+    Only the serializer created by the view receives the context at
+    construction time, so nested serializers are rendered unchanged.
+    Unknown names in ``fields`` are rejected with a ValidationError.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get("fields")
+        expand = self.context.get("expand") or set()
+        expandable = getattr(self.Meta, "expandable_fields", {})
+
+        for name in expand & set(expandable):
+            if fields is not None and name not in fields:
+                continue
+            serializer_class, options = expandable[name]
+            self.fields[name] = serializer_class(read_only=True, **options)
+
+        if fields is not None:
+            unknown = ", ".join(sorted(fields - set(self.fields)))
+            if unknown:
+                raise ValidationError(
+                    {"fields": [f"Unknown fields: {unknown}."]}
+                )
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
+
+class SparseFieldsetMixin:
+    """
+    Parse ``?fields=`` and ``?expand=`` on safe requests, pass them to the
+    serializer and let ``get_queryset`` skip joins and columns nobody asked
+    for.
+    """
+
+    @property
+    def requested_fields(self) -> set[str] | None:
+        request = getattr(self, "request", None)
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        return _params_to_set(request.query_params.get("fields"))
+
+    @property
+    def expanded_fields(self) -> set[str]:
+        request = getattr(self, "request", None)
+        if request is None or request.method not in SAFE_METHODS:
+            return set()
+        return _params_to_set(request.query_params.get("expand")) or set()
+
+    def is_field_requested(self, name: str) -> bool:
+        fields = self.requested_fields
+        return fields is None or name in fields
+
+    def is_field_expanded(self, name: str) -> bool:
+        return name in self.expanded_fields and self.is_field_requested(name)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["fields"] = self.requested_fields
+        context["expand"] = self.expanded_fields
+        return context
+
+    def defer_unrequested(self, queryset):
+        """Load only the columns that back the requested fields"""
+        if self.requested_fields is None:
+            return queryset
+
+        model = queryset.model
+        columns = {model._meta.pk.name}
+        serializer = self.get_serializer()
+        for field in serializer.fields.values():
+            if field.source == "*":
+                return queryset
+            name = field.source.split(".")[0]
+            if name in queryset.query.annotations:
+                continue
+            try:
+                model_field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                return queryset
+            if model_field.concrete:
+                columns.add(model_field.name)
+
+        return queryset.only(*columns)
@@ -1,6 +1,10 @@
 import os
 import uuid
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models.functions import Upper
+from django.dispatch import Signal
 from django.utils.text import slugify
 from train_service import settings
 
@@ -16,12 +20,27 @@ class Station(models.Model):
     name = models.CharField(max_length=100)
     latitude = models.FloatField()
     longtitude = models.FloatField()
+    # Number of journeys from or to the station, ranks autocomplete
+    popularity = models.PositiveIntegerField(default=0)
 
     class Meta:
         verbose_name_plural = "stations"
         ordering = [
             "name",
         ]
+        indexes = [
+            models.Index(fields=["latitude", "longtitude"]),
+            # pg_trgm similarity and case-insensitive prefix autocomplete
+            GinIndex(
+                fields=["name"],
+                opclasses=["gin_trgm_ops"],
+                name="station_name_trgm_idx",
+            ),
+            models.Index(
+                OpClass(Upper("name"), name="text_pattern_ops"),
+                name="station_name_prefix_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.name
@@ -72,6 +91,7 @@ class Train(models.Model):
         related_name="trains",
     )
     image = models.ImageField(null=True, upload_to=image_file_path)
+    image_variants = models.JSONField(default=dict, blank=True)
 
     def __str__(self) -> str:
         return self.name
@@ -129,6 +149,18 @@ class Order(models.Model):
         return f"Order {self.id} by {self.user.username}"
 
 
+# Sent with a queryset of tickets in the transaction about to delete them.
+# Delete receivers on Ticket would turn off fast deletes by cascade
+tickets_deleting = Signal()
+
+
+class TicketQuerySet(models.QuerySet):
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            tickets_deleting.send(sender=Ticket, tickets=self)
+            return super().delete()
+
+
 class Ticket(models.Model):
     cargo = models.IntegerField()
     seat = models.IntegerField()
@@ -142,9 +174,20 @@ class Ticket(models.Model):
         on_delete=models.CASCADE,
         related_name="tickets"
     )
+    # Copy of journey.departure_time, the partition key of the ticket table
+    departure_time = models.DateTimeField(null=True, editable=False)
+
+    objects = TicketQuerySet.as_manager()
 
     class Meta:
-        unique_together = ("journey", "seat")
+        unique_together = ("journey", "cargo", "seat")
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            tickets_deleting.send(
+                sender=Ticket, tickets=Ticket.objects.filter(pk=self.pk)
+            )
+            return super().delete(*args, **kwargs)
 
     @staticmethod
     def validate_ticket(
@@ -170,7 +213,255 @@ class Ticket(models.Model):
 
     def save(self, *args, **kwargs) -> None:
         self.full_clean()
+        self.departure_time = self.journey.departure_time
         return super(Ticket, self).save(*args, **kwargs)
 
     def __str__(self):
         return f"Ticket {self.id} for Journey {self.journey}"
+
+
+def journey_ticket_count(**filters) -> models.Subquery:
+    """
+    Tickets of the outer journey matching ``filters``, as a subquery.
+    Count("tickets") would GROUP BY the journey id alone, which Postgres
+    rejects once partitioning makes (id, departure_time) the primary key.
+    """
+    return models.Subquery(
+        Ticket.objects.filter(journey=models.OuterRef("pk"), **filters)
+        .order_by()
+        .annotate(count=models.Func("id", function="COUNT"))
+        .values("count"),
+        output_field=models.IntegerField(),
+    )
+
+
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="idempotency_keys"
+    )
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("user", "key")
+        indexes = [models.Index(fields=["expires_at"])]
+
+    def __str__(self):
+        return f"Idempotency key {self.key} of {self.user}"
+
+
+class JourneySearchRow(models.Model):
+    """Denormalized copy of the journey list, kept in sync by signals"""
+
+    journey = models.OneToOneField(
+        Journey,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_row"
+    )
+    source_name = models.CharField(max_length=100)
+    destination_name = models.CharField(max_length=100)
+    distance = models.IntegerField()
+    train_name = models.CharField(max_length=100)
+    departure_time = models.DateTimeField()
+    arrival_time = models.DateTimeField()
+    tickets_taken = models.IntegerField(default=0)
+    tickets_available = models.IntegerField()
+    cargo_num_available = models.IntegerField()
+
+    class Meta:
+        ordering = [
+            "journey_id",
+        ]
+        indexes = [
+            models.Index(
+                fields=["departure_time"],
+                include=[
+                    "destination_name",
+                    "distance",
+                    "train_name",
+                    "arrival_time",
+                    "tickets_available",
+                    "cargo_num_available",
+                ],
+                name="journey_search_departure_idx",
+            ),
+            models.Index(
+                fields=["train_name", "departure_time"],
+                include=[
+                    "destination_name",
+                    "distance",
+                    "arrival_time",
+                    "tickets_available",
+                    "cargo_num_available",
+                ],
+                name="journey_search_train_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"Search row of journey {self.journey_id}"
+
+
+class DailyLoad(models.Model):
+    """Tickets sold and seats offered per departure day, train and route"""
+
+    day = models.DateField()
+    train = models.ForeignKey(
+        Train,
+        on_delete=models.CASCADE,
+        related_name="daily_loads"
+    )
+    route = models.ForeignKey(
+        Route,
+        on_delete=models.CASCADE,
+        related_name="daily_loads"
+    )
+    journeys = models.PositiveIntegerField(default=0)
+    tickets_sold = models.PositiveIntegerField(default=0)
+    capacity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("day", "train", "route")
+        ordering = [
+            "day",
+            "train",
+            "route",
+        ]
+
+    def __str__(self) -> str:
+        return f"Load of {self.train_id} on {self.route_id} at {self.day}"
+
+
+class DailySales(models.Model):
+    """Orders, tickets and passenger-km sold per day, route and train type"""
+
+    day = models.DateField()
+    route = models.ForeignKey(
+        Route,
+        on_delete=models.CASCADE,
+        related_name="daily_sales"
+    )
+    train_type = models.ForeignKey(
+        TrainType,
+        on_delete=models.CASCADE,
+        related_name="daily_sales"
+    )
+    # Orders with at least one ticket in the group
+    orders = models.PositiveIntegerField(default=0)
+    tickets = models.PositiveIntegerField(default=0)
+    passenger_km = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "daily sales"
+        unique_together = ("day", "route", "train_type")
+        ordering = [
+            "day",
+            "route",
+            "train_type",
+        ]
+
+    def __str__(self) -> str:
+        return f"Sales of {self.route_id}/{self.train_type_id} at {self.day}"
+
+
+class RollupWatermark(models.Model):
+    """Last source row folded into a rollup table"""
+
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.name} up to {self.last_id}"
+
+
+class ArchivedJourney(models.Model):
+    """
+    Journey moved out of the live tables by archive_past_journeys,
+    with the names it was shown under. Keeps its Journey id.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    route = models.ForeignKey(
+        Route,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+"
+    )
+    train = models.ForeignKey(
+        Train,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+"
+    )
+    source_name = models.CharField(max_length=100)
+    destination_name = models.CharField(max_length=100)
+    train_name = models.CharField(max_length=100)
+    departure_time = models.DateTimeField()
+    arrival_time = models.DateTimeField()
+    crew = models.ManyToManyField(Crew, related_name="archived_journeys")
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = [
+            "id",
+        ]
+
+    def __str__(self) -> str:
+        return f"Archived journey {self.id}"
+
+
+class ArchivedOrder(models.Model):
+    """Order moved out of the live tables, still shown to its owner"""
+
+    id = models.BigIntegerField(primary_key=True)
+    created_at = models.DateTimeField()
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="archived_orders"
+    )
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = [
+            "-created_at",
+        ]
+
+    def __str__(self):
+        return f"Archived order {self.id}"
+
+
+class ArchivedTicket(models.Model):
+    """Ticket of an archived order with a copy of its journey's details"""
+
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(
+        ArchivedOrder,
+        on_delete=models.CASCADE,
+        related_name="tickets"
+    )
+    # Live or archived journey
+    journey_id = models.BigIntegerField()
+    cargo = models.IntegerField()
+    seat = models.IntegerField()
+    source_name = models.CharField(max_length=100)
+    destination_name = models.CharField(max_length=100)
+    train_name = models.CharField(max_length=100)
+    departure_time = models.DateTimeField()
+    arrival_time = models.DateTimeField()
+
+    class Meta:
+        ordering = [
+            "id",
+        ]
+
+    def __str__(self):
+        return f"Archived ticket {self.id} of order {self.order_id}"
@@ -0,0 +1,367 @@
+import re
+from datetime import date
+
+from django.db import connection, transaction
+from django.db.models import Max
+
+from train_routes.models import Journey, Ticket
+
+
+PARTITION_KEY = "departure_time"
+
+# Journey goes first, converting it drops the foreign keys into its table
+PARTITIONED_MODELS = (Journey, Ticket)
+
+MONTHLY_PARTITION = re.compile(r"_p(\d{4})_(\d{2})$")
+
+LEGACY_BOUND = re.compile(r"TO \('(\d{4})-(\d{2})-01")
+
+
+def qn(name: str) -> str:
+    return connection.ops.quote_name(name)
+
+
+def month_start(day: date) -> date:
+    return date(day.year, day.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def legacy_name(table: str) -> str:
+    return f"{table}_legacy"
+
+
+def default_name(table: str) -> str:
+    return f"{table}_default"
+
+
+def _unique_columns(model) -> list[tuple[str, ...]]:
+    """Primary key first, then unique_together, as column names"""
+    meta = model._meta
+    uniques = [(meta.pk.column,)]
+    for fields in meta.unique_together:
+        uniques.append(tuple(meta.get_field(name).column for name in fields))
+    return uniques
+
+
+def _with_key(columns) -> str:
+    return ", ".join(qn(column) for column in (*columns, PARTITION_KEY))
+
+
+def _unique_index(table: str, number: int) -> str:
+    return f"{table}_part_uniq{number}"
+
+
+def unique_index_sql(model) -> list[str]:
+    """
+    Unique indexes extended by the partition key, built without blocking
+    writes and taken over by the constraints of the partitioned table.
+    """
+    table = model._meta.db_table
+    return [
+        f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "
+        f"{qn(_unique_index(table, number))} ON {qn(table)} "
+        f"({_with_key(columns)})"
+        for number, columns in enumerate(_unique_columns(model))
+    ]
+
+
+def range_check_sql(table: str, first_month: date) -> list[str]:
+    """
+    Check that lets the table be attached below ``first_month`` without
+    a scan under lock, validating it only blocks schema changes.
+    """
+    check = qn(f"{table}_legacy_range")
+    key = qn(PARTITION_KEY)
+    return [
+        f"ALTER TABLE {qn(table)} ADD CONSTRAINT {check} CHECK "
+        f"({key} IS NOT NULL AND {key} < '{first_month.isoformat()}') "
+        f"NOT VALID",
+        f"ALTER TABLE {qn(table)} VALIDATE CONSTRAINT {check}",
+    ]
+
+
+def partition_sql(table: str, month: date) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {qn(partition_name(table, month))} "
+        f"PARTITION OF {qn(table)} FOR VALUES "
+        f"FROM ('{month.isoformat()}') "
+        f"TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def default_partition_sql(table: str) -> str:
+    """Partition catching rows past the monthly ones"""
+    return (
+        f"CREATE TABLE IF NOT EXISTS {qn(default_name(table))} "
+        f"PARTITION OF {qn(table)} DEFAULT"
+    )
+
+
+def parent_index_sql(indexdef: str, table: str) -> str:
+    """
+    Recreate an index of the legacy table on the partitioned table,
+    Postgres attaches the matching legacy index instead of building it.
+    """
+    return re.sub(
+        r"^CREATE INDEX \S+ ON (ONLY )?\S+ ",
+        f"CREATE INDEX ON {qn(table)} ",
+        indexdef,
+    )
+
+
+def is_partitioned(cursor, table: str) -> bool:
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+        "WHERE partrelid = to_regclass(%s))",
+        [table],
+    )
+    return cursor.fetchone()[0]
+
+
+def _partitions(cursor, table: str) -> list[tuple[str, str]]:
+    cursor.execute(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+        "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(%s)",
+        [table],
+    )
+    return cursor.fetchall()
+
+
+def _constraint_exists(cursor, table: str, name: str) -> bool:
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_constraint "
+        "WHERE conrelid = to_regclass(%s) AND conname = %s)",
+        [table, name],
+    )
+    return cursor.fetchone()[0]
+
+
+def default_first_month() -> date:
+    """Month after the last scheduled departure, or this month"""
+    latest = Journey.objects.aggregate(latest=Max(PARTITION_KEY))["latest"]
+    current = month_start(date.today())
+    if latest is None:
+        return current
+    return max(current, add_months(month_start(latest.date()), 1))
+
+
+def _swap(cursor, model, first_month: date) -> None:
+    """
+    Rename the table to its legacy name and attach it as the partition
+    of everything before ``first_month``, all under one short lock.
+    """
+    meta = model._meta
+    table, legacy = meta.db_table, legacy_name(meta.db_table)
+    pk, key = qn(meta.pk.column), qn(PARTITION_KEY)
+    uniques = _unique_columns(model)
+    cursor.execute(f"LOCK TABLE {qn(table)} IN ACCESS EXCLUSIVE MODE")
+
+    # A partitioned table offers no unique id to reference
+    cursor.execute(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+        "WHERE contype = 'f' AND confrelid = to_regclass(%s)",
+        [table],
+    )
+    for referencing, name in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE {referencing} DROP CONSTRAINT {qn(name)}")
+
+    cursor.execute(
+        "SELECT pg_get_indexdef(indexrelid) FROM pg_index "
+        "WHERE indrelid = to_regclass(%s) AND NOT indisunique",
+        [table],
+    )
+    indexes = [row[0] for row in cursor.fetchall()]
+    partitioned = {
+        name
+        for other in PARTITIONED_MODELS
+        for name in (other._meta.db_table, legacy_name(other._meta.db_table))
+    }
+    cursor.execute(
+        "SELECT conname, confrelid::regclass::text, "
+        "pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE contype = 'f' AND conrelid = to_regclass(%s)",
+        [table],
+    )
+    foreign_keys = [
+        (name, definition)
+        for name, referenced, definition in cursor.fetchall()
+        if referenced not in partitioned
+    ]
+    cursor.execute(
+        "SELECT conname FROM pg_constraint "
+        "WHERE contype = 'p' AND conrelid = to_regclass(%s)",
+        [table],
+    )
+    primary_key = qn(cursor.fetchone()[0])
+    cursor.execute(f"SELECT COALESCE(MAX({pk}), 0) + 1 FROM {qn(table)}")
+    next_id = cursor.fetchone()[0]
+
+    # The validated range check makes SET NOT NULL skip its scan
+    cursor.execute(f"ALTER TABLE {qn(table)} ALTER COLUMN {key} SET NOT NULL")
+    cursor.execute(
+        f"ALTER TABLE {qn(table)} DROP CONSTRAINT {primary_key}, "
+        f"ADD CONSTRAINT {primary_key} PRIMARY KEY USING INDEX "
+        f"{qn(_unique_index(table, 0))}"
+    )
+    for number in range(1, len(uniques)):
+        index = qn(_unique_index(table, number))
+        cursor.execute(
+            f"ALTER TABLE {qn(table)} ADD CONSTRAINT {index} "
+            f"UNIQUE USING INDEX {index}"
+        )
+    sequence = qn(f"{table}_{meta.pk.column}_seq")
+    cursor.execute(
+        f"ALTER TABLE {qn(table)} ALTER COLUMN {pk} DROP IDENTITY IF EXISTS"
+    )
+    cursor.execute(f"ALTER TABLE {qn(table)} ALTER COLUMN {pk} DROP DEFAULT")
+    cursor.execute(f"DROP SEQUENCE IF EXISTS {sequence}")
+    cursor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}")
+
+    cursor.execute(
+        f"CREATE TABLE {qn(table)} (LIKE {qn(legacy)} INCLUDING DEFAULTS) "
+        f"PARTITION BY RANGE ({key})"
+    )
+    cursor.execute(f"CREATE SEQUENCE {sequence} OWNED BY {qn(table)}.{pk}")
+    cursor.execute("SELECT setval(%s, %s, false)", [sequence, next_id])
+    cursor.execute(
+        f"ALTER TABLE {qn(table)} ALTER COLUMN {pk} "
+        f"SET DEFAULT nextval('{sequence}')"
+    )
+    for number, columns in enumerate(uniques):
+        kind = "PRIMARY KEY" if number == 0 else "UNIQUE"
+        cursor.execute(
+            f"ALTER TABLE {qn(table)} ADD {kind} ({_with_key(columns)})"
+        )
+    cursor.execute(
+        f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(legacy)} "
+        f"FOR VALUES FROM (MINVALUE) TO ('{first_month.isoformat()}')"
+    )
+    cursor.execute(default_partition_sql(table))
+    for indexdef in indexes:
+        cursor.execute(parent_index_sql(indexdef, table))
+    for name, definition in foreign_keys:
+        cursor.execute(
+            f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}"
+        )
+
+
+def convert_table(model, first_month: date) -> bool:
+    """
+    Turn the table of ``model`` into one range-partitioned by month on
+    its departure time. The existing rows stay where they are, as the
+    legacy partition, so the only exclusive lock is held for catalog
+    changes. Must run outside a transaction, False if already done.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if is_partitioned(cursor, table):
+            return False
+        for statement in unique_index_sql(model):
+            cursor.execute(statement)
+        if not _constraint_exists(cursor, table, f"{table}_legacy_range"):
+            for statement in range_check_sql(table, first_month):
+                cursor.execute(statement)
+    with transaction.atomic(), connection.cursor() as cursor:
+        _swap(cursor, model, first_month)
+    return True
+
+
+def _legacy_end(cursor, table: str):
+    for name, bound in _partitions(cursor, table):
+        match = LEGACY_BOUND.search(bound)
+        if name == legacy_name(table) and match:
+            return date(int(match[1]), int(match[2]), 1)
+    return None
+
+
+def _create_partition(cursor, table: str, month: date) -> None:
+    """
+    Monthly partition of ``table``, taking over the rows the default
+    partition caught for that month
+    """
+    default, key = qn(default_name(table)), qn(PARTITION_KEY)
+    bounds = [month.isoformat(), add_months(month, 1).isoformat()]
+    in_month = f"{key} >= %s AND {key} < %s"
+    cursor.execute(
+        f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {in_month})", bounds
+    )
+    if not cursor.fetchone()[0]:
+        cursor.execute(partition_sql(table, month))
+        return
+
+    partition = qn(partition_name(table, month))
+    with transaction.atomic():
+        cursor.execute(
+            f"CREATE TABLE {partition} (LIKE {qn(table)} INCLUDING DEFAULTS)"
+        )
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {default} WHERE {in_month} "
+            f"RETURNING *) INSERT INTO {partition} SELECT * FROM moved",
+            bounds,
+        )
+        cursor.execute(
+            f"ALTER TABLE {qn(table)} ATTACH PARTITION {partition} "
+            f"FOR VALUES FROM ('{bounds[0]}') TO ('{bounds[1]}')"
+        )
+
+
+def ensure_partitions(months_ahead: int, today=None) -> list[str]:
+    """
+    Monthly partitions from this month, or the end of the legacy
+    partition, through ``months_ahead`` months. Journeys departing later
+    than that go to the default partition, its rows move to their
+    monthly partition once it is created.
+    """
+    current = month_start(today or date.today())
+    horizon = add_months(current, months_ahead)
+    created = []
+    with connection.cursor() as cursor:
+        for model in PARTITIONED_MODELS:
+            table = model._meta.db_table
+            if not is_partitioned(cursor, table):
+                continue
+            cursor.execute(default_partition_sql(table))
+            existing = {name for name, _ in _partitions(cursor, table)}
+            month = max(current, _legacy_end(cursor, table) or current)
+            while month <= horizon:
+                if partition_name(table, month) not in existing:
+                    _create_partition(cursor, table, month)
+                    created.append(partition_name(table, month))
+                month = add_months(month, 1)
+    return created
+
+
+def detach_partitions(older_than_months: int, today=None) -> list[str]:
+    """
+    Detach monthly partitions that ended ``older_than_months`` months
+    ago without blocking queries, the tables are kept for archiving.
+    Must run outside a transaction.
+    """
+    cutoff = add_months(month_start(today or date.today()), -older_than_months)
+    detached = []
+    with connection.cursor() as cursor:
+        for model in PARTITIONED_MODELS:
+            table = model._meta.db_table
+            if not is_partitioned(cursor, table):
+                continue
+            for name, _ in sorted(_partitions(cursor, table)):
+                match = MONTHLY_PARTITION.search(name)
+                if not match:
+                    continue
+                month = date(int(match[1]), int(match[2]), 1)
+                if add_months(month, 1) <= cutoff:
+                    cursor.execute(
+                        f"ALTER TABLE {qn(table)} "
+                        f"DETACH PARTITION {qn(name)} CONCURRENTLY"
+                    )
+                    detached.append(name)
+    return detached
@@ -0,0 +1,224 @@
+import cProfile
+import itertools
+import marshal
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse
+from django.utils import timezone
+from drf_spectacular.utils import extend_schema
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from train_routes.metrics import endpoint_name
+
+
+CPROFILE = "cprofile"
+
+SAMPLER = "sampler"
+
+# cProfile hooks every thread of the process and refuses to run twice at
+# once, so it profiles one request at a time
+cprofile_lock = threading.Lock()
+
+
+class StackSampler:
+    """
+    Statistical profiler: a daemon thread records the stack of the
+    profiled thread every ``interval`` seconds as collapsed stacks.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.thread.ident is not None:
+            self.thread.join()
+
+    def _run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_filename}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+
+class RequestProfile:
+    def __init__(self, request, duration, mode, data):
+        self.id = None
+        self.created_at = timezone.now()
+        self.endpoint = endpoint_name(request)
+        self.method = request.method
+        self.path = request.path
+        self.query_params = request.GET.dict()
+        self.duration = duration
+        self.mode = mode
+        # pstats dict for cProfile, collapsed stack counts for the sampler
+        self.data = data
+
+    @property
+    def format(self) -> str:
+        return "pstats" if self.mode == CPROFILE else "collapsed"
+
+    def content(self) -> bytes:
+        """A file pstats.Stats loads, or collapsed stacks for flamegraphs"""
+        if self.mode == CPROFILE:
+            return marshal.dumps(self.data)
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.data.items()
+        ).encode()
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "created_at": self.created_at,
+            "endpoint": self.endpoint,
+            "method": self.method,
+            "path": self.path,
+            "query_params": self.query_params,
+            "duration": self.duration,
+            "format": self.format,
+        }
+
+
+class ProfileBuffer:
+    """The latest slow request profiles of this process"""
+
+    def __init__(self):
+        self.ids = itertools.count(1)
+        self.profiles = deque(maxlen=settings.REQUEST_PROFILING_BUFFER)
+        self.lock = threading.Lock()
+
+    def add(self, profile) -> None:
+        with self.lock:
+            profile.id = next(self.ids)
+            self.profiles.append(profile)
+
+    def get(self, profile_id: int):
+        with self.lock:
+            for profile in self.profiles:
+                if profile.id == profile_id:
+                    return profile
+        return None
+
+    def all(self) -> list[RequestProfile]:
+        with self.lock:
+            return list(reversed(self.profiles))
+
+    def clear(self) -> None:
+        with self.lock:
+            self.profiles.clear()
+
+
+request_profiles = ProfileBuffer()
+
+
+class RequestProfilerMiddleware:
+    """
+    Profiles REQUEST_PROFILING_SAMPLE_RATE of the requests under
+    REQUEST_PROFILING_PATHS and keeps those slower than
+    REQUEST_PROFILING_THRESHOLD seconds. Off unless enabled. In cProfile
+    mode, requests arriving while another one is profiled are not.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.path.startswith(
+            tuple(settings.REQUEST_PROFILING_PATHS)
+        ) or random.random() >= settings.REQUEST_PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        mode = settings.REQUEST_PROFILING_MODE
+        if mode != CPROFILE:
+            return self._profile(
+                request,
+                mode,
+                StackSampler(settings.REQUEST_PROFILING_INTERVAL),
+            )
+        if not cprofile_lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self._profile(request, mode, cProfile.Profile())
+        finally:
+            cprofile_lock.release()
+
+    def _profile(self, request, mode, profiler):
+        started = time.perf_counter()
+        try:
+            if mode == CPROFILE:
+                profiler.enable()
+            else:
+                profiler.start()
+            return self.get_response(request)
+        finally:
+            duration = time.perf_counter() - started
+            if mode == CPROFILE:
+                profiler.disable()
+            else:
+                profiler.stop()
+            if duration >= settings.REQUEST_PROFILING_THRESHOLD:
+                if mode == CPROFILE:
+                    profiler.create_stats()
+                    data = profiler.stats
+                else:
+                    data = profiler.stacks
+                request_profiles.add(
+                    RequestProfile(request, duration, mode, data)
+                )
+
+
+class ProfileListView(APIView):
+    """Slow request profiles kept by this process, latest first"""
+
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(exclude=True)
+    def get(self, request):
+        return Response(
+            [profile.summary() for profile in request_profiles.all()]
+        )
+
+
+class ProfileDownloadView(APIView):
+    """Download one profile as a pstats or a collapsed stacks file"""
+
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(exclude=True)
+    def get(self, request, profile_id):
+        profile = request_profiles.get(profile_id)
+        if profile is None:
+            raise Http404()
+        if profile.mode == CPROFILE:
+            content_type = "application/octet-stream"
+            filename = f"request-{profile.id}.prof"
+        else:
+            content_type = "text/plain; charset=utf-8"
+            filename = f"request-{profile.id}.collapsed"
+        response = HttpResponse(profile.content(), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
@@ -0,0 +1,76 @@
+from django.db.models import F
+
+from train_routes.models import (
+    Journey,
+    JourneySearchRow,
+    journey_ticket_count,
+)
+
+
+SEARCH_ROW_FIELDS = (
+    "source_name",
+    "destination_name",
+    "distance",
+    "train_name",
+    "departure_time",
+    "arrival_time",
+    "tickets_taken",
+    "tickets_available",
+    "cargo_num_available",
+)
+
+
+def _search_rows(journeys):
+    for journey in journeys:
+        yield JourneySearchRow(
+            journey_id=journey.id,
+            source_name=journey.route.source.name,
+            destination_name=journey.route.destination.name,
+            distance=journey.route.distance,
+            train_name=journey.train.name,
+            departure_time=journey.departure_time,
+            arrival_time=journey.arrival_time,
+            tickets_taken=journey.tickets_taken,
+            tickets_available=(
+                journey.train.places_in_cargo - journey.tickets_taken
+            ),
+            cargo_num_available=(
+                journey.train.cargo_num - journey.tickets_taken
+            ),
+        )
+
+
+def refresh_journey_search(journey_ids=None, batch_size=1000) -> int:
+    """
+    Recompute search rows from the source tables,
+    all journeys when ``journey_ids`` is None.
+    """
+    journeys = Journey.objects.select_related(
+        "route__source", "route__destination", "train"
+    ).annotate(tickets_taken=journey_ticket_count()).order_by("id")
+    if journey_ids is not None:
+        journeys = journeys.filter(id__in=journey_ids)
+
+    refreshed = 0
+    last_id = 0
+    while True:
+        batch = list(journeys.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return refreshed
+        JourneySearchRow.objects.bulk_create(
+            _search_rows(batch),
+            update_conflicts=True,
+            unique_fields=["journey"],
+            update_fields=SEARCH_ROW_FIELDS,
+        )
+        refreshed += len(batch)
+        last_id = batch[-1].id
+
+
+def adjust_tickets_taken(journey_id: int, count: int) -> None:
+    """Move ``count`` seats between free and taken without a recount"""
+    JourneySearchRow.objects.filter(journey_id=journey_id).update(
+        tickets_taken=F("tickets_taken") + count,
+        tickets_available=F("tickets_available") - count,
+        cargo_num_available=F("cargo_num_available") - count,
+    )
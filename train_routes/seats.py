@@ -0,0 +1,162 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from train_routes.booking import SeatUnavailable, book_tickets
+from train_routes.models import Ticket
+
+
+def _run_starts(bits: int, length: int) -> int:
+    """Bits set where a run of ``length`` set bits starts"""
+    run, covered = bits, 1
+    while covered < length and run:
+        step = min(covered, length - covered)
+        run &= run >> step
+        covered += step
+    return run
+
+
+class SeatMap:
+    """
+    Free seats of one journey, one integer bitset per cargo where bit
+    ``seat - 1`` is set while the seat is free.
+    """
+
+    def __init__(self, cargo_num, places_in_cargo, taken=()):
+        self.places_in_cargo = places_in_cargo
+        self.free = [(1 << places_in_cargo) - 1] * cargo_num
+        self.built_at = time.monotonic()
+        self.lock = threading.Lock()
+        for cargo, seat in taken:
+            self.free[cargo - 1] &= ~(1 << (seat - 1))
+
+    @classmethod
+    def from_journey(cls, journey) -> "SeatMap":
+        taken = Ticket.objects.filter(journey=journey).values_list(
+            "cargo", "seat"
+        )
+        return cls(
+            journey.train.cargo_num, journey.train.places_in_cargo, taken
+        )
+
+    def is_stale(self) -> bool:
+        return time.monotonic() - self.built_at > settings.SEAT_MAP_TTL
+
+    def free_count(self) -> int:
+        return sum(bits.bit_count() for bits in self.free)
+
+    def allocate(self, count: int) -> list[tuple[int, int]]:
+        """
+        Take ``count`` free seats, adjacent seats in one cargo if possible,
+        otherwise filling the emptiest cargos first.
+        """
+        with self.lock:
+            if count > self.free_count():
+                raise SeatUnavailable("Not enough free seats on the journey.")
+
+            for index, bits in enumerate(self.free):
+                run = _run_starts(bits, count)
+                if run:
+                    start = (run & -run).bit_length() - 1
+                    self.free[index] &= ~(((1 << count) - 1) << start)
+                    return [
+                        (index + 1, seat + 1)
+                        for seat in range(start, start + count)
+                    ]
+
+            seats = []
+            cargos = sorted(
+                range(len(self.free)),
+                key=lambda index: self.free[index].bit_count(),
+                reverse=True,
+            )
+            for index in cargos:
+                while self.free[index] and len(seats) < count:
+                    lowest = self.free[index] & -self.free[index]
+                    self.free[index] ^= lowest
+                    seats.append((index + 1, lowest.bit_length()))
+                if len(seats) == count:
+                    break
+            return seats
+
+    def take(self, seats) -> None:
+        with self.lock:
+            for cargo, seat in seats:
+                if cargo <= len(self.free) and seat <= self.places_in_cargo:
+                    self.free[cargo - 1] &= ~(1 << (seat - 1))
+
+    def release(self, seats) -> None:
+        with self.lock:
+            for cargo, seat in seats:
+                if cargo <= len(self.free) and seat <= self.places_in_cargo:
+                    self.free[cargo - 1] |= 1 << (seat - 1)
+
+
+_seat_maps: OrderedDict[int, SeatMap] = OrderedDict()
+
+_seat_maps_lock = threading.Lock()
+
+
+def get_seat_map(journey) -> SeatMap:
+    """Return the cached seat map of a journey, rebuilt after SEAT_MAP_TTL"""
+    with _seat_maps_lock:
+        seat_map = _seat_maps.get(journey.id)
+        if seat_map is not None and not seat_map.is_stale():
+            _seat_maps.move_to_end(journey.id)
+            return seat_map
+
+    seat_map = SeatMap.from_journey(journey)
+    with _seat_maps_lock:
+        _seat_maps[journey.id] = seat_map
+        while len(_seat_maps) > settings.SEAT_MAP_CACHE_SIZE:
+            _seat_maps.popitem(last=False)
+    return seat_map
+
+
+def clear_seat_maps() -> None:
+    with _seat_maps_lock:
+        _seat_maps.clear()
+
+
+def take_seats(journey_id: int, seats) -> None:
+    """Mark seats booked elsewhere as taken in a cached journey"""
+    with _seat_maps_lock:
+        seat_map = _seat_maps.get(journey_id)
+    if seat_map is not None:
+        seat_map.take(seats)
+
+
+def release_seats(journey_id: int, seats) -> None:
+    """Return seats of a cached journey to its free pool"""
+    with _seat_maps_lock:
+        seat_map = _seat_maps.get(journey_id)
+    if seat_map is not None:
+        seat_map.release(seats)
+
+
+def book_free_seats(user, journey, count: int):
+    """
+    Book ``count`` seats chosen by the journey seat map.
+
+    The map may lag behind other workers, seats that book_tickets reports
+    as sold stay taken in the map and the allocation is retried.
+    """
+    seat_map = get_seat_map(journey)
+    for attempt in range(settings.BOOKING_MAX_RETRIES + 1):
+        seats = seat_map.allocate(count)
+        tickets = [
+            {"journey": journey, "cargo": cargo, "seat": seat}
+            for cargo, seat in seats
+        ]
+        try:
+            return book_tickets(user, tickets)
+        except SeatUnavailable as error:
+            sold = {(cargo, seat) for _, cargo, seat in error.seats}
+            seat_map.release(set(seats) - sold)
+            if not sold or attempt == settings.BOOKING_MAX_RETRIES:
+                raise
+        except Exception:
+            seat_map.release(seats)
+            raise
@@ -0,0 +1,473 @@
+import random
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import Max
+
+from train_routes.geo import StationTree, haversine_km
+from train_routes.models import (
+    Crew,
+    Journey,
+    Order,
+    Route,
+    Station,
+    Ticket,
+    Train,
+    TrainType,
+)
+
+
+# Stations are scattered around hubs inside Europe
+REGION = ((36.0, 60.0), (-9.0, 30.0))
+
+STATIONS_PER_HUB = 40
+
+HUB_SPREAD = 0.4
+
+# Track is longer than the great-circle distance
+DETOUR = 1.25
+
+NAME_HEADS = (
+    "Bel", "Bor", "Dor", "Gra", "Hal", "Kal", "Kras", "Lin", "Mar", "Nov",
+    "Ost", "Pol", "Ros", "Sar", "Stan", "Tar", "Vel", "Wil", "Zel", "Zor",
+)
+
+NAME_TAILS = (
+    "berg", "burg", "dorf", "grad", "heim", "ice", "ino", "kov", "mark",
+    "minde", "ow", "polis", "sk", "stad", "stein", "ton", "via", "wick",
+)
+
+FIRST_NAMES = (
+    "Anna", "Bohdan", "Clara", "Dmytro", "Eva", "Franz", "Greta", "Ivan",
+    "Jana", "Karl", "Lena", "Marek", "Nina", "Oleh", "Petra", "Tomas",
+)
+
+LAST_NAMES = (
+    "Bauer", "Dvorak", "Fischer", "Horvat", "Kovalenko", "Kowalski",
+    "Meyer", "Novak", "Petrenko", "Schmidt", "Shevchenko", "Wagner",
+)
+
+# cargo_num, places_in_cargo, km/h of the train types created when
+# there are none, other types take them in turn
+TRAIN_PROFILES = {
+    "Regional": (4, 80, 80),
+    "Intercity": (8, 60, 120),
+    "High speed": (10, 50, 220),
+    "Night": (12, 30, 90),
+}
+
+
+class RowWriter:
+    """
+    Buffer rows of one table and write them ``batch_size`` at a time,
+    with COPY on PostgreSQL and executemany INSERTs elsewhere. Columns
+    not in ``fields`` get their field defaults, rows of the ``after``
+    writers are written first, save() and signals never run.
+    """
+
+    def __init__(self, model, fields, batch_size: int, after=()):
+        self.table = model._meta.db_table
+        self.fields = [model._meta.get_field(name) for name in fields]
+        defaulted = [
+            field
+            for field in model._meta.concrete_fields
+            if field not in self.fields
+            and (field.has_default() or not field.primary_key)
+        ]
+        self.defaults = tuple(
+            field.get_db_prep_save(field.get_default(), connection)
+            for field in defaulted
+        )
+        self.columns = [field.column for field in self.fields + defaulted]
+        # Only datetimes need adapting for the INSERT backends
+        self.datetimes = [
+            index
+            for index, field in enumerate(self.fields)
+            if field.get_internal_type() == "DateTimeField"
+        ]
+        self.batch_size = batch_size
+        self.after = after
+        self.rows = []
+        self.written = 0
+
+    def add(self, row) -> None:
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        for writer in self.after:
+            writer.flush()
+        if not self.rows:
+            return
+        quote = connection.ops.quote_name
+        table = quote(self.table)
+        columns = ", ".join(quote(column) for column in self.columns)
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                with cursor.copy(
+                    f"COPY {table} ({columns}) FROM STDIN"
+                ) as copy:
+                    for row in self.rows:
+                        copy.write_row((*row, *self.defaults))
+            else:
+                placeholders = ", ".join(["%s"] * len(self.columns))
+                cursor.executemany(
+                    f"INSERT INTO {table} ({columns}) "
+                    f"VALUES ({placeholders})",
+                    self._adapted(),
+                )
+        self.written += len(self.rows)
+        self.rows = []
+
+    def _adapted(self) -> list[list]:
+        adapt = connection.ops.adapt_datetimefield_value
+        rows = []
+        for row in self.rows:
+            row = [*row, *self.defaults]
+            for index in self.datetimes:
+                row[index] = adapt(row[index])
+            rows.append(row)
+        return rows
+
+
+def _next_id(model) -> int:
+    return (model.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+
+
+def generate_stations(count: int, rng) -> list[Station]:
+    """Unsaved stations with ids, clustered around random hubs"""
+    (south, north), (west, east) = REGION
+    hubs = [
+        (rng.uniform(south, north), rng.uniform(west, east))
+        for _ in range(count // STATIONS_PER_HUB + 1)
+    ]
+    first_id = _next_id(Station)
+    names = Counter()
+    stations = []
+    for number in range(count):
+        lat, lon = rng.choice(hubs)
+        name = rng.choice(NAME_HEADS) + rng.choice(NAME_TAILS)
+        names[name] += 1
+        if names[name] > 1:
+            name = f"{name} {names[name]}"
+        stations.append(
+            Station(
+                id=first_id + number,
+                name=name,
+                latitude=min(max(rng.gauss(lat, HUB_SPREAD), -90), 90),
+                longtitude=rng.gauss(lon, HUB_SPREAD),
+            )
+        )
+    return stations
+
+
+def _find(parents: dict, item):
+    while parents[item] != item:
+        parents[item] = parents[parents[item]]
+        item = parents[item]
+    return item
+
+
+def connect_stations(stations, neighbours: int) -> list[tuple]:
+    """
+    Undirected (station, station) tracks to the ``neighbours`` nearest
+    stations of each, plus tracks joining what is left unconnected, so
+    every station reaches every other one.
+    """
+    tree = StationTree(stations)
+    by_id = {station.id: station for station in stations}
+    pairs = set()
+    for station in stations:
+        for near in tree.nearest(
+            station.latitude, station.longtitude, neighbours + 1
+        ):
+            if near.id != station.id:
+                pairs.add((min(station.id, near.id), max(station.id, near.id)))
+
+    parents = {station.id: station.id for station in stations}
+    for first, second in pairs:
+        parents[_find(parents, first)] = _find(parents, second)
+    components = {}
+    for station in stations:
+        components.setdefault(_find(parents, station.id), station)
+    # Chain the components west to east
+    chain = sorted(components.values(), key=lambda s: s.longtitude)
+    for west, east in zip(chain, chain[1:]):
+        pairs.add((min(west.id, east.id), max(west.id, east.id)))
+
+    return [(by_id[first], by_id[second]) for first, second in sorted(pairs)]
+
+
+def track_km(source, destination) -> int:
+    return max(
+        1,
+        round(
+            haversine_km(
+                source.latitude,
+                source.longtitude,
+                destination.latitude,
+                destination.longtitude,
+            )
+            * DETOUR
+        ),
+    )
+
+
+class ScaleSeeder:
+    """
+    Generate stations, routes in both directions of a connected track
+    graph, trains of every type, a timetable, crew assignments and
+    orders with tickets at ``load_factor`` of the seats on average.
+    The same seed, arguments and database give the same rows, derived
+    tables are left to their refresh functions.
+    """
+
+    def __init__(self, seed: int = 0, batch_size: int = 10000):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.writers = {}
+        self.stations = self.writer(
+            Station, ("id", "name", "latitude", "longtitude", "popularity")
+        )
+        self.routes = self.writer(
+            Route,
+            ("id", "source", "destination", "distance"),
+            after=(self.stations,),
+        )
+        self.trains = self.writer(
+            Train,
+            ("id", "name", "cargo_num", "places_in_cargo", "train_type"),
+        )
+        self.journeys = self.writer(
+            Journey,
+            ("id", "route", "train", "departure_time", "arrival_time"),
+            after=(self.routes, self.trains),
+        )
+        self.crew = self.writer(Crew, ("id", "first_name", "last_name"))
+        self.assignments = self.writer(
+            Crew.journeys.through,
+            ("crew", "journey"),
+            after=(self.crew, self.journeys),
+        )
+        self.orders = self.writer(Order, ("id", "created_at", "user"))
+        self.tickets = self.writer(
+            Ticket,
+            ("id", "cargo", "seat", "journey", "order", "departure_time"),
+            after=(self.journeys, self.orders),
+        )
+
+    def writer(self, model, fields, after=()) -> RowWriter:
+        self.writers[model] = RowWriter(model, fields, self.batch_size, after)
+        return self.writers[model]
+
+    def run(
+        self,
+        stations: int,
+        neighbours: int,
+        trains_per_type: int,
+        start: date,
+        days: int,
+        journeys_per_day: int,
+        crew: int,
+        crew_per_journey: int,
+        users: int,
+        load_factor: float,
+    ) -> dict[str, int]:
+        """Rows written per table"""
+        station_list = generate_stations(stations, self.rng)
+        routes = self.plan_routes(connect_stations(station_list, neighbours))
+        trains = self.write_trains(trains_per_type)
+        journeys = self.plan_timetable(
+            routes, trains, start, days, journeys_per_day
+        )
+        self.write_network(station_list, routes, journeys)
+        self.write_crew(journeys, crew, crew_per_journey)
+        user_ids = _create_users(users, self.seed)
+        self.write_orders(journeys, user_ids, load_factor)
+
+        for writer in self.writers.values():
+            writer.flush()
+        _reset_sequences(list(self.writers))
+        return {
+            model._meta.verbose_name_plural: writer.written
+            for model, writer in self.writers.items()
+        }
+
+    @staticmethod
+    def plan_routes(tracks) -> list[tuple]:
+        """(id, source id, destination id, km) both ways of every track"""
+        routes = []
+        route_id = _next_id(Route)
+        for first, second in tracks:
+            distance = track_km(first, second)
+            for source, destination in ((first, second), (second, first)):
+                routes.append((route_id, source.id, destination.id, distance))
+                route_id += 1
+        return routes
+
+    def write_trains(self, trains_per_type: int) -> list[tuple]:
+        """(id, cargo_num, places_in_cargo, km/h) of the new trains"""
+        train_types = list(TrainType.objects.order_by("id"))
+        if not train_types:
+            train_types = TrainType.objects.bulk_create(
+                TrainType(name=name) for name in TRAIN_PROFILES
+            )
+        profiles = list(TRAIN_PROFILES.values())
+        trains = []
+        train_id = _next_id(Train)
+        for index, train_type in enumerate(train_types):
+            cargo_num, places, speed = TRAIN_PROFILES.get(
+                train_type.name, profiles[index % len(profiles)]
+            )
+            for _ in range(trains_per_type):
+                trains.append((train_id, cargo_num, places, speed))
+                self.trains.add(
+                    (
+                        train_id,
+                        f"{train_type.name} {train_id}",
+                        cargo_num,
+                        places,
+                        train_type.id,
+                    )
+                )
+                train_id += 1
+        return trains
+
+    def plan_timetable(
+        self, routes, trains, start: date, days: int, journeys_per_day: int
+    ) -> list[tuple]:
+        """
+        (id, route, train, departure, arrival) of journeys departing
+        between 05:00 and 23:00, trains taking turns
+        """
+        journeys = []
+        journey_id = _next_id(Journey)
+        first_day = datetime.combine(start, datetime.min.time())
+        for day in range(days):
+            for slot in range(journeys_per_day):
+                route = self.rng.choice(routes)
+                train = trains[(day * journeys_per_day + slot) % len(trains)]
+                departure = first_day + timedelta(
+                    days=day, hours=5, minutes=self.rng.randrange(18 * 60)
+                )
+                arrival = departure + timedelta(
+                    minutes=max(5, round(route[3] / train[3] * 60))
+                )
+                journeys.append(
+                    (journey_id, route, train, departure, arrival)
+                )
+                journey_id += 1
+        return journeys
+
+    def write_network(self, stations, routes, journeys) -> None:
+        """Stations counting their journeys as popularity, then the rest"""
+        popularity = Counter()
+        for _, route, _, _, _ in journeys:
+            popularity[route[1]] += 1
+            popularity[route[2]] += 1
+        for station in stations:
+            self.stations.add(
+                (
+                    station.id,
+                    station.name,
+                    station.latitude,
+                    station.longtitude,
+                    popularity[station.id],
+                )
+            )
+        for route in routes:
+            self.routes.add(route)
+        for journey_id, route, train, departure, arrival in journeys:
+            self.journeys.add(
+                (journey_id, route[0], train[0], departure, arrival)
+            )
+
+    def write_crew(self, journeys, crew: int, crew_per_journey: int) -> None:
+        first_id = _next_id(Crew)
+        crew_ids = list(range(first_id, first_id + crew))
+        for member_id in crew_ids:
+            self.crew.add(
+                (
+                    member_id,
+                    self.rng.choice(FIRST_NAMES),
+                    self.rng.choice(LAST_NAMES),
+                )
+            )
+        per_journey = min(crew_per_journey, len(crew_ids))
+        for journey in journeys:
+            for member_id in self.rng.sample(crew_ids, per_journey):
+                self.assignments.add((member_id, journey[0]))
+
+    def write_orders(self, journeys, user_ids, load_factor: float) -> None:
+        """
+        Orders of 1 to 4 neighbouring seats, booked up to 30 days before
+        departure, until the journey is sold to about ``load_factor``
+        """
+        order_id = _next_id(Order)
+        ticket_id = _next_id(Ticket)
+        for journey_id, _, train, departure, _ in journeys:
+            _, cargo_num, places, _ = train
+            capacity = cargo_num * places
+            sold = min(
+                capacity,
+                round(capacity * load_factor * self.rng.uniform(0.75, 1.25)),
+            )
+            seats = sorted(self.rng.sample(range(capacity), sold))
+            index = 0
+            while index < sold:
+                booked_at = departure - timedelta(
+                    minutes=self.rng.randrange(60, 30 * 24 * 60)
+                )
+                self.orders.add(
+                    (order_id, booked_at, self.rng.choice(user_ids))
+                )
+                for seat in seats[index:index + self.rng.randint(1, 4)]:
+                    self.tickets.add(
+                        (
+                            ticket_id,
+                            seat // places + 1,
+                            seat % places + 1,
+                            journey_id,
+                            order_id,
+                            departure,
+                        )
+                    )
+                    ticket_id += 1
+                    index += 1
+                order_id += 1
+
+
+def _create_users(count: int, seed: int) -> list[int]:
+    """Ids of ``count`` customers that cannot log in, kept across runs"""
+    user_model = get_user_model()
+    emails = [f"seed{seed}-{number}@example.com" for number in range(count)]
+    user_model.objects.bulk_create(
+        (user_model(email=email, password="!") for email in emails),
+        ignore_conflicts=True,
+    )
+    return list(
+        user_model.objects.filter(email__in=emails)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+
+
+def _reset_sequences(models) -> None:
+    """
+    Move id sequences past the ids written explicitly and refresh the
+    planner statistics of the loaded tables
+    """
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if connection.vendor == "postgresql":
+        statements += [
+            f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}"
+            for model in models
+        ]
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
@@ -1,30 +1,79 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
 from django.db import transaction
 from rest_framework import serializers
 
+from train_routes.analytics import LOAD_GROUPS, SALES_GROUPS
+from train_routes.booking import book_tickets
+from train_routes.mixins import DynamicFieldsSerializerMixin
+from train_routes.seats import book_free_seats
 from train_routes.models import (
+    ArchivedOrder,
+    ArchivedTicket,
     Station,
     Route,
     TrainType,
     Train,
     Journey,
+    JourneySearchRow,
     Crew,
     Order,
     Ticket
 )
 
 
-class StationSerializer(serializers.ModelSerializer):
+class StationSerializer(
+    DynamicFieldsSerializerMixin, serializers.ModelSerializer
+):
 
     class Meta:
         model = Station
         fields = ("id", "name", "latitude", "longtitude")
 
 
-class RouteSerializer(serializers.ModelSerializer):
+class NearbyStationSerializer(StationSerializer):
+    distance = serializers.FloatField(read_only=True)
+
+    class Meta(StationSerializer.Meta):
+        fields = StationSerializer.Meta.fields + ("distance",)
+
+
+class NearbyStationsQuerySerializer(serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lon = serializers.FloatField(min_value=-180, max_value=180)
+    radius = serializers.FloatField(
+        min_value=0,
+        max_value=settings.STATION_NEARBY_MAX_RADIUS,
+        required=False,
+    )
+    limit = serializers.IntegerField(
+        min_value=1, max_value=settings.STATION_NEARBY_MAX_LIMIT, default=10
+    )
+
+
+class RouteSerializer(
+    DynamicFieldsSerializerMixin, serializers.ModelSerializer
+):
 
     class Meta:
         model = Route
         fields = ("id", "source", "destination", "distance")
+        expandable_fields = {
+            "source": (StationSerializer, {}),
+            "destination": (StationSerializer, {}),
+        }
+
+
+class RouteDistanceQuerySerializer(serializers.Serializer):
+    """``from`` and ``to`` station ids, both reserved words in Python"""
+
+    def get_fields(self):
+        return {
+            name: serializers.PrimaryKeyRelatedField(
+                queryset=Station.objects.all()
+            )
+            for name in ("from", "to")
+        }
 
 
 class RouteForJourneySerializer(serializers.ModelSerializer):
@@ -54,14 +103,18 @@ class RouteListSerializer(RouteSerializer):
     )
 
 
-class TrainTypeSerializer(serializers.ModelSerializer):
+class TrainTypeSerializer(
+    DynamicFieldsSerializerMixin, serializers.ModelSerializer
+):
 
     class Meta:
         model = TrainType
         fields = ("id", "name")
 
 
-class TrainSerializer(serializers.ModelSerializer):
+class TrainSerializer(
+    DynamicFieldsSerializerMixin, serializers.ModelSerializer
+):
 
     class Meta:
         model = Train
@@ -73,6 +126,7 @@ class TrainSerializer(serializers.ModelSerializer):
             "train_type",
             "image"
         )
+        expandable_fields = {"train_type": (TrainTypeSerializer, {})}
 
     @transaction.atomic()
     def create(self, validated_data):
@@ -82,11 +136,31 @@ class TrainSerializer(serializers.ModelSerializer):
         return train
 
 
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Render stored image variant paths as media URLs"""
+
+    def to_representation(self, value):
+        request = self.context.get("request")
+        variants = {}
+        for variant, formats in value.items():
+            variants[variant] = {}
+            for extension, path in formats.items():
+                url = default_storage.url(path)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                variants[variant][extension] = url
+        return variants
+
+
 class TrainListSerializer(TrainSerializer):
     train_type = serializers.CharField(
         read_only=True,
         source="train_type.name"
     )
+    image_variants = ImageVariantsField()
+
+    class Meta(TrainSerializer.Meta):
+        fields = TrainSerializer.Meta.fields + ("image_variants",)
 
 
 class TrainImageSerializer(serializers.ModelSerializer):
@@ -96,10 +170,14 @@ class TrainImageSerializer(serializers.ModelSerializer):
         fields = (
             "id",
             "image",
+            "image_variants",
         )
+        read_only_fields = ("image_variants",)
 
 
-class JourneySerializer(serializers.ModelSerializer):
+class JourneySerializer(
+    DynamicFieldsSerializerMixin, serializers.ModelSerializer
+):
 
     class Meta:
         model = Journey
@@ -110,6 +188,10 @@ class JourneySerializer(serializers.ModelSerializer):
             "departure_time",
             "arrival_time"
         )
+        expandable_fields = {
+            "route": (RouteListSerializer, {}),
+            "train": (TrainListSerializer, {}),
+        }
 
     @transaction.atomic
     def create(self, validated_data):
@@ -124,16 +206,16 @@ class JourneySerializer(serializers.ModelSerializer):
         return journey
 
 
-class JourneyDetailSerializer(serializers.ModelSerializer):
+class JourneyDetailSerializer(
+    DynamicFieldsSerializerMixin, serializers.ModelSerializer
+):
     train = serializers.SlugRelatedField(
         read_only=True,
         slug_field="name"
     )
     route = RouteListSerializer(read_only=True)
-    taken_places = serializers.IntegerField(
-        read_only=True,
-        source="tickets.count"
-    )
+    # Annotated with journey_ticket_count() by the views that render it
+    taken_places = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Journey
@@ -145,9 +227,15 @@ class JourneyDetailSerializer(serializers.ModelSerializer):
             "departure_time",
             "arrival_time"
         )
+        expandable_fields = {
+            "route": (RouteListSerializer, {}),
+            "train": (TrainListSerializer, {}),
+        }
 
 
-class JourneyListSerializer(serializers.ModelSerializer):
+class JourneyListSerializer(
+    DynamicFieldsSerializerMixin, serializers.ModelSerializer
+):
     train = serializers.SlugRelatedField(
         read_only=True,
         slug_field="name"
@@ -172,9 +260,42 @@ class JourneyListSerializer(serializers.ModelSerializer):
             "departure_time",
             "arrival_time"
         )
+        expandable_fields = {
+            "route": (RouteListSerializer, {}),
+            "train": (TrainListSerializer, {}),
+        }
+
 
+class JourneySearchRouteSerializer(serializers.Serializer):
+    destination = serializers.CharField(source="destination_name")
+    distance = serializers.IntegerField()
 
-class CrewSerializer(serializers.ModelSerializer):
+
+class JourneySearchRowSerializer(
+    DynamicFieldsSerializerMixin, serializers.ModelSerializer
+):
+    """Renders JourneySearchRow in the shape of JourneyListSerializer"""
+
+    id = serializers.IntegerField(read_only=True, source="journey_id")
+    route = JourneySearchRouteSerializer(read_only=True, source="*")
+    train = serializers.CharField(read_only=True, source="train_name")
+
+    class Meta:
+        model = JourneySearchRow
+        fields = (
+            "id",
+            "route",
+            "train",
+            "tickets_available",
+            "cargo_num_available",
+            "departure_time",
+            "arrival_time"
+        )
+
+
+class CrewSerializer(
+    DynamicFieldsSerializerMixin, serializers.ModelSerializer
+):
 
     class Meta:
         model = Crew
@@ -184,13 +305,18 @@ class CrewSerializer(serializers.ModelSerializer):
             "last_name",
             "journeys"
         )
+        expandable_fields = {
+            "journeys": (JourneyListSerializer, {"many": True}),
+        }
 
 
 class CrewListSerializer(CrewSerializer):
     journeys = JourneyListSerializer(many=True)
 
 
-class TicketSerializer(serializers.ModelSerializer):
+class TicketSerializer(
+    DynamicFieldsSerializerMixin, serializers.ModelSerializer
+):
 
     class Meta:
         model = Ticket
@@ -200,6 +326,9 @@ class TicketSerializer(serializers.ModelSerializer):
             "seat",
             "journey",
         )
+        expandable_fields = {"journey": (JourneyListSerializer, {})}
+        # Seat uniqueness is enforced by book_tickets with a 409 response
+        validators = []
 
     def validate(self, attrs):
         data = super().validate(attrs)
@@ -227,7 +356,9 @@ class TicketDetailSerializer(TicketSerializer):
     )
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(
+    DynamicFieldsSerializerMixin, serializers.ModelSerializer
+):
     tickets = TicketSerializer(
         many=True,
         read_only=False,
@@ -242,19 +373,15 @@ class OrderSerializer(serializers.ModelSerializer):
             "tickets"
         )
 
-    @transaction.atomic()
     def create(self, validated_data):
-        tickets_data = validated_data.pop("tickets")
-        order = Order.objects.create(**validated_data)
-        for ticket_data in tickets_data:
-            Ticket.objects.create(
-                order=order, **ticket_data
-            )
-
-        return order
+        return book_tickets(
+            validated_data["user"], validated_data["tickets"]
+        )
 
 
-class OrderListSerializer(serializers.ModelSerializer):
+class OrderListSerializer(
+    DynamicFieldsSerializerMixin, serializers.ModelSerializer
+):
     tickets = TicketSerializer(read_only=True, many=True)
 
     class Meta:
@@ -268,3 +395,139 @@ class OrderListSerializer(serializers.ModelSerializer):
 
 class OrderDetailSerializer(OrderSerializer):
     tickets = TicketDetailSerializer(read_only=True, many=True)
+
+
+class ArchivedTicketSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = ArchivedTicket
+        fields = (
+            "id",
+            "cargo",
+            "seat",
+            "journey_id",
+            "source_name",
+            "destination_name",
+            "train_name",
+            "departure_time",
+            "arrival_time",
+        )
+
+
+class ArchivedOrderSerializer(serializers.ModelSerializer):
+    tickets = ArchivedTicketSerializer(read_only=True, many=True)
+
+    class Meta:
+        model = ArchivedOrder
+        fields = (
+            "id",
+            "created_at",
+            "archived_at",
+            "tickets"
+        )
+
+
+class AutoAssignOrderSerializer(serializers.Serializer):
+    journey = serializers.PrimaryKeyRelatedField(
+        queryset=Journey.objects.select_related("train")
+    )
+    seats = serializers.IntegerField(min_value=1, write_only=True)
+
+    def validate(self, attrs):
+        train = attrs["journey"].train
+        capacity = train.cargo_num * train.places_in_cargo
+        if attrs["seats"] > capacity:
+            raise serializers.ValidationError(
+                {"seats": f"journey has only {capacity} seats"}
+            )
+        return attrs
+
+    def create(self, validated_data):
+        return book_free_seats(
+            validated_data["user"],
+            validated_data["journey"],
+            validated_data["seats"],
+        )
+
+    def to_representation(self, instance):
+        return OrderSerializer(instance, context=self.context).data
+
+
+class RollupQuerySerializer(serializers.Serializer):
+    """Comma separated ``group_by`` out of ``groups`` and a day range"""
+
+    groups = {}
+
+    group_by = serializers.CharField(required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate_group_by(self, value):
+        groups = [name.strip() for name in value.split(",") if name.strip()]
+        unknown = set(groups) - set(self.groups)
+        if not groups or unknown:
+            raise serializers.ValidationError(
+                f"choose from {', '.join(self.groups)}"
+            )
+        return list(dict.fromkeys(groups))
+
+    def validate(self, attrs):
+        attrs.setdefault("group_by", list(self.groups))
+        return attrs
+
+
+class LoadFactorQuerySerializer(RollupQuerySerializer):
+    groups = LOAD_GROUPS
+
+    train = serializers.IntegerField(required=False)
+    route = serializers.IntegerField(required=False)
+
+
+class LoadFactorSerializer(serializers.Serializer):
+    day = serializers.DateField(required=False)
+    train = serializers.IntegerField(required=False)
+    train_name = serializers.CharField(source="train__name", required=False)
+    route = serializers.IntegerField(required=False)
+    route_source = serializers.CharField(
+        source="route__source__name", required=False
+    )
+    route_destination = serializers.CharField(
+        source="route__destination__name", required=False
+    )
+    journeys = serializers.IntegerField(source="journeys_count")
+    tickets_sold = serializers.IntegerField(source="tickets")
+    capacity = serializers.IntegerField(source="seats")
+    load_factor = serializers.FloatField(allow_null=True)
+    rank = serializers.IntegerField()
+    moving_load_factor = serializers.SerializerMethodField()
+
+    def get_moving_load_factor(self, load) -> float | None:
+        """Load factor over the last seven days of the group"""
+        if not load.get("moving_seats"):
+            return None
+        return load["moving_tickets"] / load["moving_seats"]
+
+
+class SalesQuerySerializer(RollupQuerySerializer):
+    groups = SALES_GROUPS
+
+    route = serializers.IntegerField(required=False)
+    train_type = serializers.IntegerField(required=False)
+
+
+class SalesSerializer(serializers.Serializer):
+    day = serializers.DateField(required=False)
+    route = serializers.IntegerField(required=False)
+    route_source = serializers.CharField(
+        source="route__source__name", required=False
+    )
+    route_destination = serializers.CharField(
+        source="route__destination__name", required=False
+    )
+    train_type = serializers.IntegerField(required=False)
+    train_type_name = serializers.CharField(
+        source="train_type__name", required=False
+    )
+    orders = serializers.IntegerField(source="order_count")
+    tickets = serializers.IntegerField(source="ticket_count")
+    passenger_km = serializers.IntegerField(source="distance")
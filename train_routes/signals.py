@@ -0,0 +1,181 @@
+from django.db.models import F, Q
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from train_routes.analytics import journey_keys, refresh_daily_loads
+from train_routes.autocomplete import invalidate_station_index
+from train_routes.booking import tickets_booked
+from train_routes.counters import (
+    count_booked,
+    count_deleted,
+    count_late_ticket,
+)
+from train_routes.distances import schedule_distance_update
+from train_routes.geo import invalidate_station_tree
+from train_routes.models import (
+    Journey,
+    Order,
+    Route,
+    Station,
+    Ticket,
+    Train,
+    tickets_deleting,
+)
+from train_routes.search import refresh_journey_search
+
+
+# Tickets have no delete receivers of their own, so deleting an order or
+# a journey removes its tickets with one query
+@receiver(tickets_deleting)
+def uncount_deleted_tickets(sender, tickets, **kwargs):
+    count_deleted(tickets)
+
+
+@receiver(pre_delete, sender=Order)
+def uncount_tickets_of_deleted_order(sender, instance, **kwargs):
+    count_deleted(Ticket.objects.filter(order_id=instance.id))
+
+
+@receiver(pre_delete, sender=Journey)
+def uncount_tickets_of_deleted_journey(sender, instance, **kwargs):
+    count_deleted(Ticket.objects.filter(journey_id=instance.id))
+
+
+@receiver(post_save, sender=Ticket)
+def update_search_row_for_ticket(sender, instance, created, **kwargs):
+    if created:
+        count_booked([instance])
+        count_late_ticket(instance)
+    else:
+        refresh_journey_search([instance.journey_id])
+        refresh_daily_loads(
+            journey_keys(Journey.objects.filter(id=instance.journey_id))
+        )
+
+
+@receiver(tickets_booked)
+def update_search_rows_for_booking(sender, tickets, **kwargs):
+    count_booked(tickets)
+
+
+@receiver(post_save, sender=Journey)
+def update_search_row_for_journey(sender, instance, **kwargs):
+    refresh_journey_search([instance.id])
+
+
+@receiver(post_save, sender=Journey)
+def move_tickets_with_journey(sender, instance, created, **kwargs):
+    if not created:
+        Ticket.objects.filter(journey_id=instance.id).exclude(
+            departure_time=instance.departure_time
+        ).update(departure_time=instance.departure_time)
+
+
+@receiver(pre_save, sender=Journey)
+@receiver(pre_delete, sender=Journey)
+def remember_journey_load(sender, instance, **kwargs):
+    instance._previous_load_keys = (
+        journey_keys(Journey.objects.filter(pk=instance.pk))
+        if instance.pk
+        else set()
+    )
+
+
+@receiver(post_save, sender=Journey)
+def update_daily_load_for_journey(sender, instance, **kwargs):
+    refresh_daily_loads(
+        getattr(instance, "_previous_load_keys", set())
+        | journey_keys(Journey.objects.filter(pk=instance.pk))
+    )
+
+
+@receiver(post_delete, sender=Journey)
+def update_daily_load_for_deleted_journey(sender, instance, **kwargs):
+    refresh_daily_loads(getattr(instance, "_previous_load_keys", set()))
+
+
+@receiver(post_save, sender=Route)
+def update_search_rows_for_route(sender, instance, created, **kwargs):
+    if not created:
+        refresh_journey_search(
+            Journey.objects.filter(route=instance).values("id")
+        )
+
+
+@receiver(pre_save, sender=Route)
+def remember_route_stations(sender, instance, **kwargs):
+    instance._previous_stations = (
+        Route.objects.filter(pk=instance.pk)
+        .values_list("source_id", "destination_id")
+        .first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=Route)
+def update_distances_for_route(sender, instance, created, **kwargs):
+    stations = (instance.source_id, instance.destination_id)
+    if created:
+        schedule_distance_update(added=[stations])
+    else:
+        previous = getattr(instance, "_previous_stations", None) or stations
+        schedule_distance_update(changed={previous, stations})
+
+
+@receiver(post_delete, sender=Route)
+def update_distances_for_deleted_route(sender, instance, **kwargs):
+    schedule_distance_update(
+        changed=[(instance.source_id, instance.destination_id)]
+    )
+
+
+def _change_popularity(route_id: int, step: int) -> None:
+    Station.objects.filter(
+        Q(routes_from=route_id) | Q(routes_to=route_id)
+    ).update(popularity=F("popularity") + step)
+
+
+@receiver(post_save, sender=Journey)
+def count_new_journey(sender, instance, created, **kwargs):
+    if created:
+        _change_popularity(instance.route_id, 1)
+
+
+@receiver(post_delete, sender=Journey)
+def count_deleted_journey(sender, instance, **kwargs):
+    _change_popularity(instance.route_id, -1)
+
+
+@receiver(post_delete, sender=Station)
+def invalidate_deleted_station(sender, **kwargs):
+    invalidate_station_index()
+    invalidate_station_tree()
+
+
+@receiver(post_save, sender=Station)
+def update_search_rows_for_station(sender, instance, created, **kwargs):
+    invalidate_station_index()
+    invalidate_station_tree()
+    if not created:
+        refresh_journey_search(
+            Journey.objects.filter(
+                Q(route__source=instance) | Q(route__destination=instance)
+            ).values("id")
+        )
+
+
+@receiver(post_save, sender=Train)
+def update_search_rows_for_train(sender, instance, created, **kwargs):
+    if not created:
+        refresh_journey_search(
+            Journey.objects.filter(train=instance).values("id")
+        )
+        refresh_daily_loads(
+            journey_keys(Journey.objects.filter(train=instance))
+        )
@@ -0,0 +1,133 @@
+"""
+Bulk fixtures for tests that need many related rows. Rows are inserted
+with bulk_create, so model signals do not run: journey search rows are
+refreshed explicitly and ticket departure times are set by hand.
+"""
+from datetime import datetime, timedelta
+
+from train_routes.models import (
+    ArchivedOrder,
+    ArchivedTicket,
+    Crew,
+    Journey,
+    Order,
+    Route,
+    Station,
+    Ticket,
+    Train,
+    TrainType,
+)
+from train_routes.search import refresh_journey_search
+
+
+FIRST_DEPARTURE = datetime(2024, 6, 29, 0, 15)
+
+
+def create_stations(count: int) -> list[Station]:
+    return Station.objects.bulk_create(
+        Station(
+            name=f"Station {number}",
+            latitude=50 + number / 100,
+            longtitude=20 + number / 100,
+        )
+        for number in range(count)
+    )
+
+
+def create_routes(count: int) -> list[Route]:
+    stations = create_stations(count + 1)
+    return Route.objects.bulk_create(
+        Route(
+            source=stations[number],
+            destination=stations[number + 1],
+            distance=100 + number,
+        )
+        for number in range(count)
+    )
+
+
+def create_trains(count: int) -> list[Train]:
+    train_types = TrainType.objects.bulk_create(
+        TrainType(name=f"Type {number}") for number in range(count)
+    )
+    return Train.objects.bulk_create(
+        Train(
+            name=f"Train {number}",
+            cargo_num=10,
+            places_in_cargo=50,
+            train_type=train_types[number],
+        )
+        for number in range(count)
+    )
+
+
+def create_journeys(count: int) -> list[Journey]:
+    routes = create_routes(count)
+    trains = create_trains(count)
+    journeys = Journey.objects.bulk_create(
+        Journey(
+            route=routes[number],
+            train=trains[number],
+            departure_time=FIRST_DEPARTURE + timedelta(hours=number),
+            arrival_time=FIRST_DEPARTURE + timedelta(hours=number + 6),
+        )
+        for number in range(count)
+    )
+    refresh_journey_search([journey.id for journey in journeys])
+    return journeys
+
+
+def create_crew(count: int, journeys) -> list[Crew]:
+    """``count`` crew members, each on every journey"""
+    crew = Crew.objects.bulk_create(
+        Crew(first_name=f"First {number}", last_name=f"Last {number}")
+        for number in range(count)
+    )
+    Crew.journeys.through.objects.bulk_create(
+        Crew.journeys.through(crew_id=member.id, journey_id=journey.id)
+        for member in crew
+        for journey in journeys
+    )
+    return crew
+
+
+def create_orders(count: int, user, journeys) -> list[Order]:
+    """``count`` orders of ``user``, each with a seat on every journey"""
+    orders = Order.objects.bulk_create(Order(user=user) for _ in range(count))
+    Ticket.objects.bulk_create(
+        Ticket(
+            order=order,
+            journey=journey,
+            departure_time=journey.departure_time,
+            cargo=1,
+            seat=number + 1,
+        )
+        for number, order in enumerate(orders)
+        for journey in journeys
+    )
+    return orders
+
+
+def create_archived_orders(count: int, user) -> list[ArchivedOrder]:
+    """``count`` archived orders of ``user`` with ``count`` tickets each"""
+    orders = ArchivedOrder.objects.bulk_create(
+        ArchivedOrder(id=number + 1, user=user, created_at=FIRST_DEPARTURE)
+        for number in range(count)
+    )
+    ArchivedTicket.objects.bulk_create(
+        ArchivedTicket(
+            id=order.id * count + seat,
+            order=order,
+            journey_id=seat + 1,
+            cargo=1,
+            seat=seat + 1,
+            source_name="Source",
+            destination_name="Destination",
+            train_name="Train",
+            departure_time=FIRST_DEPARTURE,
+            arrival_time=FIRST_DEPARTURE + timedelta(hours=6),
+        )
+        for order in orders
+        for seat in range(count)
+    )
+    return orders
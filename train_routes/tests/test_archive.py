@@ -0,0 +1,128 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from train_routes.models import (
+    ArchivedJourney,
+    ArchivedOrder,
+    ArchivedTicket,
+    DailyLoad,
+    Journey,
+    JourneySearchRow,
+    Order,
+    Ticket,
+)
+from train_routes.tests.test_station_api import (
+    ORDER_URL,
+    sample_crew,
+    sample_journey,
+    sample_user,
+)
+
+
+ARCHIVED_ORDER_URL = reverse("train_routes:archived-order-list")
+
+
+class ArchivePastJourneysTest(APITestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        self.journey = sample_journey()
+        self.crew = sample_crew()
+        self.crew.journeys.add(self.journey)
+        self.future = Journey.objects.create(
+            route=self.journey.route,
+            train=self.journey.train,
+            departure_time="2999-01-01 08:00",
+            arrival_time="2999-01-01 12:00",
+        )
+
+    def book(self, *journeys, seat=1):
+        response = self.client.post(
+            ORDER_URL,
+            {
+                "tickets": [
+                    {"cargo": 1, "seat": seat, "journey": journey.id}
+                    for journey in journeys
+                ]
+            },
+            format="json",
+        )
+        orders = Order.objects.filter(id=response.data["id"])
+        orders.update(created_at="2024-06-01 12:00")
+        return orders.get()
+
+    def archive(self, *args):
+        call_command("archive_past_journeys", *args, stdout=StringIO())
+
+    def test_moves_orders_tickets_journeys_and_crew(self):
+        order = self.book(self.journey)
+        tickets_sold = DailyLoad.objects.get(day="2024-06-29").tickets_sold
+
+        self.archive()
+
+        self.assertFalse(Order.objects.filter(id=order.id).exists())
+        self.assertFalse(Ticket.objects.exists())
+        self.assertFalse(Journey.objects.filter(id=self.journey.id).exists())
+        self.assertFalse(
+            JourneySearchRow.objects.filter(journey=self.journey.id).exists()
+        )
+        self.assertEqual(ArchivedOrder.objects.get().id, order.id)
+        ticket = ArchivedTicket.objects.get()
+        self.assertEqual(ticket.journey_id, self.journey.id)
+        self.assertEqual(ticket.train_name, self.journey.train.name)
+        archived = ArchivedJourney.objects.get()
+        self.assertEqual(archived.id, self.journey.id)
+        self.assertEqual(list(archived.crew.all()), [self.crew])
+        self.assertTrue(Journey.objects.filter(id=self.future.id).exists())
+        self.assertEqual(
+            DailyLoad.objects.get(day="2024-06-29").tickets_sold, tickets_sold
+        )
+
+    def test_order_with_upcoming_journey_stays_live(self):
+        order = self.book(self.journey, self.future)
+
+        self.archive()
+
+        self.assertEqual(Order.objects.get().id, order.id)
+        self.assertEqual(Ticket.objects.count(), 2)
+        self.assertTrue(Journey.objects.filter(id=self.journey.id).exists())
+        self.assertFalse(ArchivedJourney.objects.exists())
+
+    def test_batches_resume(self):
+        for seat in range(1, 4):
+            self.book(self.journey, seat=seat)
+
+        self.archive("--batch-size", "1", "--max-batches", "2")
+        self.assertEqual(ArchivedOrder.objects.count(), 2)
+        self.assertEqual(Order.objects.count(), 1)
+
+        self.archive("--batch-size", "1")
+        self.assertEqual(ArchivedOrder.objects.count(), 3)
+        self.assertEqual(ArchivedJourney.objects.count(), 1)
+
+    def test_owner_reads_archived_orders(self):
+        order = self.book(self.journey)
+        self.archive()
+
+        response = self.client.get(ARCHIVED_ORDER_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["id"], order.id)
+        self.assertEqual(
+            response.data["results"][0]["tickets"][0]["departure_time"],
+            "2024-06-29 00:15",
+        )
+
+        self.client.force_authenticate(sample_user(email="other@test.com"))
+        response = self.client.get(ARCHIVED_ORDER_URL)
+        self.assertEqual(response.data["results"], [])
+
+    def test_archived_orders_are_read_only(self):
+        response = self.client.post(ARCHIVED_ORDER_URL, {})
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
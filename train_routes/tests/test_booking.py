@@ -0,0 +1,126 @@
+import os
+import random
+import tempfile
+import threading
+from collections import Counter
+
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from train_routes.booking import SeatUnavailable, book_tickets
+from train_routes.models import Order, Ticket
+from train_routes.tests.test_station_api import (
+    ORDER_URL,
+    sample_journey,
+    sample_user,
+)
+
+
+class BookingApiTest(APITestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        self.journey = sample_journey()
+
+    def book(self, *seats):
+        return self.client.post(
+            ORDER_URL,
+            {
+                "tickets": [
+                    {"cargo": cargo, "seat": seat, "journey": self.journey.id}
+                    for cargo, seat in seats
+                ]
+            },
+            format="json",
+        )
+
+    def test_same_seat_in_different_cargos(self):
+        response = self.book((1, 5), (2, 5))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_taken_seat_returns_conflict(self):
+        self.book((1, 5))
+
+        response = self.book((1, 6), (1, 5))
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(
+            response.data["seats"],
+            [{"journey": self.journey.id, "cargo": 1, "seat": 5}],
+        )
+        self.assertFalse(Ticket.objects.filter(seat=6).exists())
+
+    def test_duplicate_seat_in_one_order(self):
+        response = self.book((1, 5), (1, 5))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(
+    ROUTE_DISTANCE_WORKERS=0,
+    ROUTE_DISTANCE_INDEX_PATH=os.path.join(
+        tempfile.gettempdir(), "test_booking_route_distances.bin"
+    ),
+)
+class ConcurrentBookingTest(TransactionTestCase):
+    threads = 8
+    seats_per_order = 100
+
+    def test_concurrent_booking_never_oversells(self):
+        user = sample_user()
+        journey = sample_journey()
+        train = journey.train
+        seats = [
+            (cargo, seat)
+            for cargo in range(1, train.cargo_num + 1)
+            for seat in range(1, train.places_in_cargo + 1)
+        ]
+        chunks = [
+            seats[start:start + self.seats_per_order]
+            for start in range(0, len(seats), self.seats_per_order)
+        ]
+        booked = Counter()
+        failures = []
+        lock = threading.Lock()
+
+        def worker(seed):
+            order = list(range(len(chunks)))
+            random.Random(seed).shuffle(order)
+            try:
+                for index in order:
+                    tickets = [
+                        {"journey": journey, "cargo": cargo, "seat": seat}
+                        for cargo, seat in chunks[index]
+                    ]
+                    try:
+                        book_tickets(user, tickets)
+                    except SeatUnavailable:
+                        continue
+                    with lock:
+                        booked.update(chunks[index])
+            except Exception as error:
+                failures.append(error)
+            finally:
+                connection.close()
+
+        workers = [
+            threading.Thread(target=worker, args=(seed,))
+            for seed in range(self.threads)
+        ]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(failures, [])
+        self.assertTrue(booked)
+        self.assertEqual(max(booked.values()), 1)
+        stored = Ticket.objects.filter(journey=journey)
+        self.assertEqual(stored.count(), sum(booked.values()))
+        self.assertEqual(
+            Order.objects.count(), len(booked) // self.seats_per_order
+        )
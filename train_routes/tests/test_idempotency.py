@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from train_routes.models import IdempotencyKey, Order
+from train_routes.tests.test_station_api import (
+    ORDER_URL,
+    sample_journey,
+    sample_user,
+)
+
+
+class IdempotentOrderApiTest(APITestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        self.journey = sample_journey()
+
+    def create_order(self, seat=1, key="retry-1"):
+        return self.client.post(
+            ORDER_URL,
+            {
+                "tickets": [
+                    {"cargo": 1, "seat": seat, "journey": self.journey.id}
+                ]
+            },
+            format="json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_replay_returns_stored_response(self):
+        first = self.create_order()
+        second = self.create_order()
+
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_key_is_scoped_to_user(self):
+        self.create_order()
+        self.client.force_authenticate(sample_user(email="other@test.com"))
+
+        response = self.create_order(seat=2)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_reused_key_with_different_body(self):
+        self.create_order()
+
+        response = self.create_order(seat=2)
+
+        self.assertEqual(
+            response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+
+    def test_failed_request_does_not_store_key(self):
+        self.create_order(seat=1, key="first")
+
+        conflict = self.create_order(seat=1, key="second")
+
+        self.assertEqual(conflict.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(IdempotencyKey.objects.filter(key="second").exists())
+
+    def claim(self, key="retry-1"):
+        return IdempotencyKey.objects.create(
+            user=self.user,
+            key=key,
+            fingerprint="pending",
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+
+    @override_settings(IDEMPOTENCY_REPLAY_WAIT=timedelta(milliseconds=50))
+    @mock.patch(
+        "train_routes.idempotency.request_fingerprint",
+        return_value="pending",
+    )
+    def test_duplicate_of_request_in_progress(self, fingerprint):
+        self.claim()
+
+        response = self.create_order()
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Order.objects.exists())
+
+    @mock.patch(
+        "train_routes.idempotency.request_fingerprint",
+        return_value="pending",
+    )
+    def test_duplicate_waits_for_request_in_progress(self, fingerprint):
+        claim = self.claim()
+
+        def original_finishes(seconds):
+            claim.status_code = status.HTTP_201_CREATED
+            claim.response = {"id": 1}
+            claim.save()
+
+        with mock.patch(
+            "train_routes.idempotency.time.sleep",
+            side_effect=original_finishes,
+        ) as sleep:
+            response = self.create_order()
+
+        sleep.assert_called_once()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {"id": 1})
+        self.assertEqual(response["Idempotent-Replayed"], "true")
+        self.assertFalse(Order.objects.exists())
+
+    @mock.patch(
+        "train_routes.idempotency.request_fingerprint",
+        return_value="pending",
+    )
+    def test_abandoned_claim_is_taken_over(self, fingerprint):
+        self.claim()
+        IdempotencyKey.objects.update(
+            created_at=timezone.now() - timedelta(minutes=5)
+        )
+
+        response = self.create_order()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            IdempotencyKey.objects.get().status_code,
+            status.HTTP_201_CREATED,
+        )
+
+    def test_expired_keys_are_purged(self):
+        self.create_order()
+        IdempotencyKey.objects.update(expires_at=datetime(2024, 1, 1))
+
+        call_command("purge_idempotency_keys", stdout=StringIO())
+
+        self.assertFalse(IdempotencyKey.objects.exists())
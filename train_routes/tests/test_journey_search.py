@@ -0,0 +1,79 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase, APIClient
+
+from train_routes.models import JourneySearchRow, Order, Ticket
+from train_routes.tests.test_station_api import (
+    JOURNEY_URL,
+    ORDER_URL,
+    sample_journey,
+    sample_user,
+)
+
+
+class JourneySearchTableTest(APITestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        self.journey = sample_journey()
+
+    def list_journeys(self, from_search_table, **params):
+        with override_settings(
+            JOURNEY_LIST_FROM_SEARCH_TABLE=from_search_table
+        ):
+            return self.client.get(JOURNEY_URL, params)
+
+    def test_search_table_matches_journey_list(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                ORDER_URL,
+                {
+                    "tickets": [
+                        {"cargo": 1, "seat": 1, "journey": self.journey.id}
+                    ]
+                },
+                format="json",
+            )
+
+        expected = self.list_journeys(False)
+        response = self.list_journeys(True)
+
+        self.assertEqual(response.data, expected.data)
+        self.assertEqual(response.data["results"][0]["tickets_available"], 99)
+
+    def test_search_table_list_uses_single_table(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.list_journeys(True, train_names="Test")
+
+        for query in queries.captured_queries:
+            self.assertNotIn("JOIN", query["sql"])
+
+    def test_rows_follow_station_rename_and_ticket_delete(self):
+        order = Order.objects.create(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket = Ticket.objects.create(
+                order=order, journey=self.journey, cargo=1, seat=1
+            )
+        station = self.journey.route.destination
+        station.name = "Renamed"
+        station.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket.delete()
+
+        row = JourneySearchRow.objects.get(journey=self.journey)
+        self.assertEqual(row.destination_name, "Renamed")
+        self.assertEqual(row.tickets_taken, 0)
+
+    def test_refresh_command_rebuilds_rows(self):
+        JourneySearchRow.objects.all().delete()
+
+        call_command("refresh_journey_search", stdout=StringIO())
+
+        self.assertTrue(
+            JourneySearchRow.objects.filter(journey=self.journey).exists()
+        )
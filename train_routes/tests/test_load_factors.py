@@ -0,0 +1,195 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from train_routes.models import DailyLoad, Journey, Order, Ticket
+from train_routes.tests.test_station_api import (
+    ORDER_URL,
+    sample_journey,
+    sample_train,
+    sample_user,
+)
+
+
+LOAD_FACTOR_URL = reverse("train_routes:load-factor-list")
+
+
+class DailyLoadRollupTest(APITestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        self.journey = sample_journey()
+
+    def load(self, journey):
+        journey.refresh_from_db()
+        return DailyLoad.objects.get(
+            day=journey.departure_time.date(),
+            train=journey.train,
+            route=journey.route,
+        )
+
+    def post_order(self, *seats):
+        return self.client.post(
+            ORDER_URL,
+            {
+                "tickets": [
+                    {"cargo": 1, "seat": seat, "journey": self.journey.id}
+                    for seat in seats
+                ]
+            },
+            format="json",
+        )
+
+    def book(self, *seats):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.post_order(*seats)
+
+    def test_new_journey_adds_capacity(self):
+        load = self.load(self.journey)
+
+        self.assertEqual(load.journeys, 1)
+        self.assertEqual(load.capacity, 100 * 100)
+        self.assertEqual(load.tickets_sold, 0)
+
+    def test_booking_and_cancelling_update_tickets_sold(self):
+        self.book(1, 2, 3)
+        order = Order.objects.create(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            Ticket.objects.create(
+                order=order, journey=self.journey, cargo=2, seat=1
+            )
+        self.assertEqual(self.load(self.journey).tickets_sold, 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order.delete()
+        self.assertEqual(self.load(self.journey).tickets_sold, 3)
+
+    def test_counters_wait_for_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.post_order(1)
+
+        self.assertEqual(self.load(self.journey).tickets_sold, 0)
+        callbacks[0]()
+        self.assertEqual(self.load(self.journey).tickets_sold, 1)
+
+    def test_order_tickets_are_deleted_in_one_query(self):
+        small = self.book(1).data["id"]
+        large = self.book(2, 3, 4, 5).data["id"]
+
+        with CaptureQueriesContext(connection) as one:
+            Order.objects.get(id=small).delete()
+        with CaptureQueriesContext(connection) as many:
+            Order.objects.get(id=large).delete()
+
+        self.assertEqual(len(many), len(one))
+
+    def test_deleted_journey_removes_load(self):
+        self.book(1)
+        old_day = self.journey.departure_time
+
+        Journey.objects.get(id=self.journey.id).delete()
+        self.assertFalse(DailyLoad.objects.filter(day=old_day[:10]).exists())
+
+    def test_rescheduled_journey_moves_load(self):
+        self.book(1)
+        journey = Journey.objects.get(id=self.journey.id)
+        journey.departure_time = "2024-07-01 08:00"
+        journey.arrival_time = "2024-07-01 12:00"
+        journey.save()
+
+        self.assertEqual(DailyLoad.objects.count(), 1)
+        self.assertEqual(self.load(journey).tickets_sold, 1)
+
+    def test_command_rebuilds_rollup(self):
+        self.book(1, 2)
+        DailyLoad.objects.all().delete()
+
+        out = StringIO()
+        call_command("refresh_daily_loads", stdout=out)
+
+        self.assertIn("Refreshed 1 daily load rows", out.getvalue())
+        self.assertEqual(self.load(self.journey).tickets_sold, 2)
+
+
+class LoadFactorApiTest(APITestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.admin = sample_user(is_staff=True)
+        self.client.force_authenticate(self.admin)
+        self.journey = sample_journey()
+        self.small_train = sample_train(
+            name="Small", cargo_num=1, places_in_cargo=10
+        )
+        self.small_journeys = [
+            Journey.objects.create(
+                route=self.journey.route,
+                train=self.small_train,
+                departure_time=f"2024-06-{day} 08:00",
+                arrival_time=f"2024-06-{day} 12:00",
+            )
+            for day in (29, 30)
+        ]
+        order = Order.objects.create(user=self.admin)
+        Ticket.objects.bulk_create(
+            [
+                Ticket(order=order, journey=journey, cargo=1, seat=seat)
+                for journey, seats in zip(self.small_journeys, (5, 2))
+                for seat in range(1, seats + 1)
+            ]
+        )
+        call_command("refresh_daily_loads", stdout=StringIO())
+
+    def test_load_factor_per_train(self):
+        response = self.client.get(LOAD_FACTOR_URL, {"group_by": "train"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        small, big = response.data["results"]
+        self.assertEqual(small["train_name"], "Small")
+        self.assertEqual(small["rank"], 1)
+        self.assertEqual(small["tickets_sold"], 7)
+        self.assertEqual(small["capacity"], 20)
+        self.assertAlmostEqual(small["load_factor"], 0.35)
+        self.assertEqual(big["rank"], 2)
+        self.assertEqual(big["load_factor"], 0)
+        self.assertIsNone(small["moving_load_factor"])
+
+    def test_moving_load_factor_per_day(self):
+        response = self.client.get(
+            LOAD_FACTOR_URL,
+            {"group_by": "train,day", "train": self.small_train.id},
+        )
+
+        first, second = response.data["results"]
+        self.assertEqual(str(first["day"]), "2024-06-29")
+        self.assertAlmostEqual(first["load_factor"], 0.5)
+        self.assertAlmostEqual(second["load_factor"], 0.2)
+        self.assertAlmostEqual(second["moving_load_factor"], 0.35)
+
+    def test_date_range(self):
+        response = self.client.get(
+            LOAD_FACTOR_URL,
+            {"group_by": "day", "date_from": "2024-06-30"},
+        )
+
+        self.assertEqual(
+            [str(load["day"]) for load in response.data["results"]],
+            ["2024-06-30"],
+        )
+
+    def test_unknown_group(self):
+        response = self.client.get(LOAD_FACTOR_URL, {"group_by": "crew"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(sample_user(email="user@test.com"))
+
+        response = self.client.get(LOAD_FACTOR_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,89 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user import hashers
+from user.hashers import OffloadedPBKDF2PasswordHasher
+from user.throttling import login_slot
+
+TOKEN_URL = reverse("user:token_obtain_pair")
+REGISTER_URL = reverse("user:create")
+
+
+def shut_down_pool():
+    if hashers._executor is not None:
+        hashers._executor.shutdown()
+        hashers._executor = None
+
+
+class OffloadedHasherTest(TestCase):
+    def test_same_hash_as_pbkdf2(self):
+        expected = PBKDF2PasswordHasher().encode("secret123", "salt", 1000)
+
+        for workers in (0, 1):
+            with self.subTest(workers=workers), override_settings(
+                PASSWORD_HASHING_WORKERS=workers
+            ):
+                self.addCleanup(shut_down_pool)
+                encoded = OffloadedPBKDF2PasswordHasher().encode(
+                    "secret123", "salt", 1000
+                )
+                self.assertEqual(encoded, expected)
+
+    @override_settings(
+        PASSWORD_HASHERS=["user.hashers.OffloadedPBKDF2PasswordHasher"],
+        PASSWORD_HASHING_WORKERS=1,
+    )
+    def test_verifies_existing_hashes_in_the_pool(self):
+        self.addCleanup(shut_down_pool)
+        encoded = PBKDF2PasswordHasher().encode("secret123", "salt", 1000)
+
+        self.assertTrue(check_password("secret123", encoded))
+        self.assertFalse(check_password("wrong", encoded))
+        self.assertIsNotNone(hashers._executor)
+
+
+@override_settings(LOGIN_CONCURRENCY_LIMIT=2)
+class LoginConcurrencyTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        get_user_model().objects.create_user(
+            email="user@test.com", password="secret123"
+        )
+
+    def login(self, email="user@test.com"):
+        return self.client.post(
+            TOKEN_URL, {"email": email, "password": "secret123"}
+        )
+
+    def test_login_while_email_is_hashing(self):
+        with login_slot(["email:user@test.com"]), login_slot(
+            ["email:user@test.com"]
+        ):
+            res = self.login(email=" User@Test.com")
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+    def test_login_while_ip_is_hashing(self):
+        with login_slot(["ip:127.0.0.1"]), login_slot(["ip:127.0.0.1"]):
+            login = self.login(email="other@test.com")
+            register = self.client.post(
+                REGISTER_URL, {"email": "new@test.com", "password": "pass1234"}
+            )
+
+        self.assertEqual(login.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(
+            register.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+    @override_settings(LOGIN_CONCURRENCY_LIMIT=0)
+    def test_limit_disabled(self):
+        with login_slot(["ip:127.0.0.1"]), login_slot(["ip:127.0.0.1"]):
+            res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -0,0 +1,124 @@
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+from rest_framework import status
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+CONTENT = bytes(range(256)) * 40
+
+MEDIA_PATH = "uploads/images/variants/sample-large-0123456789abcdef.jpg"
+
+UPLOAD_PATH = "uploads/images/sample.jpg"
+
+ORIGINAL_PATH = f"uploads/images/{'ab' * 32}.jpg"
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, MEDIA_OFFLOAD_HEADER=None)
+class MediaServingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for directory in ("variants", "incoming"):
+            os.makedirs(
+                os.path.join(MEDIA_ROOT, "uploads", "images", directory)
+            )
+        for path in (
+            MEDIA_PATH,
+            UPLOAD_PATH,
+            ORIGINAL_PATH,
+            f"uploads/images/incoming/{'ab' * 32}.jpg",
+        ):
+            with open(os.path.join(MEDIA_ROOT, path), "wb") as file:
+                file.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def test_serves_file_with_validators_and_immutable_cache(self):
+        response = self.client.get(f"/media/{MEDIA_PATH}")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b"".join(response.streaming_content), CONTENT)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertTrue(response["ETag"])
+
+    def test_if_none_match_returns_not_modified(self):
+        etag = self.client.get(f"/media/{MEDIA_PATH}")["ETag"]
+
+        response = self.client.get(
+            f"/media/{MEDIA_PATH}", HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_if_none_match_list_and_weak_etags(self):
+        etag = self.client.get(f"/media/{MEDIA_PATH}")["ETag"]
+
+        for header in (f'"other", W/{etag}', "*"):
+            response = self.client.get(
+                f"/media/{MEDIA_PATH}", HTTP_IF_NONE_MATCH=header
+            )
+
+            self.assertEqual(
+                response.status_code, status.HTTP_304_NOT_MODIFIED
+            )
+
+    def test_only_hashed_images_are_served(self):
+        for path in (
+            UPLOAD_PATH,
+            "uploads/images/variants/sample.jpg",
+            f"uploads/images/incoming/{'ab' * 32}.jpg",
+        ):
+            response = self.client.get(f"/media/{path}")
+
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_serves_hashed_originals(self):
+        response = self.client.get(f"/media/{ORIGINAL_PATH}")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b"".join(response.streaming_content), CONTENT)
+        self.assertIn("immutable", response["Cache-Control"])
+
+    def test_range_request_returns_partial_content(self):
+        response = self.client.get(
+            f"/media/{MEDIA_PATH}", HTTP_RANGE="bytes=10-19"
+        )
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), CONTENT[10:20])
+        self.assertEqual(
+            response["Content-Range"], f"bytes 10-19/{len(CONTENT)}"
+        )
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(
+            f"/media/{MEDIA_PATH}", HTTP_RANGE=f"bytes={len(CONTENT)}-"
+        )
+
+        self.assertEqual(response.status_code, 416)
+
+    def test_path_traversal_is_rejected(self):
+        response = self.client.get("/media/../manage.py")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(
+        MEDIA_OFFLOAD_HEADER="X-Accel-Redirect",
+        MEDIA_OFFLOAD_PREFIX="/protected-media/",
+    )
+    def test_offload_to_proxy(self):
+        response = self.client.get(f"/media/{MEDIA_PATH}")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response["X-Accel-Redirect"], f"/protected-media/{MEDIA_PATH}"
+        )
+        self.assertEqual(response.content, b"")
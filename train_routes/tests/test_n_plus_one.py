@@ -0,0 +1,275 @@
+"""
+Every serializer of train_routes.serializers rendered over one row and
+over SIZE rows of everything it shows. The number of queries must not
+grow with the rows, a failure names the serializer field whose
+attribute access ran the extra queries.
+"""
+import sys
+import traceback
+from collections import Counter
+from contextlib import ExitStack
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection, transaction
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import serializers as drf_serializers
+from rest_framework.test import APITestCase, APIClient
+
+from train_routes import serializers
+from train_routes.analytics import refresh_daily_loads, roll_up_sales
+from train_routes.autocomplete import invalidate_station_index
+from train_routes.geo import invalidate_station_tree
+from train_routes.metrics import fingerprint
+from train_routes.models import (
+    ArchivedOrder,
+    Crew,
+    Journey,
+    Order,
+    Route,
+    Ticket,
+    Train,
+)
+from train_routes.tests import factories
+from train_routes.tests.test_station_api import sample_user
+
+
+# Fits on one page
+SIZE = 4
+
+# name, url name, model of the rendered object for detail urls,
+# query params, settings
+VIEW_CASES = (
+    ("stations", "station-list", None, {}, {}),
+    ("nearby stations", "station-nearby", None, {"lat": 50, "lon": 20}, {}),
+    ("routes", "route-list", None, {}, {}),
+    (
+        "expanded routes",
+        "route-list",
+        None,
+        {"expand": "source,destination"},
+        {},
+    ),
+    ("route", "route-detail", Route, {}, {}),
+    ("train types", "traintype-list", None, {}, {}),
+    ("trains", "train-list", None, {}, {}),
+    ("expanded trains", "train-list", None, {"expand": "train_type"}, {}),
+    ("train", "train-detail", Train, {}, {}),
+    ("journeys", "journey-list", None, {}, {}),
+    (
+        "journeys from the search table",
+        "journey-list",
+        None,
+        {},
+        {"JOURNEY_LIST_FROM_SEARCH_TABLE": True},
+    ),
+    ("expanded journeys", "journey-list", None, {"expand": "route,train"}, {}),
+    ("journey", "journey-detail", Journey, {}, {}),
+    ("crew", "crew-list", None, {}, {}),
+    ("expanded crew", "crew-list", None, {"expand": "journeys"}, {}),
+    ("crew member", "crew-detail", Crew, {}, {}),
+    ("orders", "order-list", None, {}, {}),
+    ("order", "order-detail", Order, {}, {}),
+    ("archived orders", "archived-order-list", None, {}, {}),
+    ("archived order", "archived-order-detail", ArchivedOrder, {}, {}),
+    ("load factors", "load-factor-list", None, {}, {}),
+    (
+        "load factors by day",
+        "load-factor-list",
+        None,
+        {"group_by": "day"},
+        {},
+    ),
+    ("sales", "sales-list", None, {}, {}),
+)
+
+# Serializers that only answer writes, rendered over the queryset their
+# view would need to list them
+DIRECT_CASES = (
+    (serializers.RouteSerializer, Route.objects.all),
+    (serializers.TrainSerializer, Train.objects.all),
+    (serializers.TrainImageSerializer, Train.objects.all),
+    (serializers.JourneySerializer, Journey.objects.all),
+    (
+        serializers.OrderSerializer,
+        lambda: Order.objects.prefetch_related("tickets"),
+    ),
+    (
+        serializers.AutoAssignOrderSerializer,
+        lambda: Order.objects.prefetch_related("tickets"),
+    ),
+    (
+        serializers.TicketListSerializer,
+        lambda: Ticket.objects.select_related(
+            "journey__route__destination", "journey__train"
+        ),
+    ),
+)
+
+# Serializers that only validate query parameters
+QUERY_SERIALIZERS = {
+    serializers.NearbyStationsQuerySerializer,
+    serializers.RouteDistanceQuerySerializer,
+    serializers.RollupQuerySerializer,
+    serializers.LoadFactorQuerySerializer,
+    serializers.SalesQuerySerializer,
+}
+
+
+def _field_of(frame) -> str | None:
+    """Innermost serializer field reading its attribute up the stack"""
+    while frame is not None:
+        field = frame.f_locals.get("self")
+        if (
+            isinstance(field, drf_serializers.Field)
+            and field.field_name
+            and frame.f_code.co_name in ("get_attribute", "to_representation")
+        ):
+            parent = field.parent
+            if isinstance(parent, drf_serializers.ListSerializer):
+                parent = parent.parent
+            return (
+                f"{type(parent).__name__}.{field.field_name} "
+                f"(source={field.source})"
+            )
+        frame = frame.f_back
+    return None
+
+
+def _stack(frame) -> list[str]:
+    entries = [
+        entry
+        for entry in traceback.extract_stack(frame)
+        if "/rest_framework/" in entry.filename
+        or "/train_routes/" in entry.filename
+        and "/tests/" not in entry.filename
+    ]
+    return [
+        line.rstrip()
+        for entry in traceback.format_list(entries[-8:])
+        for line in entry.splitlines()
+    ]
+
+
+class QueryTracer:
+    """execute_wrapper keeping each query with the field that ran it"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        frame = sys._getframe(1)
+        self.queries.append(
+            (fingerprint(sql), _field_of(frame), _stack(frame))
+        )
+        return execute(sql, params, many, context)
+
+    def statements(self) -> Counter:
+        return Counter(statement for statement, _, _ in self.queries)
+
+
+def _report(name, one, many) -> str:
+    lines = [
+        f"{name}: {len(one.queries)} queries for 1 row, "
+        f"{len(many.queries)} for {SIZE}"
+    ]
+    for statement, extra in (many.statements() - one.statements()).items():
+        field, stack = next(
+            (field, stack)
+            for query, field, stack in many.queries
+            if query == statement
+        )
+        lines += [
+            f"  {extra} more: {statement[:300]}",
+            f"  from {field or 'outside serializer fields'}",
+            *("  " + line for line in stack),
+        ]
+    return "\n".join(lines)
+
+
+class NPlusOneTest(APITestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = sample_user(is_staff=True)
+        self.client.force_authenticate(self.user)
+
+    def build(self, size: int) -> None:
+        journeys = factories.create_journeys(size)
+        factories.create_crew(size, journeys)
+        factories.create_orders(size, self.user, journeys)
+        factories.create_archived_orders(size, self.user)
+        refresh_daily_loads()
+        with override_settings(SALES_ROLLUP_LAG=timedelta(0)):
+            roll_up_sales()
+        invalidate_station_index()
+        invalidate_station_tree()
+
+    def render_all(self, size: int) -> dict[str, QueryTracer]:
+        """Query tracers of every case over ``size`` rows, rolled back"""
+        tracers = {}
+        with transaction.atomic():
+            self.build(size)
+            for name, url_name, model, params, options in VIEW_CASES:
+                args = [model.objects.earliest("id").pk] if model else []
+                url = reverse(f"train_routes:{url_name}", args=args)
+                tracer = tracers[name] = QueryTracer()
+                with override_settings(**options), connection.execute_wrapper(
+                    tracer
+                ):
+                    response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 200, name)
+            for serializer_class, queryset in DIRECT_CASES:
+                tracer = tracers[serializer_class.__name__] = QueryTracer()
+                with connection.execute_wrapper(tracer):
+                    serializer_class(queryset(), many=True).data
+            transaction.set_rollback(True)
+        return tracers
+
+    def test_queries_do_not_grow_with_rows(self):
+        one = self.render_all(1)
+        many = self.render_all(SIZE)
+
+        failures = [
+            _report(name, one[name], many[name])
+            for name in one
+            if len(many[name].queries) > len(one[name].queries)
+        ]
+        if failures:
+            self.fail("\n\n" + "\n\n".join(failures))
+
+    def test_every_serializer_is_rendered(self):
+        output_serializers = {
+            value
+            for value in vars(serializers).values()
+            if isinstance(value, type)
+            and issubclass(value, drf_serializers.Serializer)
+            and value.__module__ == serializers.__name__
+        } - QUERY_SERIALIZERS
+        # Serializers rendering without Serializer.to_representation
+        overriding = [
+            serializer
+            for serializer in output_serializers
+            if "to_representation" in vars(serializer)
+        ]
+        with ExitStack() as stack:
+            spies = [
+                stack.enter_context(
+                    mock.patch.object(
+                        serializer,
+                        "to_representation",
+                        autospec=True,
+                        side_effect=serializer.to_representation,
+                    )
+                )
+                for serializer in [drf_serializers.Serializer, *overriding]
+            ]
+            self.render_all(1)
+
+        rendered = {
+            type(call.args[0])
+            for spy in spies
+            for call in spy.mock_calls
+        }
+        missing = output_serializers - rendered
+        self.assertFalse({serializer.__name__ for serializer in missing})
@@ -0,0 +1,127 @@
+import random
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from train_routes.geo import (
+    StationTree,
+    haversine_km,
+    invalidate_station_tree,
+)
+from train_routes.models import Station
+from train_routes.tests.test_station_api import sample_station, sample_user
+
+
+NEARBY_URL = reverse("train_routes:station-nearby")
+
+
+class HaversineTest(SimpleTestCase):
+    def test_distance_between_cities(self):
+        kyiv_lviv = haversine_km(50.4501, 30.5234, 49.8397, 24.0297)
+
+        self.assertAlmostEqual(kyiv_lviv, 468, delta=2)
+
+    def test_across_antimeridian(self):
+        self.assertAlmostEqual(
+            haversine_km(0, 179.5, 0, -179.5), 111.2, delta=0.5
+        )
+
+
+class StationTreeTest(SimpleTestCase):
+    def setUp(self) -> None:
+        rng = random.Random(0)
+        self.stations = [
+            Station(
+                id=station_id,
+                name=f"Station {station_id}",
+                latitude=rng.uniform(-90, 90),
+                longtitude=rng.uniform(-180, 180),
+            )
+            for station_id in range(1, 2001)
+        ]
+        self.tree = StationTree(self.stations)
+
+    def brute_force(self, lat, lon, limit, radius=None):
+        distances = sorted(
+            (haversine_km(lat, lon, s.latitude, s.longtitude), s.id)
+            for s in self.stations
+        )
+        if radius is not None:
+            distances = [item for item in distances if item[0] <= radius]
+        return [station_id for _, station_id in distances[:limit]]
+
+    def test_nearest_matches_brute_force(self):
+        for lat, lon in ((50.45, 30.52), (-89.9, 0), (10, 179.9)):
+            nearest = self.tree.nearest(lat, lon, 10)
+
+            self.assertEqual(
+                [station.id for station in nearest],
+                self.brute_force(lat, lon, 10),
+            )
+
+    def test_nearest_within_radius(self):
+        nearest = self.tree.nearest(50.45, 30.52, 50, radius_km=1500)
+
+        self.assertEqual(
+            [station.id for station in nearest],
+            self.brute_force(50.45, 30.52, 50, radius=1500),
+        )
+        self.assertTrue(all(station.distance <= 1500 for station in nearest))
+
+    def test_returns_copies(self):
+        nearest = self.tree.nearest(0, 0, 1)
+
+        self.assertFalse(hasattr(self.stations[0], "distance"))
+        self.assertIsNot(nearest[0], self.stations[nearest[0].id - 1])
+
+
+class NearbyStationsApiTest(APITestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.force_authenticate(sample_user())
+        invalidate_station_tree()
+        sample_station(name="Kyiv", latitude=50.4501, longtitude=30.5234)
+        sample_station(name="Fastiv", latitude=50.0762, longtitude=29.9177)
+        sample_station(name="Lviv", latitude=49.8397, longtitude=24.0297)
+        sample_station(name="Suva", latitude=-18.1416, longtitude=178.4419)
+        sample_station(name="Apia", latitude=-13.8333, longtitude=-171.75)
+
+    def nearby(self, **params):
+        response = self.client.get(NEARBY_URL, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [station["name"] for station in response.data]
+
+    def test_within_radius(self):
+        self.assertEqual(
+            self.nearby(lat=50.45, lon=30.52, radius=100), ["Kyiv", "Fastiv"]
+        )
+
+    def test_across_antimeridian(self):
+        self.assertEqual(
+            self.nearby(lat=-16, lon=179.9, radius=1200), ["Suva", "Apia"]
+        )
+
+    def test_nearest_without_radius(self):
+        self.assertEqual(
+            self.nearby(lat=49.8, lon=24, limit=2), ["Lviv", "Fastiv"]
+        )
+
+    @override_settings(STATION_NEARBY_IN_MEMORY=True)
+    def test_in_memory_radius(self):
+        self.assertEqual(
+            self.nearby(lat=50.45, lon=30.52, radius=100), ["Kyiv", "Fastiv"]
+        )
+
+    def test_distance_in_response(self):
+        response = self.client.get(
+            NEARBY_URL, {"lat": 50.4501, "lon": 30.5234, "limit": 1}
+        )
+
+        self.assertAlmostEqual(response.data[0]["distance"], 0, places=3)
+
+    def test_invalid_coordinates(self):
+        response = self.client.get(NEARBY_URL, {"lat": 91, "lon": 0})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,94 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from train_routes.models import Journey, Order, Ticket
+from train_routes.tests.test_station_api import (
+    ORDER_URL,
+    sample_journey,
+    sample_route,
+    sample_train,
+    sample_user,
+)
+
+
+def detail_order_url(order_id):
+    return reverse("train_routes:order-detail", args=[order_id])
+
+
+class OrderQueryCountTest(APITestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        self.journey = sample_journey()
+        self.created = 0
+
+    def create_orders(self, count):
+        """Create orders with one ticket, 100 tickets per journey"""
+        orders = Order.objects.bulk_create(
+            Order(user=self.user) for _ in range(count)
+        )
+        tickets = []
+        for order in orders:
+            if self.created and self.created % 100 == 0:
+                self.journey = Journey.objects.create(
+                    route=self.journey.route,
+                    train=self.journey.train,
+                    departure_time=self.journey.departure_time,
+                    arrival_time=self.journey.arrival_time,
+                )
+            tickets.append(
+                Ticket(
+                    order=order,
+                    journey=self.journey,
+                    cargo=1,
+                    seat=self.created % 100 + 1,
+                )
+            )
+            self.created += 1
+        Ticket.objects.bulk_create(tickets)
+        return orders
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(ORDER_URL, {"limit": 1000})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response
+
+    def test_order_list_query_count_is_constant(self):
+        self.create_orders(1)
+        single, _ = self.count_list_queries()
+
+        self.create_orders(499)
+        many, response = self.count_list_queries()
+
+        self.assertEqual(response.data["count"], 500)
+        self.assertEqual(single, many)
+
+    def test_order_detail_nests_journeys_without_extra_queries(self):
+        order = self.create_orders(1)[0]
+        other_journey = Journey.objects.create(
+            route=sample_route(),
+            train=sample_train(name="Other"),
+            departure_time="2024-07-01 08:00",
+            arrival_time="2024-07-01 12:00",
+        )
+        for seat in range(2, 31):
+            Ticket.objects.create(
+                order=order, journey=other_journey, cargo=1, seat=seat
+            )
+
+        with self.assertNumQueries(3):
+            response = self.client.get(detail_order_url(order.id))
+
+        journeys = {
+            ticket["journey"]["id"]: ticket["journey"]
+            for ticket in response.data["tickets"]
+        }
+        self.assertEqual(journeys[other_journey.id]["taken_places"], 29)
+        self.assertEqual(
+            journeys[self.journey.id]["route"]["source"], "TestStation"
+        )
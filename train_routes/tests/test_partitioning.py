@@ -0,0 +1,250 @@
+from datetime import date, datetime
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APITestCase, APITransactionTestCase, APIClient
+
+from train_routes.models import Journey, JourneySearchRow, Order, Ticket
+from train_routes.partitioning import (
+    add_months,
+    default_name,
+    ensure_partitions,
+    parent_index_sql,
+    partition_name,
+    partition_sql,
+    range_check_sql,
+    unique_index_sql,
+)
+from train_routes.tests.test_station_api import (
+    JOURNEY_URL,
+    ORDER_URL,
+    sample_journey,
+    sample_user,
+)
+
+
+class PartitionSqlTest(TestCase):
+    def test_add_months_wraps_years(self):
+        self.assertEqual(add_months(date(2024, 11, 1), 3), date(2025, 2, 1))
+        self.assertEqual(add_months(date(2024, 1, 1), -1), date(2023, 12, 1))
+
+    def test_monthly_partition(self):
+        self.assertEqual(
+            partition_name("train_routes_ticket", date(2024, 6, 1)),
+            "train_routes_ticket_p2024_06",
+        )
+        self.assertEqual(
+            partition_sql("train_routes_ticket", date(2024, 12, 1)),
+            'CREATE TABLE IF NOT EXISTS "train_routes_ticket_p2024_12" '
+            'PARTITION OF "train_routes_ticket" FOR VALUES '
+            "FROM ('2024-12-01') TO ('2025-01-01')",
+        )
+
+    def test_unique_indexes_include_partition_key(self):
+        statements = unique_index_sql(Ticket)
+
+        self.assertEqual(len(statements), 2)
+        self.assertIn('("id", "departure_time")', statements[0])
+        self.assertIn(
+            '("journey_id", "cargo", "seat", "departure_time")',
+            statements[1],
+        )
+        for statement in statements:
+            self.assertIn("CONCURRENTLY", statement)
+
+    def test_range_check_is_validated_separately(self):
+        add, validate = range_check_sql(
+            "train_routes_journey", date(2025, 1, 1)
+        )
+
+        self.assertIn("< '2025-01-01'", add)
+        self.assertTrue(add.endswith("NOT VALID"))
+        self.assertIn("VALIDATE CONSTRAINT", validate)
+
+    def test_parent_index_replaces_name_and_table(self):
+        self.assertEqual(
+            parent_index_sql(
+                "CREATE INDEX train_routes_ticket_order_id_5f6e ON "
+                "public.train_routes_ticket_legacy USING btree (order_id)",
+                "train_routes_ticket",
+            ),
+            'CREATE INDEX ON "train_routes_ticket" USING btree (order_id)',
+        )
+
+    @skipUnless(connection.vendor != "postgresql", "Runs on Postgres")
+    def test_command_needs_postgres(self):
+        with self.assertRaises(CommandError):
+            call_command("partition_tables", stdout=StringIO())
+
+
+@skipUnless(connection.vendor == "postgresql", "Partitioning needs Postgres")
+class PartitionedTablesTest(APITransactionTestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = sample_user(is_staff=True)
+        self.client.force_authenticate(self.user)
+        self.journey = sample_journey()
+        call_command("partition_tables", "--convert", stdout=StringIO())
+
+    def partition_of(self, journey) -> str:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT tableoid::regclass::text FROM train_routes_journey "
+                "WHERE id = %s",
+                [journey.id],
+            )
+            return cursor.fetchone()[0]
+
+    def test_list_create_and_reschedule_journeys(self):
+        self.client.post(
+            ORDER_URL,
+            {"tickets": [{"cargo": 1, "seat": 1, "journey": self.journey.id}]},
+            format="json",
+        )
+        journey = Journey.objects.create(
+            route=self.journey.route,
+            train=self.journey.train,
+            departure_time=datetime(2024, 7, 1, 8, 0),
+            arrival_time=datetime(2024, 7, 1, 12, 0),
+        )
+
+        listed = self.client.get(JOURNEY_URL, {"departure": "2024-06"})
+        detail = self.client.get(f"{JOURNEY_URL}{self.journey.id}/")
+        rescheduled = self.client.patch(
+            f"{JOURNEY_URL}{self.journey.id}/",
+            {
+                "departure_time": "2024-06-30T08:00",
+                "arrival_time": "2024-06-30T12:00",
+            },
+        )
+
+        self.assertEqual(listed.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [row["tickets_available"] for row in listed.data["results"]],
+            [99],
+        )
+        self.assertEqual(detail.status_code, status.HTTP_200_OK)
+        self.assertEqual(detail.data["taken_places"], 1)
+        self.assertEqual(rescheduled.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            Ticket.objects.get().departure_time, datetime(2024, 6, 30, 8, 0)
+        )
+        self.assertEqual(
+            JourneySearchRow.objects.get(journey=journey).tickets_taken, 0
+        )
+
+    def test_journeys_past_the_partitions_wait_in_default(self):
+        later = datetime.now().replace(microsecond=0).replace(
+            year=datetime.now().year + 5, day=1
+        )
+        journey = Journey.objects.create(
+            route=self.journey.route,
+            train=self.journey.train,
+            departure_time=later,
+            arrival_time=later.replace(hour=23),
+        )
+        self.assertEqual(
+            self.partition_of(journey), default_name("train_routes_journey")
+        )
+
+        ensure_partitions(0, today=later.date())
+
+        self.assertEqual(
+            self.partition_of(journey),
+            f"train_routes_journey_p{later:%Y_%m}",
+        )
+        self.assertEqual(Journey.objects.get(id=journey.id).id, journey.id)
+
+
+class TicketDepartureTimeTest(APITestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        self.journey = sample_journey()
+
+    def test_booked_and_saved_tickets_copy_departure_time(self):
+        self.client.post(
+            ORDER_URL,
+            {"tickets": [{"cargo": 1, "seat": 1, "journey": self.journey.id}]},
+            format="json",
+        )
+        Ticket.objects.create(
+            order=Order.objects.create(user=self.user),
+            journey=self.journey,
+            cargo=1,
+            seat=2,
+        )
+
+        self.assertEqual(
+            set(Ticket.objects.values_list("departure_time", flat=True)),
+            {datetime(2024, 6, 29, 0, 15)},
+        )
+
+    def test_rescheduled_journey_moves_tickets(self):
+        Ticket.objects.create(
+            order=Order.objects.create(user=self.user),
+            journey=self.journey,
+            cargo=1,
+            seat=1,
+        )
+        journey = Journey.objects.get(id=self.journey.id)
+        journey.departure_time = datetime(2024, 7, 2, 8, 0)
+        journey.arrival_time = datetime(2024, 7, 2, 12, 0)
+        journey.save()
+
+        self.assertEqual(
+            Ticket.objects.get().departure_time, datetime(2024, 7, 2, 8, 0)
+        )
+
+
+class JourneyDateFilterTest(APITestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.force_authenticate(sample_user())
+        self.journey = sample_journey()
+        self.later = Journey.objects.create(
+            route=self.journey.route,
+            train=self.journey.train,
+            departure_time="2024-06-30 23:50",
+            arrival_time="2024-07-01 06:00",
+        )
+        self.client.post(
+            ORDER_URL,
+            {"tickets": [{"cargo": 1, "seat": 1, "journey": self.later.id}]},
+            format="json",
+        )
+
+    def ids(self, **params):
+        response = self.client.get(JOURNEY_URL, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [journey["id"] for journey in response.data["results"]]
+
+    def test_day_range(self):
+        self.assertEqual(self.ids(departure="2024-06-29"), [self.journey.id])
+        self.assertEqual(self.ids(departure="2024-06-30"), [self.later.id])
+        self.assertEqual(self.ids(arrival="2024-07-01"), [self.later.id])
+
+    def test_month_range(self):
+        self.assertEqual(
+            self.ids(departure="2024-06"), [self.journey.id, self.later.id]
+        )
+        self.assertEqual(self.ids(departure="2024-07"), [])
+
+    def test_other_values_match_text(self):
+        self.assertEqual(self.ids(departure="23:50"), [self.later.id])
+
+    def test_tickets_counted_within_departure_range(self):
+        response = self.client.get(
+            JOURNEY_URL,
+            {"departure": "2024-06-30", "fields": "id,tickets_available"},
+        )
+
+        self.assertEqual(
+            response.data["results"],
+            [{"id": self.later.id, "tickets_available": 99}],
+        )
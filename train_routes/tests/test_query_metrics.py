@@ -0,0 +1,107 @@
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from train_routes.metrics import (
+    Histogram,
+    fingerprint,
+    query_metrics,
+    statement_digest,
+)
+from train_routes.tests.test_station_api import (
+    JOURNEY_URL,
+    sample_journey,
+    sample_user,
+)
+
+
+METRICS_URL = reverse("metrics")
+
+STATEMENTS_URL = reverse("metrics-statements")
+
+PREFIX = "train_service"
+
+
+class FingerprintTest(SimpleTestCase):
+    def test_collapses_literals_and_in_lists(self):
+        self.assertEqual(
+            fingerprint(
+                'SELECT "id" FROM "t"\n WHERE "id" IN (%s, %s, %s) '
+                "AND name = 'x' LIMIT 21"
+            ),
+            'SELECT "id" FROM "t" WHERE "id" IN (...) AND name = ? LIMIT ?',
+        )
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram((1, 5))
+        for value in (0, 1, 3, 7):
+            histogram.observe(value)
+
+        self.assertEqual(
+            list(histogram.samples()), [(1, 2), (5, 3), ("+Inf", 4)]
+        )
+        self.assertEqual(histogram.sum, 11)
+
+
+class QueryMetricsTest(APITestCase):
+    def setUp(self) -> None:
+        query_metrics.reset()
+        self.client = APIClient()
+        self.client.force_authenticate(sample_user(is_staff=True))
+        sample_journey()
+
+    def test_records_queries_per_action(self):
+        self.client.get(JOURNEY_URL)
+        self.client.get(JOURNEY_URL)
+
+        metrics = query_metrics.endpoints["JourneyViewSet.list"]
+        self.assertEqual(metrics.queries.count, 2)
+        self.assertGreater(metrics.queries.sum, 0)
+        self.assertGreater(metrics.render_time.sum, 0)
+        self.assertTrue(metrics.statements)
+
+    def test_prometheus_text_for_admins(self):
+        self.client.get(JOURNEY_URL)
+
+        response = self.client.get(METRICS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        body = response.content.decode()
+        self.assertIn(
+            "# TYPE train_service_request_db_queries histogram", body
+        )
+        self.assertIn(
+            'train_service_request_db_queries_count'
+            '{endpoint="JourneyViewSet.list"} 1',
+            body,
+        )
+        self.assertIn('le="+Inf"', body)
+        self.assertIn("train_service_slowest_statement_seconds{", body)
+
+    def test_statements_are_labelled_by_digest_only(self):
+        self.client.get(JOURNEY_URL)
+        statement = next(
+            iter(query_metrics.endpoints["JourneyViewSet.list"].statements)
+        )
+        labels = (
+            '{endpoint="JourneyViewSet.list",'
+            f'fingerprint="{statement_digest(statement)}"}}'
+        )
+
+        body = self.client.get(METRICS_URL).content.decode()
+        statements = self.client.get(STATEMENTS_URL).data
+
+        self.assertIn(f"{PREFIX}_slowest_statement_total{labels} 1", body)
+        self.assertIn(f"{PREFIX}_slowest_statement_seconds{labels} ", body)
+        self.assertNotIn("SELECT", body)
+        self.assertEqual(statements[statement_digest(statement)], statement)
+
+    def test_metrics_need_admin(self):
+        self.client.force_authenticate(sample_user(email="user@test.com"))
+
+        for url in (METRICS_URL, STATEMENTS_URL):
+            response = self.client.get(url)
+
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
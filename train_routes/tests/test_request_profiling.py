@@ -0,0 +1,102 @@
+import marshal
+import time
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from train_routes.profiling import (
+    StackSampler,
+    cprofile_lock,
+    request_profiles,
+)
+from train_routes.tests.test_station_api import (
+    JOURNEY_URL,
+    STATION_URL,
+    sample_journey,
+    sample_user,
+)
+
+
+PROFILE_LIST_URL = reverse("profile-list")
+
+
+def profile_url(profile_id):
+    return reverse("profile-download", args=[profile_id])
+
+
+@override_settings(
+    REQUEST_PROFILING_ENABLED=True,
+    REQUEST_PROFILING_SAMPLE_RATE=1.0,
+    REQUEST_PROFILING_THRESHOLD=0,
+)
+class RequestProfilingTest(APITestCase):
+    def setUp(self) -> None:
+        request_profiles.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(sample_user(is_staff=True))
+        sample_journey()
+
+    def test_keeps_slow_profiled_requests(self):
+        self.client.get(JOURNEY_URL, {"departure": "2024-06-29"})
+        self.client.get(STATION_URL)
+
+        response = self.client.get(PROFILE_LIST_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        profile = response.data[0]
+        self.assertEqual(profile["endpoint"], "JourneyViewSet.list")
+        self.assertEqual(profile["query_params"], {"departure": "2024-06-29"})
+        self.assertEqual(profile["format"], "pstats")
+
+    def test_download_pstats(self):
+        self.client.get(JOURNEY_URL)
+        profile_id = request_profiles.all()[0].id
+
+        response = self.client.get(profile_url(profile_id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("attachment", response["Content-Disposition"])
+        stats = marshal.loads(response.content)
+        self.assertTrue(
+            any(function == "get_queryset" for _, _, function in stats)
+        )
+
+    @override_settings(REQUEST_PROFILING_THRESHOLD=60)
+    def test_fast_requests_are_dropped(self):
+        self.client.get(JOURNEY_URL)
+
+        self.assertEqual(request_profiles.all(), [])
+
+    def test_requests_are_not_profiled_concurrently(self):
+        with cprofile_lock:
+            response = self.client.get(JOURNEY_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(request_profiles.all(), [])
+
+    def test_profiles_need_admin(self):
+        self.client.force_authenticate(sample_user(email="user@test.com"))
+
+        response = self.client.get(PROFILE_LIST_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class StackSamplerTest(SimpleTestCase):
+    def test_collapsed_stacks_of_the_sampled_thread(self):
+        sampler = StackSampler(0.001)
+        sampler.start()
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+        sampler.stop()
+
+        busy = [
+            count
+            for stack, count in sampler.stacks.items()
+            if stack.endswith(":test_collapsed_stacks_of_the_sampled_thread")
+        ]
+        self.assertTrue(busy)
@@ -0,0 +1,212 @@
+import os
+import random
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from train_routes.distances import (
+    UNREACHABLE,
+    DistanceIndex,
+    build_distance_index,
+    get_distance_index,
+    rebuild_distance_index,
+)
+from train_routes.models import Route
+from train_routes.tests.test_station_api import sample_station, sample_user
+
+
+DISTANCE_URL = reverse("train_routes:route-distance")
+
+INDEX_DIR = tempfile.mkdtemp()
+
+
+class RouteDistanceTestMixin:
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(INDEX_DIR, ignore_errors=True)
+
+    def remove_index(self):
+        """Rolled back stations and routes leave the file behind"""
+        path = settings.ROUTE_DISTANCE_INDEX_PATH
+        if os.path.exists(path):
+            os.remove(path)
+
+    def create_route(self, source, destination, distance):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Route.objects.create(
+                source=source, destination=destination, distance=distance
+            )
+
+
+def reference_distances(routes) -> dict:
+    """All pairs shortest distances by Floyd-Warshall over ``routes``"""
+    stations = {route.source_id for route in routes} | {
+        route.destination_id for route in routes
+    }
+    distances = {(station, station): 0 for station in stations}
+    for route in routes:
+        pair = (route.source_id, route.destination_id)
+        distances[pair] = min(distances.get(pair, UNREACHABLE), route.distance)
+    for middle in stations:
+        for source in stations:
+            for destination in stations:
+                through = distances.get(
+                    (source, middle), UNREACHABLE
+                ) + distances.get((middle, destination), UNREACHABLE)
+                if through < distances.get((source, destination), UNREACHABLE):
+                    distances[source, destination] = through
+    return distances
+
+
+@override_settings(
+    ROUTE_DISTANCE_WORKERS=0,
+    ROUTE_DISTANCE_LANDMARKS=3,
+    ROUTE_DISTANCE_INDEX_PATH=f"{INDEX_DIR}/incremental.bin",
+)
+class IncrementalUpdateTest(RouteDistanceTestMixin, TestCase):
+    def setUp(self) -> None:
+        self.remove_index()
+        self.rng = random.Random(0)
+        self.stations = [
+            sample_station(name=f"Station {number}") for number in range(12)
+        ]
+        self.routes = [
+            self.create_route(
+                *self.rng.sample(self.stations, 2), self.rng.randint(1, 100)
+            )
+            for _ in range(25)
+        ]
+        rebuild_distance_index()
+
+    def assertMatchesRebuild(self):
+        stored = DistanceIndex.load(f"{INDEX_DIR}/incremental.bin")
+        rebuilt = build_distance_index(
+            [stored.ids[landmark] for landmark in stored.landmarks]
+        )
+
+        self.assertEqual(list(stored.ids), list(rebuilt.ids))
+        self.assertEqual(stored.graph.edges(), rebuilt.graph.edges())
+        self.assertEqual(
+            list(stored.from_landmarks), list(rebuilt.from_landmarks)
+        )
+        self.assertEqual(list(stored.to_landmarks), list(rebuilt.to_landmarks))
+
+    def assertShortestDistances(self):
+        index = get_distance_index()
+        expected = reference_distances(self.routes)
+        for source in self.stations:
+            for destination in self.stations:
+                self.assertEqual(
+                    index.distance(source.id, destination.id),
+                    expected.get((source.id, destination.id)),
+                )
+
+    def test_landmarks_bound_the_search(self):
+        index = get_distance_index()
+
+        self.assertEqual(len(index.landmarks), 3)
+        self.assertEqual(len(index.from_landmarks), 3 * len(self.stations))
+        self.assertShortestDistances()
+
+    def test_random_changes_match_rebuild(self):
+        for _ in range(30):
+            action = self.rng.choice(["add", "change", "move", "delete"])
+            if action == "add" or not self.routes:
+                self.routes.append(
+                    self.create_route(
+                        *self.rng.sample(self.stations, 2),
+                        self.rng.randint(1, 100),
+                    )
+                )
+                continue
+            route = self.rng.choice(self.routes)
+            with self.captureOnCommitCallbacks(execute=True):
+                if action == "delete":
+                    self.routes.remove(route)
+                    route.delete()
+                else:
+                    if action == "move":
+                        route.source, route.destination = self.rng.sample(
+                            self.stations, 2
+                        )
+                    route.distance = self.rng.randint(1, 100)
+                    route.save()
+            self.assertMatchesRebuild()
+        self.assertShortestDistances()
+
+    def test_route_to_new_station_rebuilds(self):
+        station = sample_station(name="New")
+
+        self.create_route(self.stations[0], station, 7)
+
+        index = get_distance_index()
+        self.assertEqual(index.distance(self.stations[0].id, station.id), 7)
+        self.assertMatchesRebuild()
+
+
+@override_settings(
+    ROUTE_DISTANCE_WORKERS=0,
+    ROUTE_DISTANCE_INDEX_PATH=f"{INDEX_DIR}/api.bin",
+)
+class RouteDistanceApiTest(RouteDistanceTestMixin, APITestCase):
+    def setUp(self) -> None:
+        self.remove_index()
+        self.client = APIClient()
+        self.client.force_authenticate(sample_user())
+        self.kyiv = sample_station(name="Kyiv")
+        self.vinnytsia = sample_station(name="Vinnytsia")
+        self.lviv = sample_station(name="Lviv")
+        self.create_route(self.kyiv, self.vinnytsia, 270)
+        self.create_route(self.vinnytsia, self.lviv, 370)
+        self.create_route(self.kyiv, self.lviv, 700)
+        rebuild_distance_index()
+
+    def distance(self, source, destination):
+        return self.client.get(
+            DISTANCE_URL, {"from": source.id, "to": destination.id}
+        )
+
+    def test_shortest_path_over_several_routes(self):
+        response = self.distance(self.kyiv, self.lviv)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            {"from": self.kyiv.id, "to": self.lviv.id, "distance": 640},
+        )
+
+    def test_no_path(self):
+        response = self.distance(self.lviv, self.kyiv)
+
+        self.assertIsNone(response.data["distance"])
+
+    def test_shorter_route_updates_distance(self):
+        self.distance(self.kyiv, self.lviv)
+
+        self.create_route(self.kyiv, self.lviv, 600)
+
+        response = self.distance(self.kyiv, self.lviv)
+        self.assertEqual(response.data["distance"], 600)
+
+    def test_unavailable_until_built(self):
+        self.remove_index()
+
+        response = self.distance(self.kyiv, self.lviv)
+
+        self.assertEqual(
+            response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        self.assertFalse(os.path.exists(settings.ROUTE_DISTANCE_INDEX_PATH))
+
+    def test_unknown_station(self):
+        response = self.client.get(
+            DISTANCE_URL, {"from": self.kyiv.id, "to": 0}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
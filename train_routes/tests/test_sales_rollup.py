@@ -0,0 +1,124 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from train_routes.analytics import roll_up_sales, sales_watermark
+from train_routes.models import DailySales, Journey, Order, Ticket
+from train_routes.tests.test_station_api import (
+    sample_journey,
+    sample_train,
+    sample_train_type,
+    sample_user,
+)
+
+
+SALES_URL = reverse("train_routes:sales-list")
+
+
+@override_settings(SALES_ROLLUP_LAG=timedelta(0))
+class SalesRollupTest(APITestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.admin = sample_user(is_staff=True)
+        self.client.force_authenticate(self.admin)
+        self.journey = sample_journey()
+        self.express = sample_train(
+            name="Express",
+            train_type=sample_train_type(name="Express"),
+        )
+        self.express_journey = Journey.objects.create(
+            route=self.journey.route,
+            train=self.express,
+            departure_time="2024-06-30 08:00",
+            arrival_time="2024-06-30 12:00",
+        )
+
+    def order(self, journey, *seats):
+        order = Order.objects.create(user=self.admin)
+        for seat in seats:
+            with self.captureOnCommitCallbacks(execute=True):
+                Ticket.objects.create(
+                    order=order, journey=journey, cargo=1, seat=seat
+                )
+        return order
+
+    def sales(self, **params):
+        response = self.client.get(SALES_URL, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["results"]
+
+    def test_rolls_up_orders_past_the_watermark(self):
+        self.order(self.journey, 1, 2)
+        self.order(self.journey, 3)
+        last = self.order(self.express_journey, 1)
+
+        self.assertEqual(roll_up_sales(), 3)
+        self.assertEqual(roll_up_sales(), 0)
+        self.assertEqual(sales_watermark(), last.id)
+
+        express, regular = self.sales(group_by="train_type")
+        self.assertEqual(
+            (regular["orders"], regular["tickets"], regular["passenger_km"]),
+            (2, 3, 300),
+        )
+        self.assertEqual(express["train_type_name"], "Express")
+        self.assertEqual(express["tickets"], 1)
+
+    def test_resumes_after_max_batches(self):
+        for seat in range(1, 4):
+            self.order(self.journey, seat)
+
+        self.assertEqual(roll_up_sales(batch_size=1, max_batches=2), 2)
+        self.assertEqual(DailySales.objects.get().orders, 2)
+
+        self.assertEqual(roll_up_sales(batch_size=1), 1)
+        self.assertEqual(DailySales.objects.get().orders, 3)
+
+    def test_leaves_recent_orders_for_the_next_run(self):
+        self.order(self.journey, 1)
+
+        with override_settings(SALES_ROLLUP_LAG=timedelta(minutes=5)):
+            self.assertEqual(roll_up_sales(), 0)
+
+    def test_late_and_deleted_tickets_update_rollup(self):
+        order = self.order(self.journey, 1)
+        roll_up_sales()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Ticket.objects.create(
+                order=order, journey=self.journey, cargo=1, seat=2
+            )
+        self.assertEqual(DailySales.objects.get().tickets, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order.delete()
+        sales = DailySales.objects.get()
+        self.assertEqual((sales.orders, sales.tickets), (0, 0))
+
+    def test_backfill_rebuilds_rollup(self):
+        self.order(self.journey, 1, 2)
+        roll_up_sales()
+        DailySales.objects.update(tickets=0)
+
+        out = StringIO()
+        call_command("roll_up_sales", "--backfill", stdout=out)
+
+        self.assertIn("Rolled up 1 orders", out.getvalue())
+        self.assertEqual(DailySales.objects.get().tickets, 2)
+
+    def test_unknown_group(self):
+        response = self.client.get(SALES_URL, {"group_by": "train"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(sample_user(email="user@test.com"))
+
+        response = self.client.get(SALES_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
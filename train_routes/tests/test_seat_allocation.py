@@ -0,0 +1,122 @@
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from train_routes.booking import SeatUnavailable
+from train_routes.models import Order, Ticket
+from train_routes.seats import SeatMap, clear_seat_maps, get_seat_map
+from train_routes.tests.test_station_api import (
+    ORDER_URL,
+    sample_journey,
+    sample_user,
+)
+
+
+AUTO_ASSIGN_URL = reverse("train_routes:order-auto-assign")
+
+
+class SeatMapTest(SimpleTestCase):
+    def test_allocates_adjacent_seats_in_one_cargo(self):
+        seat_map = SeatMap(2, 10, taken=[(1, 3), (1, 8)])
+
+        self.assertEqual(
+            seat_map.allocate(4), [(1, 4), (1, 5), (1, 6), (1, 7)]
+        )
+        self.assertEqual(
+            seat_map.allocate(5), [(2, 1), (2, 2), (2, 3), (2, 4), (2, 5)]
+        )
+
+    def test_splits_across_cargos_when_no_run_fits(self):
+        seat_map = SeatMap(2, 4, taken=[(1, 2), (2, 2), (2, 3)])
+
+        seats = seat_map.allocate(4)
+
+        self.assertEqual(seats, [(1, 1), (1, 3), (1, 4), (2, 1)])
+        self.assertEqual(seat_map.free_count(), 1)
+
+    def test_not_enough_free_seats(self):
+        seat_map = SeatMap(1, 3, taken=[(1, 1)])
+
+        with self.assertRaises(SeatUnavailable):
+            seat_map.allocate(3)
+
+    def test_release_returns_seats(self):
+        seat_map = SeatMap(1, 3)
+        seats = seat_map.allocate(3)
+
+        seat_map.release(seats[:1])
+
+        self.assertEqual(seat_map.allocate(1), [(1, 1)])
+
+
+class AutoAssignApiTest(APITestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        self.journey = sample_journey()
+        clear_seat_maps()
+
+    def auto_assign(self, seats):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                AUTO_ASSIGN_URL,
+                {"journey": self.journey.id, "seats": seats},
+                format="json",
+            )
+
+    def test_books_adjacent_seats(self):
+        response = self.auto_assign(3)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [(ticket["cargo"], ticket["seat"])
+             for ticket in response.data["tickets"]],
+            [(1, 1), (1, 2), (1, 3)],
+        )
+
+    def test_skips_seats_sold_behind_the_map(self):
+        get_seat_map(self.journey)
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(
+            order=order, journey=self.journey, cargo=1, seat=2
+        )
+
+        response = self.auto_assign(2)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            Ticket.objects.filter(journey=self.journey).count(), 3
+        )
+
+    def test_booked_seats_are_taken_in_the_map(self):
+        seat_map = get_seat_map(self.journey)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                ORDER_URL,
+                {
+                    "tickets": [
+                        {"cargo": 1, "seat": 1, "journey": self.journey.id}
+                    ]
+                },
+                format="json",
+            )
+
+        self.assertEqual(seat_map.allocate(1), [(1, 2)])
+
+    def test_deleted_order_frees_seats(self):
+        first = self.auto_assign(2)
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.get(id=first.data["id"]).delete()
+
+        response = self.auto_assign(2)
+
+        self.assertEqual(
+            [ticket["seat"] for ticket in response.data["tickets"]], [1, 2]
+        )
+
+    def test_more_seats_than_capacity(self):
+        response = self.auto_assign(10_001)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
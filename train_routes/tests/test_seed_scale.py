@@ -0,0 +1,100 @@
+import random
+from datetime import date
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Count, F
+from django.test import TestCase
+
+from train_routes.models import (
+    Crew,
+    Journey,
+    JourneySearchRow,
+    Order,
+    Route,
+    Station,
+    Ticket,
+    Train,
+)
+from train_routes.seeding import generate_stations
+
+
+class SeedScaleTest(TestCase):
+    def seed(self, **options):
+        defaults = {
+            "stations": 60,
+            "trains_per_type": 2,
+            "start": date(2025, 1, 1),
+            "days": 3,
+            "journeys_per_day": 10,
+            "crew": 12,
+            "users": 5,
+            "load_factor": 0.5,
+            "stdout": StringIO(),
+        }
+        defaults.update(options)
+        call_command("seed_scale", **defaults)
+
+    def test_generates_a_connected_timetable(self):
+        self.seed()
+
+        self.assertEqual(Station.objects.count(), 60)
+        self.assertEqual(Train.objects.count(), 8)
+        self.assertEqual(Journey.objects.count(), 30)
+        self.assertEqual(Crew.journeys.through.objects.count(), 30 * 2)
+        self.assertEqual(JourneySearchRow.objects.count(), 30)
+
+        neighbours = {}
+        for source, destination in Route.objects.values_list(
+            "source_id", "destination_id"
+        ):
+            neighbours.setdefault(source, set()).add(destination)
+        reached = {Station.objects.earliest("id").id}
+        frontier = list(reached)
+        while frontier:
+            for station in neighbours.get(frontier.pop(), ()):
+                if station not in reached:
+                    reached.add(station)
+                    frontier.append(station)
+        self.assertEqual(len(reached), 60)
+
+    def test_sells_seats_at_the_load_factor(self):
+        self.seed()
+
+        capacity = sum(
+            journey.train.cargo_num * journey.train.places_in_cargo
+            for journey in Journey.objects.select_related("train")
+        )
+        self.assertAlmostEqual(
+            Ticket.objects.count() / capacity, 0.5, delta=0.1
+        )
+        self.assertFalse(
+            Ticket.objects.exclude(departure_time=F("journey__departure_time"))
+        )
+        self.assertFalse(
+            Order.objects.annotate(count=Count("tickets")).filter(
+                count__gt=4
+            )
+        )
+        self.assertFalse(
+            Order.objects.filter(
+                created_at__gte=F("tickets__journey__departure_time")
+            )
+        )
+
+    def test_runs_add_rows_after_existing_ids(self):
+        self.seed(stations=20, load_factor=0.1)
+        self.seed(stations=20, load_factor=0.1)
+
+        self.assertEqual(Station.objects.count(), 40)
+        # Sequences moved past the explicit ids
+        Station.objects.create(name="New", latitude=50, longtitude=20)
+
+    def test_same_seed_same_stations(self):
+        first = generate_stations(30, random.Random(7))
+        second = generate_stations(30, random.Random(7))
+
+        self.assertEqual(
+            [(s.name, s.latitude, s.longtitude) for s in first],
+            [(s.name, s.latitude, s.longtitude) for s in second],
+        )
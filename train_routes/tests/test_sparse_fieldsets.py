@@ -0,0 +1,73 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from train_routes.tests.test_station_api import (
+    JOURNEY_URL,
+    ROUTE_URL,
+    sample_journey,
+    sample_route,
+    sample_user,
+)
+
+
+class SparseFieldsetApiTest(APITestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+
+    def test_journey_list_returns_only_requested_fields(self):
+        sample_journey()
+
+        response = self.client.get(
+            JOURNEY_URL, {"fields": "id,departure_time,tickets_available"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(response.data["results"][0]),
+            {"id", "departure_time", "tickets_available"},
+        )
+        self.assertEqual(response.data["results"][0]["tickets_available"], 100)
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get(
+            JOURNEY_URL, {"fields": "id,departure,tickets"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["fields"], ["Unknown fields: departure, tickets."]
+        )
+
+    def test_journey_list_skips_joins_for_unrequested_relations(self):
+        sample_journey()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(JOURNEY_URL, {"fields": "id,departure_time"})
+
+        journey_query = queries.captured_queries[-1]["sql"]
+        self.assertNotIn("JOIN", journey_query)
+        self.assertNotIn("arrival_time", journey_query)
+
+    def test_expand_route_on_journey_list(self):
+        sample_journey()
+
+        response = self.client.get(
+            JOURNEY_URL, {"fields": "id,route", "expand": "route"}
+        )
+
+        route = response.data["results"][0]["route"]
+        self.assertEqual(route["source"], "TestStation")
+        self.assertEqual(route["destination"], "TestStation2")
+
+    def test_expand_route_stations(self):
+        sample_route()
+
+        response = self.client.get(ROUTE_URL, {"expand": "source"})
+
+        route = response.data["results"][0]
+        self.assertEqual(route["source"]["name"], "TestStation")
+        self.assertEqual(route["destination"], "TestStation2")
@@ -0,0 +1,105 @@
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from train_routes.autocomplete import StationIndex, invalidate_station_index
+from train_routes.models import Journey, Station
+from train_routes.tests.test_station_api import (
+    sample_journey,
+    sample_station,
+    sample_user,
+)
+
+
+AUTOCOMPLETE_URL = reverse("train_routes:station-autocomplete")
+
+
+def station_names(stations):
+    return [station.name for station in stations]
+
+
+class StationIndexTest(SimpleTestCase):
+    def setUp(self) -> None:
+        self.index = StationIndex([
+            Station(id=1, name="Kyiv", popularity=5),
+            Station(id=2, name="Kyiv Pasazhyrskyi", popularity=50),
+            Station(id=3, name="Lviv", popularity=10),
+            Station(id=4, name="Nova Kyivka", popularity=100),
+        ])
+
+    def test_prefix_matches_ranked_by_popularity(self):
+        self.assertEqual(
+            station_names(self.index.search("kyi", 10)),
+            ["Kyiv Pasazhyrskyi", "Kyiv", "Nova Kyivka"],
+        )
+
+    def test_word_prefix_matches(self):
+        self.assertEqual(
+            station_names(self.index.search("pas", 10)),
+            ["Kyiv Pasazhyrskyi"],
+        )
+
+    def test_limit(self):
+        self.assertEqual(len(self.index.search("kyi", 2)), 2)
+
+    def test_no_matches(self):
+        self.assertEqual(self.index.search("odesa", 10), [])
+
+
+@override_settings(STATION_AUTOCOMPLETE_IN_MEMORY=True)
+class StationAutocompleteApiTest(APITestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.force_authenticate(sample_user())
+        invalidate_station_index()
+
+    def autocomplete(self, **params):
+        return self.client.get(AUTOCOMPLETE_URL, params)
+
+    def test_autocomplete(self):
+        sample_station(name="Kharkiv")
+        sample_station(name="Kherson")
+        sample_station(name="Lviv")
+
+        response = self.autocomplete(q="kh")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [station["name"] for station in response.data],
+            ["Kharkiv", "Kherson"],
+        )
+
+    def test_empty_query(self):
+        sample_station(name="Kharkiv")
+
+        response = self.autocomplete(q=" ")
+
+        self.assertEqual(response.data, [])
+
+    def test_invalid_limit(self):
+        response = self.autocomplete(q="kh", limit="many")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_new_station_invalidates_index(self):
+        sample_station(name="Kharkiv")
+        self.autocomplete(q="kh")
+
+        sample_station(name="Khmelnytskyi")
+        response = self.autocomplete(q="khm")
+
+        self.assertEqual(
+            [station["name"] for station in response.data], ["Khmelnytskyi"]
+        )
+
+    def test_journeys_update_popularity(self):
+        journey = sample_journey()
+        source = journey.route.source
+
+        source.refresh_from_db()
+        self.assertEqual(source.popularity, 1)
+
+        Journey.objects.filter(id=journey.id).delete()
+        source.refresh_from_db()
+        self.assertEqual(source.popularity, 0)
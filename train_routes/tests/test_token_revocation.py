@@ -0,0 +1,146 @@
+import time
+import uuid
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from user.models import RevokedToken
+from user.revocation import expiry_bucket, revocations
+
+TOKEN_URL = reverse("user:token_obtain_pair")
+REFRESH_URL = reverse("user:token_refresh")
+VERIFY_URL = reverse("user:token_verify")
+LOGOUT_URL = reverse("user:logout")
+LOGOUT_ALL_URL = reverse("user:logout_all")
+ME_URL = reverse("user:manage")
+
+
+class TokenRevocationTest(TestCase):
+    def setUp(self):
+        revocations.clear()
+        self.addCleanup(revocations.clear)
+        self.client = APIClient()
+        get_user_model().objects.create_user(
+            email="user@test.com", password="secret123"
+        )
+
+    def login(self) -> dict:
+        return self.client.post(
+            TOKEN_URL, {"email": "user@test.com", "password": "secret123"}
+        ).data
+
+    def me(self, access):
+        return self.client.get(ME_URL, HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    def test_rotated_refresh_token_is_revoked(self):
+        tokens = self.login()
+
+        first = self.client.post(REFRESH_URL, {"refresh": tokens["refresh"]})
+        again = self.client.post(REFRESH_URL, {"refresh": tokens["refresh"]})
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(again.status_code, status.HTTP_401_UNAUTHORIZED)
+        rotated = self.client.post(
+            REFRESH_URL, {"refresh": first.data["refresh"]}
+        )
+        self.assertEqual(rotated.status_code, status.HTTP_200_OK)
+
+    def test_logout_revokes_refresh_and_access_token(self):
+        tokens = self.login()
+        other = self.login()
+
+        res = self.client.post(
+            LOGOUT_URL,
+            {"refresh": tokens["refresh"]},
+            HTTP_AUTHORIZATION=f"Bearer {tokens['access']}",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            self.me(tokens["access"]).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        self.assertEqual(
+            self.client.post(
+                REFRESH_URL, {"refresh": tokens["refresh"]}
+            ).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        verify = self.client.post(VERIFY_URL, {"token": tokens["access"]})
+        self.assertEqual(verify.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.me(other["access"]).status_code, 200)
+
+    def test_logout_all_revokes_every_token(self):
+        first = self.login()
+        second = self.login()
+
+        res = self.client.post(
+            LOGOUT_ALL_URL, HTTP_AUTHORIZATION=f"Bearer {first['access']}"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        for tokens in (first, second):
+            self.assertEqual(self.me(tokens["access"]).status_code, 401)
+            self.assertEqual(
+                self.client.post(
+                    REFRESH_URL, {"refresh": tokens["refresh"]}
+                ).status_code,
+                401,
+            )
+        self.assertEqual(self.me(self.login()["access"]).status_code, 200)
+
+    def test_stale_user_save_keeps_tokens_revoked(self):
+        tokens = self.login()
+        stale = get_user_model().objects.get(email="user@test.com")
+        self.client.post(
+            LOGOUT_ALL_URL, HTTP_AUTHORIZATION=f"Bearer {tokens['access']}"
+        )
+
+        stale.first_name = "Stale"
+        stale.save()
+
+        self.assertEqual(self.me(tokens["access"]).status_code, 401)
+        self.assertEqual(
+            get_user_model().objects.get(email="user@test.com").first_name,
+            "Stale",
+        )
+
+    def test_checks_without_queries_between_syncs(self):
+        access = self.login()["access"]
+        self.me(access)
+
+        # The user lookup only
+        with self.assertNumQueries(1):
+            self.me(access)
+
+    def test_reads_revocations_of_other_processes_after_interval(self):
+        access = self.login()["access"]
+        self.me(access)
+        token = AccessToken(access)
+        RevokedToken.objects.create(
+            jti=uuid.UUID(token["jti"]),
+            expires_bucket=expiry_bucket(token["exp"]),
+        )
+
+        self.assertEqual(self.me(access).status_code, 200)
+        later = time.monotonic() + 60
+        with mock.patch("user.revocation.time.monotonic", return_value=later):
+            self.assertEqual(self.me(access).status_code, 401)
+
+    @override_settings(TOKEN_REVOCATION_SYNC_INTERVAL=0)
+    def test_expired_buckets_are_dropped(self):
+        now = int(time.time())
+        revocations.revoke(uuid.uuid4().hex, now - 2 * 3600)
+        revocations.revoke(uuid.uuid4().hex, now + 3600)
+
+        revocations.sync_if_due()
+
+        self.assertEqual(RevokedToken.objects.count(), 1)
+        self.assertEqual(
+            list(revocations.buckets), [expiry_bucket(now + 3600)]
+        )
@@ -0,0 +1,157 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from train_routes.tests.test_station_api import TRAIN_URL, sample_train
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def upload_image_url(train_id):
+    return reverse("train_routes:train-upload-image", args=[train_id])
+
+
+def sample_image(size=(2000, 1500), image_format="PNG"):
+    buffer = BytesIO()
+    Image.new("RGB", size, color=(120, 30, 200)).save(buffer, image_format)
+    return SimpleUploadedFile(
+        "train.png", buffer.getvalue(), content_type="image/png"
+    )
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_PIPELINE_WORKERS=0)
+class TrainImageUploadTest(APITestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="admin@test.com",
+            password="testpass",
+            is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        self.train = sample_train()
+
+    def upload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                upload_image_url(self.train.id),
+                {"image": sample_image()},
+                format="multipart",
+            )
+
+    def test_upload_renders_resized_variants(self):
+        response = self.upload()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.train.refresh_from_db()
+        thumbnail = self.train.image_variants["thumbnail"]
+        self.assertEqual(set(thumbnail), {"webp", "jpg"})
+        with Image.open(f"{MEDIA_ROOT}/{thumbnail['webp']}") as image:
+            self.assertLessEqual(image.width, 320)
+            self.assertEqual(image.format, "WEBP")
+
+    def test_variant_names_are_content_hashed(self):
+        self.upload()
+        self.train.refresh_from_db()
+        first = self.train.image_variants
+
+        self.upload()
+        self.train.refresh_from_db()
+
+        self.assertEqual(first, self.train.image_variants)
+
+    def test_train_list_returns_variant_urls(self):
+        self.upload()
+
+        response = self.client.get(TRAIN_URL)
+
+        variants = response.data["results"][0]["image_variants"]
+        self.assertTrue(
+            variants["medium"]["jpg"].startswith("http://testserver/media/")
+        )
+
+    def test_variants_served_with_immutable_cache_headers(self):
+        self.upload()
+        self.train.refresh_from_db()
+
+        response = self.client.get(
+            f"/media/{self.train.image_variants['thumbnail']['jpg']}"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("immutable", response["Cache-Control"])
+
+    def test_identical_uploads_are_stored_once(self):
+        other_train = sample_train(name="Other")
+
+        self.upload()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                upload_image_url(other_train.id),
+                {"image": sample_image()},
+                format="multipart",
+            )
+
+        self.train.refresh_from_db()
+        other_train.refresh_from_db()
+        self.assertEqual(self.train.image.name, other_train.image.name)
+
+    def test_upload_rejects_unknown_signature(self):
+        fake = SimpleUploadedFile(
+            "train.png", b"#!/bin/sh\necho nope\n", content_type="image/png"
+        )
+
+        response = self.client.post(
+            upload_image_url(self.train.id),
+            {"image": fake},
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.train.refresh_from_db()
+        self.assertFalse(self.train.image)
+
+    @override_settings(
+        STORAGES={
+            "default": {
+                "BACKEND": "django.core.files.storage.InMemoryStorage"
+            },
+            "staticfiles": {
+                "BACKEND": "django.core.files.storage.InMemoryStorage"
+            },
+        }
+    )
+    def test_upload_to_storage_without_paths(self):
+        response = self.upload()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.train.refresh_from_db()
+        self.assertTrue(default_storage.exists(self.train.image.name))
+
+    @override_settings(TRAIN_IMAGE_MAX_UPLOAD_SIZE=1024)
+    def test_upload_rejects_oversized_image(self):
+        response = self.client.post(
+            upload_image_url(self.train.id),
+            {"image": sample_image()},
+            format="multipart",
+        )
+
+        self.assertEqual(
+            response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+        self.assertIn("exceed", response.data["detail"])
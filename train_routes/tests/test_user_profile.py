@@ -0,0 +1,71 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from user.serializers import UserSerializer
+
+ME_URL = reverse("user:manage")
+
+
+def updates(queries) -> list[str]:
+    return [
+        query["sql"]
+        for query in queries
+        if query["sql"].startswith("UPDATE")
+    ]
+
+
+class UserProfileTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = get_user_model().objects.create_user(
+            email="user@test.com", password="secret123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_profile_is_cached(self):
+        with mock.patch.object(
+            UserSerializer,
+            "to_representation",
+            autospec=True,
+            side_effect=UserSerializer.to_representation,
+        ) as render:
+            first = self.client.get(ME_URL)
+            second = self.client.get(ME_URL)
+
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(second.data["email"], "user@test.com")
+
+    def test_update_invalidates_cached_profile(self):
+        self.client.get(ME_URL)
+
+        self.client.patch(ME_URL, {"email": "new@test.com"})
+
+        self.assertEqual(self.client.get(ME_URL).data["email"], "new@test.com")
+
+    def test_password_change_is_one_hashed_write(self):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(ME_URL, {"password": "changed123"})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(updates(queries)), 1)
+        self.assertNotIn('"email"', updates(queries)[0])
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("changed123"))
+        self.assertNotEqual(self.user.password, "changed123")
+
+    def test_unchanged_update_does_not_write(self):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(ME_URL, {"email": "user@test.com"})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(updates(queries), [])
@@ -0,0 +1,173 @@
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import (
+    FileUploadHandler,
+    SkipFile,
+    StopUpload,
+)
+from PIL import Image
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+
+IMAGES_DIR = os.path.join("uploads", "images")
+
+INCOMING_DIR = os.path.join(IMAGES_DIR, "incoming")
+
+HEADER_SIZE = 12
+
+
+class ImageTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Image is too large."
+    default_code = "image_too_large"
+
+
+def local_path(name: str) -> str | None:
+    """Path of ``name`` on filesystem default_storage, None on others"""
+    if isinstance(default_storage, FileSystemStorage):
+        return default_storage.path(name)
+    return None
+
+
+def detect_image_extension(header: bytes) -> str | None:
+    """Return the file extension matching the image signature"""
+    if header.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return ".gif"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+class StoredImageUpload(UploadedFile):
+    """An image that was streamed into storage under ``storage_name``"""
+
+    def __init__(self, storage_name, size, content_type, content_hash):
+        super().__init__(
+            file=default_storage.open(storage_name, "rb"),
+            name=storage_name,
+            content_type=content_type,
+            size=size,
+        )
+        self.storage_name = storage_name
+        self.content_hash = content_hash
+
+
+class StreamingImageUploadHandler(FileUploadHandler):
+    """
+    Stream an uploaded image straight into storage.
+
+    The signature is checked on the first bytes and the size limit on
+    every chunk, so bad uploads are rejected before the file is written
+    out, the rest of the body is drained for the response to arrive.
+    Files are named by their sha256, identical images are stored once.
+    On filesystem storage they are written next to MEDIA_ROOT and moved
+    into place, other storages receive the finished file.
+    The APIException of a rejected upload is kept in ``error`` for the
+    view to raise.
+    """
+
+    chunk_size = 64 * 2**10
+
+    def __init__(self, request=None, field_name="image"):
+        super().__init__(request)
+        self.target_field_name = field_name
+        self.error = None
+        self.destination = None
+
+    def new_file(self, field_name, *args, **kwargs):
+        if field_name != self.target_field_name:
+            raise SkipFile()
+        super().new_file(field_name, *args, **kwargs)
+
+        self.header = b""
+        self.extension = None
+        self.sha256 = hashlib.sha256()
+        directory = local_path(INCOMING_DIR)
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self.destination = tempfile.NamedTemporaryFile(
+            dir=directory, delete=False
+        )
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.TRAIN_IMAGE_MAX_UPLOAD_SIZE:
+            self.abort(
+                ImageTooLarge(
+                    "Image must not exceed "
+                    f"{settings.TRAIN_IMAGE_MAX_UPLOAD_SIZE} bytes."
+                )
+            )
+
+        if self.extension is None and len(self.header) < HEADER_SIZE:
+            self.header += raw_data[:HEADER_SIZE - len(self.header)]
+            if len(self.header) == HEADER_SIZE:
+                self.check_signature()
+
+        self.sha256.update(raw_data)
+        self.destination.write(raw_data)
+
+    def file_complete(self, file_size):
+        if self.extension is None:
+            self.check_signature()
+        self.destination.close()
+
+        try:
+            with Image.open(self.destination.name) as image:
+                image.verify()
+        except Exception:
+            self.abort(self.invalid("Upload a valid image."))
+
+        content_hash = self.sha256.hexdigest()
+        storage_name = os.path.join(
+            IMAGES_DIR, f"{content_hash}{self.extension}"
+        )
+        if default_storage.exists(storage_name):
+            os.remove(self.destination.name)
+        elif (target := local_path(storage_name)) is not None:
+            os.replace(self.destination.name, target)
+        else:
+            with open(self.destination.name, "rb") as file:
+                storage_name = default_storage.save(storage_name, File(file))
+            os.remove(self.destination.name)
+        self.destination = None
+
+        return StoredImageUpload(
+            storage_name, file_size, self.content_type, content_hash
+        )
+
+    def upload_interrupted(self):
+        self.discard()
+
+    def check_signature(self):
+        self.extension = detect_image_extension(self.header)
+        if self.extension is None:
+            self.abort(
+                self.invalid(
+                    "Unsupported image type, upload JPEG, PNG, GIF or WEBP."
+                )
+            )
+
+    def discard(self):
+        if self.destination is not None:
+            self.destination.close()
+            os.remove(self.destination.name)
+            self.destination = None
+
+    def invalid(self, message) -> ValidationError:
+        return ValidationError({self.target_field_name: [message]})
+
+    def abort(self, error: APIException):
+        self.error = error
+        self.discard()
+        raise StopUpload()
@@ -7,6 +7,9 @@ from train_routes.views import (
     JourneyViewSet,
     CrewViewSet,
     OrderViewSet,
+    ArchivedOrderViewSet,
+    LoadFactorViewSet,
+    SalesViewSet,
 )
 
 
@@ -18,6 +21,13 @@ router.register("trains", TrainViewSet, basename="train")
 router.register("journeys", JourneyViewSet)
 router.register("crew", CrewViewSet)
 router.register("orders", OrderViewSet)
+router.register(
+    "archived-orders", ArchivedOrderViewSet, basename="archived-order"
+)
+router.register(
+    "analytics/load-factors", LoadFactorViewSet, basename="load-factor"
+)
+router.register("analytics/sales", SalesViewSet, basename="sales")
 
 
 urlpatterns = router.urls
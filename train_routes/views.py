@@ -1,13 +1,24 @@
-from datetime import datetime
-from django.db.models import F, Count
+from datetime import datetime, timedelta
+from functools import partial
+from django.conf import settings
+from django.db.models import F, Prefetch, Q
 # from django.db.models.manager import BaseManager
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAdminUser
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiTypes
 
+from train_routes.analytics import load_factors, sales_report
+from train_routes.autocomplete import autocomplete_stations
+from train_routes.distances import get_distance_index
+from train_routes.geo import nearby_stations
+from train_routes.idempotency import idempotent
+from train_routes.images import schedule_train_variants
+from train_routes.mixins import SparseFieldsetMixin
 from train_routes.models import (
+    ArchivedOrder,
     Station,
     Route,
     TrainType,
@@ -15,17 +26,32 @@ from train_routes.models import (
     Journey,
     Crew,
     Order,
+    JourneySearchRow,
+    DailyLoad,
+    DailySales,
+    journey_ticket_count,
 )
 from train_routes.serializers import (
+    ArchivedOrderSerializer,
+    AutoAssignOrderSerializer,
     CrewListSerializer,
     JourneyDetailSerializer,
     JourneyListSerializer,
+    JourneySearchRowSerializer,
+    LoadFactorQuerySerializer,
+    LoadFactorSerializer,
+    NearbyStationSerializer,
+    NearbyStationsQuerySerializer,
     OrderDetailSerializer,
     OrderListSerializer,
     RouteDetailSerializer,
+    RouteDistanceQuerySerializer,
     RouteListSerializer,
     StationSerializer,
     RouteSerializer,
+    SalesQuerySerializer,
+    SalesSerializer,
+    TrainImageSerializer,
     TrainListSerializer,
     TrainTypeSerializer,
     TrainSerializer,
@@ -33,6 +59,10 @@ from train_routes.serializers import (
     CrewSerializer,
     OrderSerializer,
 )
+from train_routes.uploads import (
+    StoredImageUpload,
+    StreamingImageUploadHandler,
+)
 
 
 def _params_to_int(qs) -> list[int]:
@@ -40,15 +70,132 @@ def _params_to_int(qs) -> list[int]:
     return [int(id) for id in qs.split(",")]
 
 
-class StationViewSet(viewsets.ModelViewSet):
+def _date_range(value: str):
+    """[start, end) of a YYYY-MM-DD day or a YYYY-MM month, else None"""
+    for date_format in ("%Y-%m-%d", "%Y-%m"):
+        try:
+            start = datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+        if date_format == "%Y-%m-%d":
+            return start, start + timedelta(days=1)
+        return start, (start + timedelta(days=31)).replace(day=1)
+    return None
+
+
+def _filter_by_date(field: str, value: str) -> Q:
+    """
+    Ranges on the column instead of matching its text, so the planner
+    uses indexes and prunes journey and ticket partitions.
+    """
+    date_range = _date_range(value)
+    if date_range is None:
+        return Q(**{f"{field}__contains": value})
+    start, end = date_range
+    return Q(**{f"{field}__gte": start, f"{field}__lt": end})
+
+
+class StationViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Station.objects.all()
     serializer_class = StationSerializer
 
+    def get_queryset(self):
+        return self.defer_unrequested(self.queryset)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="q",
+                type=OpenApiTypes.STR,
+                description="Beginning of the station name (ex. ?q=kyi)"
+            ),
+            OpenApiParameter(
+                name="limit",
+                type=OpenApiTypes.INT,
+                description="Number of stations to return, at most "
+                            f"{settings.STATION_AUTOCOMPLETE_MAX_LIMIT}"
+            ),
+        ]
+    )
+    @action(methods=["GET"], detail=False, url_path="autocomplete")
+    def autocomplete(self, request):
+        """Stations ranked by name prefix match and popularity"""
+        query = request.query_params.get("q", "").strip()
+        try:
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            raise ValidationError({"limit": ["A valid integer is required."]})
+        limit = max(1, min(limit, settings.STATION_AUTOCOMPLETE_MAX_LIMIT))
+
+        stations = autocomplete_stations(query, limit) if query else []
+        serializer = self.get_serializer(stations, many=True)
+        return Response(serializer.data)
 
-class RouteViewSet(viewsets.ModelViewSet):
-    queryset = Route.objects.all().select_related("source", "destination")
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="lat",
+                type=OpenApiTypes.FLOAT,
+                required=True,
+                description="Latitude of the point (ex. ?lat=50.45)"
+            ),
+            OpenApiParameter(
+                name="lon",
+                type=OpenApiTypes.FLOAT,
+                required=True,
+                description="Longtitude of the point (ex. ?lon=30.52)"
+            ),
+            OpenApiParameter(
+                name="radius",
+                type=OpenApiTypes.FLOAT,
+                description="Search radius in km, nearest stations "
+                            "at any distance when omitted"
+            ),
+            OpenApiParameter(
+                name="limit",
+                type=OpenApiTypes.INT,
+                description="Number of stations to return, at most "
+                            f"{settings.STATION_NEARBY_MAX_LIMIT}"
+            ),
+        ]
+    )
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="nearby",
+        serializer_class=NearbyStationSerializer,
+    )
+    def nearby(self, request):
+        """Stations closest to a point with their distance in km"""
+        query = NearbyStationsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        stations = nearby_stations(
+            params["lat"],
+            params["lon"],
+            params["limit"],
+            params.get("radius"),
+        )
+        serializer = self.get_serializer(stations, many=True)
+        return Response(serializer.data)
+
+
+class RouteViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
+    queryset = Route.objects.all()
     serializer_class = RouteSerializer
 
+    def get_queryset(self):
+        """Join stations only when their names or details are rendered"""
+        queryset = self.queryset
+        for name in ("source", "destination"):
+            if self.is_field_requested(name) and (
+                self.action in ("list", "retrieve")
+                or self.is_field_expanded(name)
+            ):
+                queryset = queryset.select_related(name)
+        return self.defer_unrequested(queryset)
+
     def get_serializer_class(self):
         serializer = self.serializer_class
         if self.action == "list":
@@ -57,14 +204,49 @@ class RouteViewSet(viewsets.ModelViewSet):
             serializer = RouteDetailSerializer
         return serializer
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="from",
+                type=OpenApiTypes.INT,
+                required=True,
+                description="Id of the departure station (ex. ?from=1)"
+            ),
+            OpenApiParameter(
+                name="to",
+                type=OpenApiTypes.INT,
+                required=True,
+                description="Id of the arrival station (ex. ?to=5)"
+            ),
+        ]
+    )
+    @action(methods=["GET"], detail=False, url_path="distance")
+    def distance(self, request):
+        """Shortest distance in km over all routes, null without a path"""
+        query = RouteDistanceQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        source = query.validated_data["from"]
+        destination = query.validated_data["to"]
+
+        return Response({
+            "from": source.id,
+            "to": destination.id,
+            "distance": get_distance_index().distance(
+                source.id, destination.id
+            ),
+        })
+
 
-class TrainTypeViewSet(viewsets.ModelViewSet):
+class TrainTypeViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = TrainType.objects.all()
     serializer_class = TrainTypeSerializer
 
+    def get_queryset(self):
+        return self.defer_unrequested(self.queryset)
+
 
-class TrainViewSet(viewsets.ModelViewSet):
-    queryset = Train.objects.all().select_related("train_type")
+class TrainViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
+    queryset = Train.objects.all()
     serializer_class = TrainSerializer
 
     def get_queryset(self):
@@ -75,12 +257,20 @@ class TrainViewSet(viewsets.ModelViewSet):
             types = types_param.split(",")
             queryset = self.queryset.filter(train_type__name__in=types)
 
-        return queryset
+        if self.is_field_requested("train_type") and (
+            self.action in ("list", "retrieve")
+            or self.is_field_expanded("train_type")
+        ):
+            queryset = queryset.select_related("train_type")
+
+        return self.defer_unrequested(queryset)
 
     def get_serializer_class(self):
         serializer = self.serializer_class
         if self.action in ("list", "retrieve"):
             serializer = TrainListSerializer
+        elif self.action == "upload_image":
+            serializer = TrainImageSerializer
         return serializer
 
     @action(
@@ -90,11 +280,26 @@ class TrainViewSet(viewsets.ModelViewSet):
         permission_classes=[IsAdminUser]
     )
     def upload_image(self, request, pk=None):
-        """Endpoint for uploading image to Train"""
+        """
+        Endpoint for uploading image to Train,
+        the image is streamed to storage and resized in the background
+        """
         train = self.get_object()
-        serializer = self.get_serializer(train, data=request.data)
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        handler = StreamingImageUploadHandler(request._request)
+        request._request.upload_handlers = [handler]
+
+        image = request.data.get("image")
+        if handler.error:
+            raise handler.error
+        if not isinstance(image, StoredImageUpload):
+            raise ValidationError({"image": ["No file was submitted."]})
+
+        train.image = image.storage_name
+        train.image_variants = {}
+        train.save(update_fields=["image", "image_variants"])
+        schedule_train_variants(train.id)
+
+        serializer = self.get_serializer(train)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @extend_schema(
@@ -114,45 +319,103 @@ class TrainViewSet(viewsets.ModelViewSet):
         return super().list(request, *args, **kwargs)
 
 
-class JourneyViewSet(viewsets.ModelViewSet):
-    queryset = Journey.objects.all().select_related()
+class JourneyViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
+    queryset = Journey.objects.all()
     serializer_class = JourneySerializer
 
-    def get_queryset(self):
-        """Retrieve journeys with filters"""
-        queryset = self.queryset
+    def uses_search_table(self) -> bool:
+        """List from JourneySearchRow unless relations are expanded"""
+        return (
+            self.action == "list"
+            and settings.JOURNEY_LIST_FROM_SEARCH_TABLE
+            and not self.expanded_fields
+        )
+
+    def filter_by_params(self, queryset, train_name_lookup):
         train_names = self.request.query_params.get("train_names")
 
         if train_names:
             train_names = train_names.split(",")
-            queryset = queryset.filter(train__name__in=train_names)
+            queryset = queryset.filter(
+                **{f"{train_name_lookup}__in": train_names}
+            )
 
         departure = self.request.query_params.get("departure")
         if departure:
-            queryset = queryset.filter(departure_time__contains=departure)
+            queryset = queryset.filter(
+                _filter_by_date("departure_time", departure)
+            )
 
         arrival = self.request.query_params.get("arrival")
-        if departure:
-            queryset = queryset.filter(arrival_time__contains=arrival)
+        if arrival:
+            queryset = queryset.filter(
+                _filter_by_date("arrival_time", arrival)
+            )
+
+        return queryset
+
+    def ticket_filters(self) -> dict:
+        """
+        Tickets to count, limited to the requested departure range so
+        only the matching ticket partitions are scanned
+        """
+        departure = self.request.query_params.get("departure")
+        date_range = _date_range(departure) if departure else None
+        if date_range is None:
+            return {}
+        start, end = date_range
+        return {"departure_time__gte": start, "departure_time__lt": end}
+
+    def get_queryset(self):
+        """Retrieve journeys with filters"""
+        if self.uses_search_table():
+            queryset = JourneySearchRow.objects.all()
+            queryset = self.filter_by_params(queryset, "train_name")
+            return self.defer_unrequested(queryset)
+
+        queryset = self.filter_by_params(self.queryset, "train__name")
+
+        if self.is_field_expanded("route"):
+            queryset = queryset.select_related(
+                "route__source", "route__destination"
+            )
+        elif self.action == "list" and self.is_field_requested("route"):
+            queryset = queryset.select_related("route__destination")
+        elif self.action == "retrieve" and self.is_field_requested("route"):
+            queryset = queryset.select_related(
+                "route__source", "route__destination"
+            )
+
+        if self.is_field_expanded("train"):
+            queryset = queryset.select_related("train__train_type")
+        elif self.action in ("list", "retrieve") and (
+            self.is_field_requested("train")
+        ):
+            queryset = queryset.select_related("train")
 
         if self.action == "list":
-            queryset = (
-                queryset
-                .annotate(
-                    tickets_available=F("train__places_in_cargo")
-                    - Count("tickets"),
-                    cargo_num_available=F("train__cargo_num")
-                    - Count("tickets__cargo")
+            tickets = journey_ticket_count(**self.ticket_filters())
+            if self.is_field_requested("tickets_available"):
+                queryset = queryset.annotate(
+                    tickets_available=F("train__places_in_cargo") - tickets
                 )
-                .order_by("id")
-            )
+            if self.is_field_requested("cargo_num_available"):
+                queryset = queryset.annotate(
+                    cargo_num_available=F("train__cargo_num") - tickets
+                )
+            queryset = queryset.order_by("id")
         elif self.action == "retrieve":
-            queryset = queryset
-        return queryset
+            if self.is_field_requested("taken_places"):
+                queryset = queryset.annotate(
+                    taken_places=journey_ticket_count()
+                )
+        return self.defer_unrequested(queryset)
 
     def get_serializer_class(self):
         serializer = self.serializer_class
-        if self.action == "list":
+        if self.uses_search_table():
+            serializer = JourneySearchRowSerializer
+        elif self.action == "list":
             serializer = JourneyListSerializer
         elif self.action == "retrieve":
             serializer = JourneyDetailSerializer
@@ -176,7 +439,7 @@ class JourneyViewSet(viewsets.ModelViewSet):
                 name="arrival",
                 type=OpenApiTypes.DATE,
                 description="Filter journeys by arrival date "
-                            "(ex. ?departure=2024-06-29)"
+                            "(ex. ?arrival=2024-06-29)"
             ),
         ]
     )
@@ -185,20 +448,24 @@ class JourneyViewSet(viewsets.ModelViewSet):
         return super().list(request, *args, **kwargs)
 
 
-class CrewViewSet(viewsets.ModelViewSet):
-    queryset = Crew.objects.all().prefetch_related(
-        "journeys__route",
-        "journeys__train",
-        "journeys__train",
-        "journeys__route__source",
-        "journeys__route__destination",
-    )
+class CrewViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
+    queryset = Crew.objects.all()
     serializer_class = CrewSerializer
 
     def get_queryset(self):
         """Retrieve crew with filters"""
         queryset = self.queryset
 
+        if self.is_field_requested("journeys"):
+            if self.action == "list" or self.is_field_expanded("journeys"):
+                queryset = queryset.prefetch_related(
+                    "journeys__route__source",
+                    "journeys__route__destination",
+                    "journeys__train__train_type",
+                )
+            elif self.action == "retrieve":
+                queryset = queryset.prefetch_related("journeys")
+
         train_name = self.request.query_params.get("train_name")
         if train_name:
             queryset = queryset.filter(
@@ -213,16 +480,16 @@ class CrewViewSet(viewsets.ModelViewSet):
         departure = self.request.query_params.get("departure")
         if departure:
             queryset = queryset.filter(
-                journeys__departure_time__icontains=departure
+                _filter_by_date("journeys__departure_time", departure)
             )
 
         arrival = self.request.query_params.get("arrival")
         if arrival:
             queryset = queryset.filter(
-                journeys__arrival_time__icontains=arrival
+                _filter_by_date("journeys__arrival_time", arrival)
             )
 
-        return queryset
+        return self.defer_unrequested(queryset)
 
     def get_serializer_class(self):
         serializer = self.serializer_class
@@ -264,16 +531,27 @@ class CrewViewSet(viewsets.ModelViewSet):
         return super().list(request, *args, **kwargs)
 
 
-class OrderViewSet(viewsets.ModelViewSet):
-    queryset = Order.objects.all().prefetch_related(
-        "tickets__order",
-    )
+class OrderViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
+    queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = ()
 
     def get_queryset(self):
         """A list of user orders"""
         queryset = self.queryset.filter(user=self.request.user)
+        if self.is_field_requested("tickets"):
+            queryset = queryset.prefetch_related("tickets")
+        if self.action == "retrieve" and self.is_field_requested("tickets"):
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "tickets__journey",
+                    queryset=Journey.objects.select_related(
+                        "route__source",
+                        "route__destination",
+                        "train",
+                    ).annotate(taken_places=journey_ticket_count()),
+                )
+            )
 
         orders_ids = self.request.query_params.get("orders_ids")
         if orders_ids:
@@ -286,7 +564,7 @@ class OrderViewSet(viewsets.ModelViewSet):
             created_at = datetime.strptime(created_at, "%Y-%m-%d").date()
             queryset = queryset.filter(created_at__icontains=created_at)
 
-        return queryset
+        return self.defer_unrequested(queryset)
 
     def get_serializer_class(self):
         serializer = self.serializer_class
@@ -294,11 +572,24 @@ class OrderViewSet(viewsets.ModelViewSet):
             serializer = OrderListSerializer
         elif self.action == "retrieve":
             serializer = OrderDetailSerializer
+        elif self.action == "auto_assign":
+            serializer = AutoAssignOrderSerializer
         return serializer
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def create(self, request, *args, **kwargs):
+        """Create an order once per Idempotency-Key header"""
+        return idempotent(
+            request, partial(super().create, request, *args, **kwargs)
+        )
+
+    @action(methods=["POST"], detail=False, url_path="auto-assign")
+    def auto_assign(self, request):
+        """Book a number of seats on a journey, the server picks the seats"""
+        return idempotent(request, partial(super().create, request))
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -317,3 +608,128 @@ class OrderViewSet(viewsets.ModelViewSet):
     def list(self, request, *args, **kwargs):
         """A list of oders"""
         return super().list(request, *args, **kwargs)
+
+
+class ArchivedOrderViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = ArchivedOrder.objects.all()
+    serializer_class = ArchivedOrderSerializer
+
+    def get_queryset(self):
+        """Orders of the user moved out by archive_past_journeys"""
+        return self.queryset.filter(user=self.request.user).prefetch_related(
+            "tickets"
+        )
+
+
+class LoadFactorViewSet(viewsets.GenericViewSet):
+    queryset = DailyLoad.objects.all()
+    serializer_class = LoadFactorSerializer
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="group_by",
+                type=OpenApiTypes.STR,
+                description="Comma separated groups out of day, train "
+                            "and route (ex. ?group_by=train,day)"
+            ),
+            OpenApiParameter(
+                name="date_from",
+                type=OpenApiTypes.DATE,
+                description="First departure day (ex. ?date_from=2024-06-01)"
+            ),
+            OpenApiParameter(
+                name="date_to",
+                type=OpenApiTypes.DATE,
+                description="Last departure day (ex. ?date_to=2024-06-30)"
+            ),
+            OpenApiParameter(
+                name="train",
+                type=OpenApiTypes.INT,
+                description="Filter by train id (ex. ?train=1)"
+            ),
+            OpenApiParameter(
+                name="route",
+                type=OpenApiTypes.INT,
+                description="Filter by route id (ex. ?route=1)"
+            ),
+        ]
+    )
+    def list(self, request):
+        """Tickets sold per seat offered, read from the daily rollup"""
+        query = LoadFactorQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        loads = self.get_queryset()
+        if "date_from" in params:
+            loads = loads.filter(day__gte=params["date_from"])
+        if "date_to" in params:
+            loads = loads.filter(day__lte=params["date_to"])
+        if "train" in params:
+            loads = loads.filter(train_id=params["train"])
+        if "route" in params:
+            loads = loads.filter(route_id=params["route"])
+
+        page = self.paginate_queryset(
+            load_factors(loads, params["group_by"])
+        )
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class SalesViewSet(viewsets.GenericViewSet):
+    queryset = DailySales.objects.all()
+    serializer_class = SalesSerializer
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="group_by",
+                type=OpenApiTypes.STR,
+                description="Comma separated groups out of day, route "
+                            "and train_type (ex. ?group_by=day,train_type)"
+            ),
+            OpenApiParameter(
+                name="date_from",
+                type=OpenApiTypes.DATE,
+                description="First order day (ex. ?date_from=2024-06-01)"
+            ),
+            OpenApiParameter(
+                name="date_to",
+                type=OpenApiTypes.DATE,
+                description="Last order day (ex. ?date_to=2024-06-30)"
+            ),
+            OpenApiParameter(
+                name="route",
+                type=OpenApiTypes.INT,
+                description="Filter by route id (ex. ?route=1)"
+            ),
+            OpenApiParameter(
+                name="train_type",
+                type=OpenApiTypes.INT,
+                description="Filter by train type id (ex. ?train_type=1)"
+            ),
+        ]
+    )
+    def list(self, request):
+        """Sales volume read from the daily rollup, see roll_up_sales"""
+        query = SalesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        sales = self.get_queryset()
+        if "date_from" in params:
+            sales = sales.filter(day__gte=params["date_from"])
+        if "date_to" in params:
+            sales = sales.filter(day__lte=params["date_to"])
+        if "route" in params:
+            sales = sales.filter(route_id=params["route"])
+        if "train_type" in params:
+            sales = sales.filter(train_type_id=params["train_type"])
+
+        page = self.paginate_queryset(sales_report(sales, params["group_by"]))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
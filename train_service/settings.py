@@ -48,6 +48,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework_simplejwt",
     "drf_spectacular",
     "rest_framework",
@@ -58,6 +59,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "train_routes.profiling.RequestProfilerMiddleware",
+    "train_routes.metrics.QueryMetricsMiddleware",
     "debug_toolbar.middleware.DebugToolbarMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -125,6 +128,23 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# OffloadedPBKDF2PasswordHasher hashes in a pool of PASSWORD_HASHING_WORKERS
+# processes so login storms cannot take every core, 0 hashes inline
+PASSWORD_HASHERS = [
+    "user.hashers.OffloadedPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+
+PASSWORD_HASHING_WORKERS = int(os.getenv("PASSWORD_HASHING_WORKERS", 0))
+
+# Logins and registrations hashing at once per client IP and per email,
+# beyond which they get 429. Off by default (0), set it per environment
+# above the logins expected behind one proxy or NAT address.
+LOGIN_CONCURRENCY_LIMIT = int(os.getenv("LOGIN_CONCURRENCY_LIMIT", 0))
+
 AUTH_USER_MODEL = "user.User"
 
 # Internationalization
@@ -148,6 +168,27 @@ MEDIA_ROOT = BASE_DIR / "media"
 
 MEDIA_URL = "/media/"
 
+# Set to "X-Accel-Redirect" (nginx) or "X-Sendfile" (apache, lighttpd)
+# to let the proxy send media files instead of Django workers
+MEDIA_OFFLOAD_HEADER = os.getenv("MEDIA_OFFLOAD_HEADER")
+
+# Internal nginx location that maps to MEDIA_ROOT
+MEDIA_OFFLOAD_PREFIX = os.getenv("MEDIA_OFFLOAD_PREFIX", "/protected-media/")
+
+# Train image variants rendered by train_routes.images,
+# IMAGE_PIPELINE_WORKERS = 0 renders them inline with the upload
+IMAGE_PIPELINE_WORKERS = int(os.getenv("IMAGE_PIPELINE_WORKERS", 2))
+
+IMAGE_VARIANT_SIZES = {
+    "thumbnail": (320, 240),
+    "medium": (1024, 768),
+}
+
+IMAGE_VARIANT_QUALITY = 80
+
+# Upper bound for images streamed by train_routes.uploads
+TRAIN_IMAGE_MAX_UPLOAD_SIZE = 10 * 2**20
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -162,7 +203,7 @@ REST_FRAMEWORK = {
     ],
     "DEFAULT_THROTTLE_RATES": {"anon": "50/day", "user": "300/day"},
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "user.authentication.RevocableJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": [
         "train_routes.permissions.IsAdminrOrReadOnly",
@@ -185,8 +226,144 @@ SPECTACULAR_SETTINGS = {
     },
 }
 
+# Retries of train_routes.booking when seats are locked by another booking
+BOOKING_MAX_RETRIES = 3
+
+BOOKING_RETRY_BACKOFF = 0.05
+
+# In-process free seat maps used by the auto-assign booking mode
+SEAT_MAP_TTL = 60
+
+SEAT_MAP_CACHE_SIZE = 1024
+
+# Serve the journey list from the denormalized JourneySearchRow table
+JOURNEY_LIST_FROM_SEARCH_TABLE = (
+    os.getenv("JOURNEY_LIST_FROM_SEARCH_TABLE", "false").lower() == "true"
+)
+
+# Rank station autocomplete in process instead of with pg_trgm,
+# other databases always use the in-process index
+STATION_AUTOCOMPLETE_IN_MEMORY = False
+
+STATION_INDEX_TTL = 300
+
+STATION_AUTOCOMPLETE_MAX_LIMIT = 50
+
+# Answer radius queries of stations/nearby/ from the in-process KD-tree
+# instead of the bounding box query
+STATION_NEARBY_IN_MEMORY = False
+
+STATION_NEARBY_MAX_LIMIT = 50
+
+STATION_NEARBY_MAX_RADIUS = 2000
+
+# Memory-mapped route graph with landmark distances for shortest paths
+# between stations, built by build_route_distances and updated in the
+# background after route changes, inline with ROUTE_DISTANCE_WORKERS = 0
+ROUTE_DISTANCE_INDEX_PATH = os.getenv(
+    "ROUTE_DISTANCE_INDEX_PATH", BASE_DIR / "data" / "route_distances.bin"
+)
+
+# Two int32 rows per landmark and station, more tighten the search bounds
+ROUTE_DISTANCE_LANDMARKS = int(os.getenv("ROUTE_DISTANCE_LANDMARKS", 16))
+
+ROUTE_DISTANCE_WORKERS = int(os.getenv("ROUTE_DISTANCE_WORKERS", 1))
+
+# Monthly journey and ticket partitions kept ahead by partition_tables,
+# later journeys wait in the default partition. Old partitions are detached
+# after PARTITION_RETENTION_MONTHS, never with None
+PARTITION_MONTHS_AHEAD = 12
+
+PARTITION_RETENTION_MONTHS = None
+
+# Orders and journeys that arrived this long ago are moved to the
+# archive tables by archive_past_journeys
+ARCHIVE_AFTER = timedelta(days=int(os.getenv("ARCHIVE_AFTER_DAYS", 365)))
+
+# Per-endpoint query counts, database and render time, served to admins
+# in the Prometheus text format at /api/metrics/, the statements behind
+# the fingerprint digests at /api/metrics/statements/
+QUERY_METRICS_ENABLED = (
+    os.getenv("QUERY_METRICS_ENABLED", "true").lower() == "true"
+)
+
+QUERY_METRICS_PREFIX = "train_service"
+
+# Slowest statement fingerprints kept per endpoint
+QUERY_METRICS_SLOW_STATEMENTS = 5
+
+# Profile a fraction of journey and order requests with cProfile or,
+# with REQUEST_PROFILING_MODE = "sampler", a statistical stack sampler.
+# Requests slower than the threshold (seconds) are kept, the latest
+# REQUEST_PROFILING_BUFFER of them, for admins at /api/profiles/
+REQUEST_PROFILING_ENABLED = (
+    os.getenv("REQUEST_PROFILING_ENABLED", "false").lower() == "true"
+)
+
+REQUEST_PROFILING_MODE = os.getenv("REQUEST_PROFILING_MODE", "cprofile")
+
+REQUEST_PROFILING_SAMPLE_RATE = float(
+    os.getenv("REQUEST_PROFILING_SAMPLE_RATE", 0.01)
+)
+
+REQUEST_PROFILING_THRESHOLD = float(
+    os.getenv("REQUEST_PROFILING_THRESHOLD", 0.5)
+)
+
+REQUEST_PROFILING_INTERVAL = 0.005
+
+REQUEST_PROFILING_BUFFER = 50
+
+REQUEST_PROFILING_PATHS = (
+    "/api/train-routes/journeys/",
+    "/api/train-routes/orders/",
+)
+
+# How long responses stored for an Idempotency-Key are replayed
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+
+# A key claimed this long ago without a stored response belongs to a
+# request that died and may be claimed again
+IDEMPOTENCY_PENDING_TIMEOUT = timedelta(minutes=1)
+
+# How long a duplicate of a request in progress waits for its response
+# before giving up with 409
+IDEMPOTENCY_REPLAY_WAIT = timedelta(seconds=5)
+
+# Migrated test databases reused while the migrations are unchanged,
+# and the number of processes tests run in ("auto" is one per core)
+TEST_RUNNER = "train_service.test_runner.TemplateDatabaseRunner"
+
+TEST_DATABASE_CACHE_DIR = os.getenv(
+    "TEST_DATABASE_CACHE_DIR", BASE_DIR / ".test-db-cache"
+)
+
+# Test processes, "auto" for one per core
+TEST_PARALLEL = os.getenv("TEST_PARALLEL", "1")
+
+# Tests hash passwords with MD5 instead of PBKDF2 when enabled
+TEST_FAST_PASSWORD_HASHER = (
+    os.getenv("TEST_FAST_PASSWORD_HASHER", "false").lower() == "true"
+)
+
+# Orders younger than this are left for the next roll_up_sales run,
+# so orders committed out of id order are not skipped
+SALES_ROLLUP_LAG = timedelta(minutes=5)
+
+# Seconds an in-process copy of the revoked tokens may miss revocations
+# made by other processes
+TOKEN_REVOCATION_SYNC_INTERVAL = 5
+
+# GET /api/user/me/ responses cached per user in the default cache and
+# deleted when the user is saved. Processes see each other's deletions
+# only with a shared cache backend, otherwise after the TTL
+USER_PROFILE_CACHE_TTL = 300
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=1),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": True,
+    "TOKEN_OBTAIN_SERIALIZER": "user.serializers.TokenObtainSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "user.serializers.TokenRefreshSerializer",
+    "TOKEN_VERIFY_SERIALIZER": "user.serializers.TokenVerifySerializer",
 }
@@ -0,0 +1,304 @@
+"""
+Test runner that migrates the test database once per set of migrations.
+
+The migrated database is kept as a template: a PostgreSQL database
+created with ``CREATE DATABASE ... TEMPLATE`` or a SQLite file under
+TEST_DATABASE_CACHE_DIR. Later runs copy it while the migration files,
+Django version and options are unchanged. Parallel workers clone the
+copy as usual, the runner defaults to TEST_PARALLEL processes.
+
+--squashed builds the template from the models with the extensions the
+migrations create, and refuses migrations of the project with RunPython
+or RunSQL operations not marked elidable, as building from the models
+would skip them.
+
+With TEST_FAST_PASSWORD_HASHER the tests hash passwords with MD5.
+"""
+import hashlib
+import os
+import sqlite3
+import sys
+from collections import defaultdict
+from functools import partial
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.contrib.postgres.operations import CreateExtension
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connections
+from django.db.migrations import RunPython, RunSQL
+from django.db.migrations.loader import MigrationLoader
+from django.db.models.signals import pre_migrate
+from django.test.runner import DiscoverRunner, parallel_type
+from django.test.utils import override_settings
+
+FAST_PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+
+def migration_hash(connection, squashed: bool) -> str:
+    """
+    Hash of every migration file and what else shapes the schema, the
+    models modules too when the tables are built from them
+    """
+    digest = hashlib.sha256()
+    digest.update(
+        f"{django.get_version()}:{connection.vendor}:{squashed}:"
+        f"{settings.MIGRATION_MODULES}".encode()
+    )
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    modules = [
+        migration.__module__
+        for _, migration in sorted(loader.disk_migrations.items())
+    ]
+    if squashed:
+        modules += [
+            app_config.models_module.__name__
+            for app_config in apps.get_app_configs()
+            if app_config.models_module is not None
+        ]
+    for module in modules:
+        digest.update(module.encode())
+        with open(sys.modules[module].__file__, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()[:16]
+
+
+def squashed_extensions() -> dict[str, list[CreateExtension]]:
+    """
+    CreateExtension operations of every migration by app label. Raises
+    ImproperlyConfigured for RunPython and RunSQL operations of project
+    apps that are not elidable, the squashed template would lack them.
+    """
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    extensions = defaultdict(list)
+    for (app_label, name), migration in sorted(
+        loader.disk_migrations.items()
+    ):
+        project_app = apps.get_app_config(app_label).path.startswith(
+            str(settings.BASE_DIR)
+        )
+        for operation in migration.operations:
+            if isinstance(operation, CreateExtension):
+                extensions[app_label].append(operation)
+            elif (
+                project_app
+                and isinstance(operation, (RunPython, RunSQL))
+                and not operation.elidable
+            ):
+                raise ImproperlyConfigured(
+                    f"--squashed would skip the {type(operation).__name__} "
+                    f"operation of {app_label}.{name}, mark it elidable "
+                    "if the tables do not need it"
+                )
+    return extensions
+
+
+def _create_extensions(extensions, sender, using, **kwargs) -> None:
+    """Extensions of an app before syncdb creates its tables"""
+    with connections[using].schema_editor() as schema_editor:
+        for operation in extensions.get(sender.label, ()):
+            operation.database_forwards(
+                sender.label, schema_editor, None, None
+            )
+
+
+class SQLiteTemplate:
+    """Migrated database kept as a file, restored with the backup API"""
+
+    def __init__(self, connection, mode: str, key: str):
+        self.connection = connection
+        self.prefix = f"{connection.alias}-{mode}-"
+        self.path = os.path.join(
+            settings.TEST_DATABASE_CACHE_DIR, f"{self.prefix}{key}.sqlite3"
+        )
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def save(self) -> None:
+        os.makedirs(settings.TEST_DATABASE_CACHE_DIR, exist_ok=True)
+        for name in os.listdir(settings.TEST_DATABASE_CACHE_DIR):
+            if name.startswith(self.prefix):
+                os.remove(os.path.join(settings.TEST_DATABASE_CACHE_DIR, name))
+        partial_path = f"{self.path}.partial"
+        self.connection.ensure_connection()
+        target = sqlite3.connect(partial_path)
+        try:
+            self.connection.connection.backup(target)
+        finally:
+            target.close()
+        os.replace(partial_path, self.path)
+
+    def restore(self, verbosity: int, autoclobber: bool) -> None:
+        self.connection.creation._create_test_db(
+            verbosity, autoclobber, keepdb=False
+        )
+        _use_test_name(self.connection)
+        self.connection.ensure_connection()
+        source = sqlite3.connect(self.path)
+        try:
+            source.backup(self.connection.connection)
+        finally:
+            source.close()
+
+
+class PostgreSQLTemplate:
+    """Migrated database kept as a database to create test databases from"""
+
+    def __init__(self, connection, mode: str, key: str):
+        self.connection = connection
+        self.test_name = connection.creation._get_test_db_name()
+        self.prefix = f"{self.test_name}_{mode}_"
+        self.name = f"{self.prefix}{key}"
+
+    def _names(self) -> list[str]:
+        with self.connection.creation._nodb_cursor() as cursor:
+            cursor.execute(
+                "SELECT datname FROM pg_database WHERE datname LIKE %s",
+                [self.prefix.replace("_", r"\_") + "%"],
+            )
+            return [name for name, in cursor.fetchall()]
+
+    def exists(self) -> bool:
+        return self.name in self._names()
+
+    def save(self) -> None:
+        # The source of CREATE DATABASE ... TEMPLATE must have no sessions
+        self.connection.close()
+        quote = self.connection.ops.quote_name
+        with self.connection.creation._nodb_cursor() as cursor:
+            for name in self._names():
+                cursor.execute(f"DROP DATABASE {quote(name)}")
+            cursor.execute(
+                f"CREATE DATABASE {quote(self.name)} "
+                f"TEMPLATE {quote(self.test_name)}"
+            )
+
+    def restore(self, verbosity: int, autoclobber: bool) -> None:
+        quote = self.connection.ops.quote_name
+        with self.connection.creation._nodb_cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS {quote(self.test_name)}")
+            cursor.execute(
+                f"CREATE DATABASE {quote(self.test_name)} "
+                f"TEMPLATE {quote(self.name)}"
+            )
+        _use_test_name(self.connection)
+
+
+TEMPLATES = {
+    "sqlite": SQLiteTemplate,
+    "postgresql": PostgreSQLTemplate,
+}
+
+
+def _use_test_name(connection) -> None:
+    connection.close()
+    test_name = connection.creation._get_test_db_name()
+    settings.DATABASES[connection.alias]["NAME"] = test_name
+    connection.settings_dict["NAME"] = test_name
+
+
+def create_test_db(
+    connection,
+    squashed,
+    verbosity=1,
+    autoclobber=False,
+    serialize=True,
+    keepdb=False,
+):
+    """
+    BaseDatabaseCreation.create_test_db copying the template instead of
+    migrating when there is one, and saving it when there is not
+    """
+    creation = connection.creation
+    template_class = TEMPLATES.get(connection.vendor)
+    if keepdb or template_class is None:
+        return type(creation).create_test_db(
+            creation, verbosity, autoclobber, serialize, keepdb
+        )
+
+    template = template_class(
+        connection,
+        "squashed" if squashed else "migrated",
+        migration_hash(connection, squashed),
+    )
+    if not template.exists():
+        test_settings = connection.settings_dict["TEST"]
+        migrate = test_settings.get("MIGRATE", True)
+        create_extensions = None
+        if squashed:
+            # Tables straight from the models, as one squashed migration
+            create_extensions = partial(
+                _create_extensions, squashed_extensions()
+            )
+            test_settings["MIGRATE"] = False
+            pre_migrate.connect(create_extensions, weak=False)
+        try:
+            test_name = type(creation).create_test_db(
+                creation, verbosity, autoclobber, serialize, keepdb
+            )
+        finally:
+            test_settings["MIGRATE"] = migrate
+            if create_extensions is not None:
+                pre_migrate.disconnect(create_extensions)
+        template.save()
+        return test_name
+
+    if verbosity >= 1:
+        creation.log(
+            f"Copying test database for alias '{connection.alias}' "
+            "from the migrated template..."
+        )
+    template.restore(verbosity, autoclobber)
+    if serialize:
+        connection._test_serialized_contents = (
+            creation.serialize_db_to_string()
+        )
+    call_command("createcachetable", database=connection.alias)
+    connection.ensure_connection()
+    return connection.settings_dict["NAME"]
+
+
+class TemplateDatabaseRunner(DiscoverRunner):
+    def __init__(self, squashed=False, **kwargs):
+        super().__init__(**kwargs)
+        self.squashed = squashed
+        self.fast_hasher = override_settings(
+            PASSWORD_HASHERS=FAST_PASSWORD_HASHERS
+        )
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        parser.set_defaults(parallel=parallel_type(settings.TEST_PARALLEL))
+        parser.add_argument(
+            "--squashed",
+            action="store_true",
+            help="Build the template from the current models in one step, "
+            "as a squashed migration would, instead of replaying every "
+            "migration.",
+        )
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        if settings.TEST_FAST_PASSWORD_HASHER:
+            self.fast_hasher.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        if settings.TEST_FAST_PASSWORD_HASHER:
+            self.fast_hasher.disable()
+        super().teardown_test_environment(**kwargs)
+
+    def setup_databases(self, **kwargs):
+        creations = [connections[alias].creation for alias in connections]
+        for creation in creations:
+            creation.create_test_db = partial(
+                create_test_db, creation.connection, self.squashed
+            )
+        try:
+            return super().setup_databases(**kwargs)
+        finally:
+            for creation in creations:
+                del creation.create_test_db
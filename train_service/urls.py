@@ -18,13 +18,16 @@ Including another URLconf
 from django.contrib import admin
 from django.conf.urls.static import static
 
-from django.urls import include, path
+from django.urls import include, path, re_path
 from drf_spectacular.views import (
     SpectacularAPIView,
     SpectacularSwaggerView,
     SpectacularRedocView,
 )
 
+from train_routes.media import HASHED_PATH, serve_media
+from train_routes.metrics import MetricsView, StatementsView
+from train_routes.profiling import ProfileDownloadView, ProfileListView
 from train_service import settings
 
 
@@ -53,5 +56,22 @@ urlpatterns = [
         SpectacularRedocView.as_view(url_name="schema"),
         name="redoc",
     ),
+    path("api/metrics/", MetricsView.as_view(), name="metrics"),
+    path(
+        "api/metrics/statements/",
+        StatementsView.as_view(),
+        name="metrics-statements",
+    ),
+    path("api/profiles/", ProfileListView.as_view(), name="profile-list"),
+    path(
+        "api/profiles/<int:profile_id>/",
+        ProfileDownloadView.as_view(),
+        name="profile-download",
+    ),
     path("__debug__/", include("debug_toolbar.urls")),
+    re_path(
+        r"^%s(?P<path>%s)$" % (settings.MEDIA_URL.lstrip("/"), HASHED_PATH),
+        serve_media,
+        name="media",
+    ),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,19 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from user.revocation import check_token
+
+
+class RevocableJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication rejecting revoked tokens, checked against the
+    in-process revocation store and the user it loads anyway
+    """
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        try:
+            check_token(validated_token, user.token_version)
+        except TokenError as error:
+            raise InvalidToken(error.args[0])
+        return user
@@ -0,0 +1,49 @@
+import base64
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.utils.encoding import force_bytes
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            # Forking a threaded server process is unsafe
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASHING_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def pbkdf2(password, salt, iterations: int, digest_name: str) -> bytes:
+    """PBKDF2 in the hashing pool, inline with PASSWORD_HASHING_WORKERS = 0"""
+    arguments = (digest_name, force_bytes(password), force_bytes(salt))
+    if not settings.PASSWORD_HASHING_WORKERS:
+        return hashlib.pbkdf2_hmac(*arguments, iterations)
+    return _get_executor().submit(
+        hashlib.pbkdf2_hmac, *arguments, iterations
+    ).result()
+
+
+class OffloadedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2PasswordHasher computing the key in a bounded process pool, so
+    hashing and verification under a login storm take at most
+    PASSWORD_HASHING_WORKERS cores. Hashes are the same pbkdf2_sha256.
+    """
+
+    def encode(self, password, salt, iterations=None):
+        self._check_encode_args(password, salt)
+        iterations = iterations or self.iterations
+        key = pbkdf2(password, salt, iterations, self.digest().name)
+        key = base64.b64encode(key).decode("ascii").strip()
+        return f"{self.algorithm}${iterations}${salt}${key}"
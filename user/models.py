@@ -45,8 +45,42 @@ class User(AbstractUser):
 
     username = None
     email = models.EmailField(_("email address"), unique=True)
+    # Tokens issued with an older version are revoked
+    token_version = models.PositiveIntegerField(default=0)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
     objects = UserManager()
+
+    def save(self, *args, **kwargs):
+        """
+        Full saves of an existing user leave token_version alone, it only
+        moves through F() updates, so a stale instance cannot write back
+        an older version and restore revoked tokens.
+        """
+        if (
+            not self._state.adding
+            and not kwargs.get("force_insert")
+            and kwargs.get("update_fields") is None
+        ):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "token_version"
+            ]
+        super().save(*args, **kwargs)
+
+
+class RevokedToken(models.Model):
+    """
+    JTI of a revoked token until the token expires, by the hour bucket
+    of its expiry so whole buckets are dropped at once
+    """
+
+    jti = models.UUIDField(primary_key=True)
+    expires_bucket = models.PositiveIntegerField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Revoked token {self.jti}"
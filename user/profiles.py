@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.cache import cache
+
+
+def profile_cache_key(user_id) -> str:
+    return f"user:profile:{user_id}"
+
+
+def get_cached_profile(user_id) -> dict | None:
+    return cache.get(profile_cache_key(user_id))
+
+
+def cache_profile(user_id, data: dict) -> None:
+    cache.set(
+        profile_cache_key(user_id), data, settings.USER_PROFILE_CACHE_TTL
+    )
+
+
+def invalidate_profile(user_id) -> None:
+    cache.delete(profile_cache_key(user_id))
@@ -0,0 +1,128 @@
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.translation import gettext as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from user.models import RevokedToken
+
+VERSION_CLAIM = "ver"
+
+BUCKET_SECONDS = 3600
+
+
+def expiry_bucket(exp: int) -> int:
+    return exp // BUCKET_SECONDS
+
+
+class RevocationStore:
+    """
+    JTIs of revoked, unexpired tokens held in process as one set per
+    expiry bucket, so a check is a set lookup and expired buckets are
+    dropped whole. Revocations by other processes are read from the
+    database at most every TOKEN_REVOCATION_SYNC_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self.buckets: dict[int, set[str]] = {}
+        self.synced_at = None
+        self.checked_at = None
+        self.lock = threading.Lock()
+
+    def revoke(self, jti: str, exp: int) -> bool:
+        """Revoke a token, False when it already was"""
+        bucket = expiry_bucket(exp)
+        _, created = RevokedToken.objects.get_or_create(
+            jti=uuid.UUID(jti), defaults={"expires_bucket": bucket}
+        )
+        with self.lock:
+            self.buckets.setdefault(bucket, set()).add(jti)
+        return created
+
+    def is_revoked(self, jti: str, exp: int) -> bool:
+        self.sync_if_due()
+        return jti in self.buckets.get(expiry_bucket(exp), ())
+
+    def sync_if_due(self) -> None:
+        interval = settings.TOKEN_REVOCATION_SYNC_INTERVAL
+        with self.lock:
+            now = time.monotonic()
+            checked_at = self.checked_at
+            if checked_at is not None and now - checked_at < interval:
+                return
+            self.checked_at = now
+            synced_at = self.synced_at
+
+        current = expiry_bucket(int(time.time()))
+        started = timezone.now()
+        rows = RevokedToken.objects.filter(expires_bucket__gte=current)
+        if synced_at is not None:
+            # Overlap the last sync for clock skew between servers
+            rows = rows.filter(
+                revoked_at__gte=synced_at - timedelta(seconds=interval)
+            )
+        fetched = list(rows.values_list("jti", "expires_bucket"))
+
+        with self.lock:
+            expired = [bucket for bucket in self.buckets if bucket < current]
+            for bucket in expired:
+                del self.buckets[bucket]
+            for jti, bucket in fetched:
+                self.buckets.setdefault(bucket, set()).add(jti.hex)
+            self.synced_at = started
+        if expired or synced_at is None:
+            RevokedToken.objects.filter(expires_bucket__lt=current).delete()
+
+    def clear(self) -> None:
+        with self.lock:
+            self.buckets.clear()
+            self.synced_at = None
+            self.checked_at = None
+
+
+revocations = RevocationStore()
+
+
+class VersionedRefreshToken(RefreshToken):
+    """Refresh token carrying the token version of the user"""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token[VERSION_CLAIM] = user.token_version
+        return token
+
+
+def check_token(token, version: int) -> None:
+    """
+    Raise TokenError when the token is revoked, or was issued before the
+    user's token version became ``version``. Tokens without a version
+    claim count as version 0.
+    """
+    if token.get(VERSION_CLAIM, 0) != version or revocations.is_revoked(
+        token[api_settings.JTI_CLAIM], token["exp"]
+    ):
+        raise TokenError(_("Token is revoked"))
+
+
+def user_token_version(token) -> int:
+    """Token version of the active user of a token, one query"""
+    version = (
+        get_user_model()
+        .objects.filter(
+            **{api_settings.USER_ID_FIELD: token[api_settings.USER_ID_CLAIM]},
+            is_active=True,
+        )
+        .values_list("token_version", flat=True)
+        .first()
+    )
+    if version is None:
+        raise TokenError(_("Token is revoked"))
+    return version
@@ -1,8 +1,22 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer as BaseTokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken, UntypedToken
 
 from django.contrib.auth import get_user_model, authenticate
 from django.utils.translation import gettext as _
 
+from user.revocation import (
+    VersionedRefreshToken,
+    check_token,
+    revocations,
+    user_token_version,
+)
+
 
 class UserSerializer(serializers.ModelSerializer):
 
@@ -29,10 +43,70 @@ class UserSerializer(serializers.ModelSerializer):
         return get_user_model().objects.create_user(**validated_data)
 
     def update(self, instance, validated_data):
-        """Update User with encrypted password"""
-        password = validated_data.pop("passwor", None)
-        user = super().update(instance, validated_data)
+        """Update User with encrypted password, saving changed fields only"""
+        password = validated_data.pop("password", None)
+        changed = [
+            field
+            for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        ]
+        for field in changed:
+            setattr(instance, field, validated_data[field])
         if password:
-            user.set_password(password)
-            user.save()
-        return user
+            instance.set_password(password)
+            changed.append("password")
+        if changed:
+            instance.save(update_fields=changed)
+        return instance
+
+
+class TokenObtainSerializer(TokenObtainPairSerializer):
+    token_class = VersionedRefreshToken
+
+
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    """Refresh unless the token is revoked, revoking it when rotated"""
+
+    token_class = VersionedRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        check_token(refresh, user_token_version(refresh))
+
+        data = {"access": str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            # Only the first of concurrent refreshes gets the new pair
+            if not revocations.revoke(
+                refresh[api_settings.JTI_CLAIM], refresh["exp"]
+            ):
+                raise TokenError(_("Token is revoked"))
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data["refresh"] = str(refresh)
+        return data
+
+
+class TokenVerifySerializer(serializers.Serializer):
+    token = serializers.CharField(write_only=True)
+
+    def validate(self, attrs):
+        token = UntypedToken(attrs["token"])
+        check_token(token, user_token_version(token))
+        return {}
+
+
+class LogoutSerializer(serializers.Serializer):
+    refresh = serializers.CharField(write_only=True)
+
+    def validate_refresh(self, value):
+        try:
+            refresh = RefreshToken(value)
+        except TokenError as error:
+            raise serializers.ValidationError(error.args[0])
+        user_id = refresh.get(api_settings.USER_ID_CLAIM)
+        if user_id != self.context["request"].user.pk:
+            raise serializers.ValidationError(
+                _("Token belongs to another user")
+            )
+        return refresh
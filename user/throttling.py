@@ -0,0 +1,50 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+_in_flight = Counter()
+_lock = threading.Lock()
+
+
+def login_keys(request) -> list[str]:
+    keys = [f"ip:{BaseThrottle().get_ident(request)}"]
+    email = request.data.get("email")
+    if isinstance(email, str) and email:
+        keys.append(f"email:{email.strip().lower()}")
+    return keys
+
+
+@contextmanager
+def login_slot(keys: list[str]):
+    """
+    Holds one of the LOGIN_CONCURRENCY_LIMIT slots of every key while
+    the password is hashed, raising Throttled when a key has none left.
+    The slots are counted per server process.
+    """
+    limit = settings.LOGIN_CONCURRENCY_LIMIT
+    with _lock:
+        if limit and any(_in_flight[key] >= limit for key in keys):
+            raise Throttled(
+                detail="Too many logins in progress, try again shortly."
+            )
+        _in_flight.update(keys)
+    try:
+        yield
+    finally:
+        with _lock:
+            _in_flight.subtract(keys)
+            for key in keys:
+                if _in_flight[key] <= 0:
+                    del _in_flight[key]
+
+
+class LoginConcurrencyMixin:
+    """Limits the requests hashing a password at once per IP and email"""
+
+    def post(self, request, *args, **kwargs):
+        with login_slot(login_keys(request)):
+            return super().post(request, *args, **kwargs)
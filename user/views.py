@@ -1,17 +1,65 @@
-from rest_framework import generics
+from django.db.models import F
+from drf_spectacular.utils import extend_schema
+from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.views import TokenObtainPairView
 
-from user.serializers import UserSerializer
+from user.profiles import cache_profile, get_cached_profile
+from user.revocation import revocations
+from user.serializers import LogoutSerializer, UserSerializer
+from user.throttling import LoginConcurrencyMixin
 
 
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(LoginConcurrencyMixin, generics.CreateAPIView):
     serializer_class = UserSerializer
     permission_classes = ()
 
 
+class LoginView(LoginConcurrencyMixin, TokenObtainPairView):
+    pass
+
+
 class ManageUserView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
     permission_classes = (IsAuthenticated,)
 
     def get_object(self):
         return self.request.user
+
+    def retrieve(self, request, *args, **kwargs):
+        data = get_cached_profile(request.user.pk)
+        if data is None:
+            data = dict(self.get_serializer(request.user).data)
+            cache_profile(request.user.pk, data)
+        return Response(data)
+
+
+class LogoutView(generics.GenericAPIView):
+    """Revoke a refresh token and the access token of the request"""
+
+    serializer_class = LogoutSerializer
+    permission_classes = (IsAuthenticated,)
+
+    @extend_schema(responses={204: None})
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        tokens = [serializer.validated_data["refresh"], request.auth]
+        for token in filter(None, tokens):
+            revocations.revoke(token["jti"], token["exp"])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class LogoutAllView(APIView):
+    """Revoke every token issued to the user so far"""
+
+    permission_classes = (IsAuthenticated,)
+
+    @extend_schema(request=None, responses={204: None})
+    def post(self, request):
+        type(request.user).objects.filter(pk=request.user.pk).update(
+            token_version=F("token_version") + 1
+        )
+        return Response(status=status.HTTP_204_NO_CONTENT)